@@ -0,0 +1,262 @@
+# Benchmarks for the generation, auto-fill and rendering hot paths.
+#
+# Every benchmark runs with a fixed seed, so the same work is timed on every run.  Each timing is the best of several
+# repeats (except the large fills, which are run once).  Results are written as JSON:
+#     {"meta": {...machine and versions...}, "results": {name: {"seconds": s, "ops": n, "per_op": s/n, ...}}}
+# When a baseline file (an earlier output) is given, every benchmark present in both is compared, and those that became
+# slower than the threshold are reported as regressions.
+#
+# Benchmarks:
+#     > fill/headless/N: fill_tess end to end without drawing, for N = 1e2 ... max_n (powers of 10)
+#     > fill/rendered/N: the same into a pygame window (dummy video driver), for N up to 1e4 (skipped without pygame)
+#     > memory/N: peak memory allocated during a headless fill (tracemalloc), in bytes
+#     > vertex/neighbor_num, vertex/finish_fill: every vertex (and edge) of a 1e4 vertex tessellation
+#     > polygon/triangle, polygon/square: construction (and insertion) of the polygons around a new vertex
+#     > autofill: every auto-fill during a 1e4 vertex fill, with the number of vertices it checked
+#     > validate/N: every check of validate.py on the tiling of a headless fill, with the number of checks that failed
+#
+# Usage:
+#     python benchmark.py --output bench.json [--baseline baseline.json] [--max-n 1000000]
+
+import numpy as np
+import argparse
+import platform
+import tracemalloc
+import json
+import time
+import os
+import sys
+
+from tessellation import Tessellation
+from tessellation_fill import fill_tess
+from polygon import Triangle, Square
+from policy import UniformPolicy
+from validate import validate
+
+SEED = 0 # Seed used for every benchmark
+REPEATS = 3 # Repeats of each small benchmark, the best one is kept
+
+
+
+# Time a function that returns the number of operations it performed. Returns (best seconds, ops).
+def best_time(function, repeats=REPEATS):
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        ops = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, ops
+
+
+
+# Result entry for a timing
+def entry(seconds, ops, **extra):
+    result = {'seconds': seconds, 'ops': ops, 'per_op': seconds/ops}
+    result.update(extra)
+    return result
+
+
+
+# A headless tessellation filled to n vertices with the benchmark seed
+def grown(n):
+    tess = Tessellation(policy=UniformPolicy((0,1), SEED))
+    fill_tess(tess, n)
+    return tess
+
+
+
+def bench_fill_headless(n):
+    def run():
+        fill_tess(Tessellation(policy=UniformPolicy((0,1), SEED)), n)
+        return n
+    return entry(*best_time(run, REPEATS if n <= 10**4 else 1))
+
+
+
+def bench_fill_rendered(n):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    pygame.init()
+    win = pygame.display.set_mode((1000, 800))
+
+    def run():
+        win.fill((255,255,255))
+        fill_tess(Tessellation(win, np.array([500,400]), 6, policy=UniformPolicy((0,1), SEED)), n, win)
+        return n
+    result = entry(*best_time(run))
+    pygame.quit()
+    return result
+
+
+
+def bench_memory(n):
+    tracemalloc.start()
+    tess = grown(n)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_bytes': peak, 'bytes_per_vertex': peak/tess.store.size}
+
+
+
+# Check the whole tiling of a headless fill. The failures should always be zero.
+def bench_validate(n):
+    tess = grown(n)
+    reports = []
+    def run():
+        reports.append(validate(tess))
+        return tess.store.size
+    result = entry(*best_time(run, REPEATS if n <= 10**4 else 1))
+    result['failures'] = sum(1 for count in reports[-1]['errors'].values() if count)
+    return result
+
+
+
+def bench_neighbor_num(tess):
+    pairs = [(tess.store.vertex(id), neighbor) for id in range(tess.store.size) for neighbor in tess.store.vertex(id).neighbors.values()]
+    def run():
+        for vert, neighbor in pairs:
+            vert.neighbor_num(neighbor)
+        return len(pairs)
+    return entry(*best_time(run))
+
+
+
+def bench_finish_fill(tess):
+    verts = [tess.store.vertex(id) for id in range(tess.store.size)]
+    def run():
+        for vert in verts:
+            vert.finish_fill()
+        return len(verts)
+    return entry(*best_time(run))
+
+
+
+# Construct polygon_type around the first vertex of fresh tessellations until it is filled (count polygons each)
+def bench_polygon(polygon_type, count, tessellations=200):
+    def run():
+        elapsed = 0.
+        for i in range(tessellations):
+            tess = Tessellation()
+            center, ref = tess.v0, tess.v1
+            start = time.perf_counter()
+            for j in range(count):
+                poly = polygon_type(center, ref, tess.store)
+                ref = poly.vertex_list[-1]
+            elapsed += time.perf_counter() - start
+        return elapsed
+    best = min(run() for i in range(REPEATS))
+    return entry(best, count*tessellations)
+
+
+
+# Total time spent in Tessellation.autofill during a fill
+def bench_autofill(n):
+    tess = Tessellation(policy=UniformPolicy((0,1), SEED))
+    autofill = tess.autofill
+    totals = {'seconds': 0., 'calls': 0, 'touched': 0}
+    def timed_autofill(start_vertices, limit=None):
+        start = time.perf_counter()
+        touched = autofill(start_vertices, limit)
+        totals['seconds'] += time.perf_counter() - start
+        totals['calls'] += 1
+        totals['touched'] += touched
+        return touched
+    tess.autofill = timed_autofill
+    fill_tess(tess, n)
+    return entry(totals['seconds'], totals['calls'], touched=totals['touched'])
+
+
+
+def run_benchmarks(max_n=10**5, rendered=True, log=print):
+    results = {}
+    def record(name, result):
+        results[name] = result
+        log('{:24s} {}'.format(name, ', '.join('{}={:.4g}'.format(k, v) for k, v in result.items())))
+
+    sizes = [10**k for k in range(2, 7) if 10**k <= max_n]
+    for n in sizes:
+        record('fill/headless/{}'.format(n), bench_fill_headless(n))
+    if rendered:
+        try:
+            for n in sizes:
+                if n <= 10**4:
+                    record('fill/rendered/{}'.format(n), bench_fill_rendered(n))
+        except ImportError:
+            log('pygame is not installed, skipping the rendered benchmarks')
+    for n in sizes:
+        record('memory/{}'.format(n), bench_memory(n))
+    for n in sizes:
+        record('validate/{}'.format(n), bench_validate(n))
+
+    tess = grown(10**4)
+    record('vertex/neighbor_num', bench_neighbor_num(tess))
+    record('vertex/finish_fill', bench_finish_fill(tess))
+    record('polygon/triangle', bench_polygon(Triangle, 6))
+    record('polygon/square', bench_polygon(Square, 4))
+    record('autofill', bench_autofill(10**4))
+    return results
+
+
+
+# Compare results against a baseline. Returns a list of (name, metric, baseline value, new value, ratio), and the
+# names of the benchmarks whose ratio exceeds 1 + threshold.
+def compare(results, baseline, threshold=0.1):
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        metric = 'per_op' if 'per_op' in result else 'peak_bytes'
+        old, new = baseline[name].get(metric), result[metric]
+        if not old:
+            continue
+        ratio = new/old
+        rows.append((name, metric, old, new, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tessellation generation, auto-fill and rendering.')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file the results are written to')
+    parser.add_argument('--baseline', default=None, help='earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    parser.add_argument('--max-n', type=int, default=10**5, help='largest fill (up to 1000000)')
+    parser.add_argument('--no-render', action='store_true', help='skip the benchmarks that need pygame')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.max_n, not args.no_render)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'seed': SEED,
+        },
+        'results': results,
+    }
+    rows, regressions = [], []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        rows, regressions = compare(results, baseline, args.threshold)
+        report['comparison'] = [dict(zip(('name', 'metric', 'baseline', 'new', 'ratio'), row)) for row in rows]
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, metric, old, new, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print('{:24s} {:10s} {:12.4g} -> {:12.4g}  x{:.2f}{}'.format(name, metric, old, new, ratio, flag))
+    if regressions:
+        print('{} regression(s) beyond {:.0%}'.format(len(regressions), args.threshold))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,15 @@
 import pygame
-import numpy as np
+
+
+# Fonts already created, by size. Creating a font looks it up on the system, far too slow to do for every frame.
+FONTS = {}
+
+def get_font(size):
+    if size not in FONTS:
+        FONTS[size] = pygame.font.SysFont('arial', size)
+    return FONTS[size]
+
+
 
 class Button:
     def __init__(self, coords, size, color, text=None):
@@ -9,22 +19,29 @@ class Button:
         self.height = size[1]
         self.color = color
         self.text = text
+        self.surface = None # The drawn button, made the first time it is drawn and then only copied onto the window
     
     
     
-    # Draw button and update display window
-    # If the button has some text associated with it, center the text on the button
-    def draw_button(self, win):
-        button_rect = pygame.draw.rect(win, self.color,(self.x, self.y, self.width, self.height))
+    # Draw the button (with its text centered on it) once onto its own surface
+    def render(self):
+        self.surface = pygame.Surface((self.width, self.height))
+        button_rect = pygame.draw.rect(self.surface, self.color, (0, 0, self.width, self.height))
         
         if self.text != None:
-            button_font = pygame.font.SysFont('arial',np.int(0.5*self.height))
-            button_render = button_font.render(self.text, True, (0,0,0))
+            button_render = get_font(int(0.5*self.height)).render(self.text, True, (0,0,0))
             cent_x, cent_y = button_rect.center
             button_text_location = (cent_x - button_render.get_width()/2, cent_y - button_render.get_height()/2)
-            win.blit(button_render, button_text_location)
-        
-        pygame.display.update()
+            self.surface.blit(button_render, button_text_location)
+    
+    
+    
+    # Draw button onto the window and return the rectangle it covers.
+    # The display is not updated here, the caller pushes the rectangle with the rest of the frame.
+    def draw_button(self, win):
+        if self.surface is None:
+            self.render()
+        return win.blit(self.surface, (self.x, self.y))
     
     
     
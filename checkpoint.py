@@ -0,0 +1,208 @@
+# Save and load a tessellation to a compact binary checkpoint file.
+#
+# The file holds the vertex store column by column, exactly as it is laid out in memory, so both saving and loading
+# are a handful of large reads/writes.  Layout:
+#     > MAGIC (8 bytes)
+#     > Length of the header (uint32, little endian), followed by the header as JSON
+#     > Each array, starting on a multiple of ALIGN bytes, at the offset given in the header
+#
+# The header records the cursor (current and reference vertex), the fill and polygon counters, any unfinished auto-fill,
+# the shapes in use and the state of the choice policy ('policy': its kind and shapes, and the state of its own random
+# number generator, see get_state in policy.py, or None for a policy that cannot be saved), plus the name, dtype, shape
+# and offset of every array, and the id of the journal started on top of it (see below).  The fill no longer draws from
+# numpy's global random number generator, so its state is not saved; the first checkpoints held it in 'rng' and
+# 'rng_keys' instead of 'policy' (and had no polygon counters), and they load with the tessellation's own policy.  The
+# arrays are the vertex store columns (lattice coordinates, neighbor ids, polygon count states, border pointers, filled
+# flags, filled wedges) and the store's hash table.  A column missing from an older checkpoint is loaded empty.
+#
+# Loading memory-maps the arrays copy-on-write: nothing is read until it is used, and growing the loaded tessellation
+# further never writes back into the checkpoint.
+#
+# A tessellation keeping a journal (see journal.py) can save incrementally: each step is appended to the journal file
+# next to the checkpoint as it is made, and loading the checkpoint replays them.  The journal file starts with the id
+# of its checkpoint, so a journal left over from an older checkpoint is never replayed on a newer one.
+
+import numpy as np
+import json
+import os
+import struct
+
+import configurations
+from vertex import VertexStore
+from policy import restore_policy
+
+MAGIC = b'NUTCKPT1' # Identifies checkpoint files (and the version of the format)
+JOURNAL_SUFFIX = '.journal' # Suffix of the file next to a checkpoint that the steps journaled after it are appended to
+ALIGN = 64 # Every array starts on a multiple of this many bytes
+
+
+
+# Write the tessellation to a checkpoint file.
+def save(tessellation, path):
+    store = tessellation.store
+    arrays = {name: getattr(store, name)[:store.size] for name in VertexStore.columns}
+    arrays['hash_keys'] = store.hash_keys
+    arrays['hash_ids'] = store.hash_ids
+
+    header = {
+        'size': store.size,
+        'shapes': list(tessellation.shapes),
+        'hash_used': store.hash_used,
+        'journal': os.urandom(8).hex(), # Identifies the journal file started by this checkpoint
+        'arrays': {},
+    }
+    header.update(cursor_state(tessellation, tessellation.policy))
+
+    # The offsets depend on the length of the header, which depends on the offsets: leave room for the offsets
+    # (fixed width numbers) before laying out the arrays.
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': 10**15}
+    start = aligned(len(MAGIC) + 4 + len(json.dumps(header)))
+    offset = start
+    for name, array in arrays.items():
+        header['arrays'][name]['offset'] = offset
+        offset = aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode().ljust(start - len(MAGIC) - 4)
+
+    # Written to a temporary file that then replaces the checkpoint, so a crash mid-save never leaves a broken
+    # checkpoint, and a tessellation loaded (memory-mapped) from the same path keeps reading the old file.
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(encoded)))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            np.ascontiguousarray(array).tofile(f)
+        f.truncate(offset)
+    os.replace(temp_path, path)
+
+    # Everything journaled so far is in the checkpoint, start the journal over on top of it
+    if tessellation.journal is not None:
+        with open(path + JOURNAL_SUFFIX, 'w') as f:
+            f.write(json.dumps({'checkpoint': header['journal']}) + '\n')
+        tessellation.journal.unwritten = []
+
+
+
+# The cursor and counters of the tessellation, and the state of the policy (None for policies that cannot be saved,
+# e.g. clicking buttons), as a dictionary that can be stored as JSON.
+def cursor_state(tessellation, policy):
+    get_state = getattr(policy, 'get_state', None)
+    return {
+        'current_vertex': tessellation.current_vertex.id,
+        'reference_vertex': tessellation.reference_vertex.id,
+        'vert_filled': tessellation.vert_filled,
+        'dead_end': tessellation.dead_end,
+        'poly_counts': tessellation.poly_counts.tolist(),
+        'rejected_polys': tessellation.rejected_polys,
+        'unfinished_autofill': [vert.id for vert in tessellation.unfinished_autofill],
+        'policy': get_state() if get_state is not None else None,
+    }
+
+
+
+# Put the cursor and counters of the tessellation back as they were in the state (the policy is left alone).
+def restore_cursor(tessellation, state):
+    store = tessellation.store
+    tessellation.current_vertex = store.vertex(state['current_vertex'])
+    tessellation.reference_vertex = store.vertex(state['reference_vertex'])
+    tessellation.vert_filled = state['vert_filled']
+    tessellation.dead_end = state['dead_end']
+    tessellation.poly_counts[:] = state['poly_counts']
+    tessellation.rejected_polys = state['rejected_polys']
+    tessellation.unfinished_autofill = [store.vertex(id) for id in state['unfinished_autofill']]
+
+
+
+# Read a checkpoint file into the given tessellation, replacing its vertices, cursor and counters.
+# The tessellation must have been created with the same shapes as the saved one.
+# If restore_saved_policy is True (and a policy was saved), the saved policy replaces the tessellation's policy, so the
+# fill continues with the same choices as the saved run would have made.
+def load(tessellation, path, restore_saved_policy=True):
+    header = read_header(path)
+    if tuple(header['shapes']) != tessellation.shapes:
+        raise ValueError('Checkpoint uses shapes {}, the tessellation uses {}'.format(tuple(header['shapes']), tessellation.shapes))
+    arrays = {name: np.memmap(path, dtype=np.dtype(info['dtype']), mode='c', offset=info['offset'], shape=tuple(info['shape']))
+              for name, info in header['arrays'].items()}
+
+    store = VertexStore(capacity=1, shapes=tessellation.shapes)
+    for name, (shape, dtype, empty) in VertexStore.columns.items():
+        setattr(store, name, arrays[name] if name in arrays else np.full((header['size'],) + shape, empty, dtype=dtype))
+    store.size = header['size']
+    store.filled = int(store.is_filled.sum())
+    store.hash_keys = arrays['hash_keys']
+    store.hash_ids = arrays['hash_ids']
+    store.hash_bits = len(store.hash_ids).bit_length() - 1
+    store.hash_used = header['hash_used']
+
+    # The first checkpoints have no policy or counters of polygons. The polygons are counted from the vertices, each
+    # is counted once at every corner.
+    if 'poly_counts' not in header:
+        header['poly_counts'] = (configurations.COUNTS[store.state[:store.size]].sum(axis=0) // configurations.SIDES).tolist()
+    header.setdefault('rejected_polys', 0)
+    header.setdefault('unfinished_autofill', [])
+
+    tessellation.store = store
+    tessellation.v0 = store.vertex(0)
+    tessellation.v1 = store.vertex(1)
+    restore_cursor(tessellation, header)
+
+    # Polygons are not saved, the spatial index is rebuilt from the vertices
+    if tessellation.polygon_index.enabled:
+        for poly_id, poly in tessellation.polygons():
+            tessellation.polygon_index.add(poly_id, poly)
+
+    if restore_saved_policy and header.get('policy') is not None:
+        tessellation.policy = restore_policy(header['policy'])
+
+    # Replay the steps journaled since the checkpoint was saved, if the journal belongs to it
+    journal_path = path + JOURNAL_SUFFIX
+    if os.path.exists(journal_path):
+        with open(journal_path) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if len(lines) > 1 and lines[0].get('checkpoint') == header.get('journal'):
+            replay(tessellation, lines[1:])
+    return tessellation
+
+
+
+# Make the journaled steps (and undos and redos) of the lines again, keeping them in the tessellation's journal so
+# they can still be undone.
+def replay(tessellation, lines):
+    if tessellation.journal is None:
+        tessellation.start_journal(tessellation.policy)
+    journal = tessellation.journal
+    for line in lines:
+        if 'undo' in line:
+            tessellation.undo()
+        elif 'redo' in line:
+            tessellation.redo()
+        else:
+            restore_cursor(tessellation, line['step']['before']) # The fill may have moved on between steps
+            journal.begin(tessellation)
+            tessellation.store.apply(line['step']['changes'])
+            restore_cursor(tessellation, line['step']['after'])
+            journal.end(tessellation, [(shape, tuple(corners)) for shape, corners in line['step']['polygons']])
+            tessellation.add_step_polygons(journal.steps[-1], draw=False) # Drawn with the rest by redraw
+
+    # The policy continues from its state after the last step
+    if journal.steps and journal.steps[-1].after['policy'] is not None and hasattr(journal.policy, 'set_state'):
+        journal.policy.set_state(journal.steps[-1].after['policy'])
+    journal.unwritten = []
+
+
+
+# Read only the header of a checkpoint file.
+def read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a tessellation checkpoint'.format(path))
+        length, = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(length).decode())
+
+
+
+# Round an offset up to the next multiple of ALIGN
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
@@ -0,0 +1,100 @@
+# Precomputed table of every polygon configuration a vertex can be in.
+#
+# A vertex is described by how many of each regular polygon surround it: [Triangles, Squares, Hexagons, Dodecagons].
+# The interior angles of these are 60, 90, 120 and 150 degrees, or 2, 3, 4 and 5 of the 12 lattice directions.
+# A vertex is completely filled when the angles add up to 12 (360 degrees).  Only 10 configurations do so:
+#     [6,0,0,0] [3,2,0,0] [0,4,0,0] [4,0,1,0] [2,0,2,0] [1,2,1,0] [0,0,3,0] [1,0,0,2] [2,1,0,1] [0,1,1,1]
+#
+# Each partial configuration is packed into a single integer state (a mixed radix number, see encode), and for every
+# state and every set of allowed shapes the following are computed once at import:
+#     > VALID: the state can still be completed, i.e. it is contained in one of the complete configurations.
+#       This replaces both the overfill check and the old list of excluded configurations ([4,1] and [1,3]).
+#     > FORCED: the polygons that must be added to complete the vertex, when there is exactly one way to do so that
+#       does not depend on the order of placement (a single kind of polygon).  Otherwise all zeros.
+#     > OPTIONS: the shapes that can still be added to the vertex, as a bit mask (bit s for shape id s).  Zero for
+#       complete and invalid states.
+# Checking a vertex or finding its forced completion is then a single table lookup.
+
+import numpy as np
+
+SHAPES = ('Triangle', 'Square', 'Hexagon', 'Dodecagon')
+SIDES = (3, 4, 6, 12) # Number of sides of each shape
+ANGLES = np.array([2,3,4,5]) # Interior angle of each shape, in units of 30 degrees
+FULL_ANGLE = 12 # Angle around a completely filled vertex, in units of 30 degrees
+AREAS = tuple(sides/(4*np.tan(np.pi/sides)) for sides in SIDES) # Area of each shape, with sides of unit length
+
+# Radix of each shape in the packed state. Each is two more than the most polygons of that shape that fit around a
+# vertex, so adding a single polygon to any valid state never overflows into the next shape's digit.
+RADIX = (8, 6, 5, 4)
+WEIGHTS = (1, 8, 48, 240) # Amount one polygon of each shape adds to the packed state
+NUM_STATES = 960 # Product of RADIX
+
+ALL_SHAPES = (1 << len(SHAPES)) - 1 # Bit mask allowing every shape
+
+
+
+# Pack an array of polygon counts [Triangles, Squares, Hexagons, Dodecagons] into a state.
+def encode(polys):
+    return sum(int(count)*weight for count, weight in zip(polys, WEIGHTS))
+
+
+
+# Bit mask of a collection of shape ids (0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon)
+def shape_mask(shapes):
+    mask = 0
+    for shape in shapes:
+        mask |= 1 << shape
+    return mask
+
+
+
+# Polygon counts and filled angle of every state
+COUNTS = np.array([[(state // weight) % radix for weight, radix in zip(WEIGHTS, RADIX)] for state in range(NUM_STATES)])
+ANGLE = COUNTS @ ANGLES
+
+# Every complete configuration
+COMPLETE = COUNTS[ANGLE == FULL_ANGLE]
+
+
+
+def _build_tables():
+    valid = np.zeros((ALL_SHAPES + 1, NUM_STATES), dtype=bool)
+    forced = np.zeros((ALL_SHAPES + 1, NUM_STATES, len(SHAPES)), dtype=np.int64)
+
+    for mask in range(1, ALL_SHAPES + 1):
+        # Complete configurations built only from allowed shapes
+        allowed = np.array([(mask >> shape) & 1 for shape in range(len(SHAPES))], dtype=bool)
+        complete = COMPLETE[(COMPLETE[:,~allowed] == 0).all(axis=1)]
+
+        # contains[s, c]: complete configuration c can be reached from state s by adding polygons
+        contains = (complete[None,:,:] >= COUNTS[:,None,:]).all(axis=2)
+        valid[mask] = contains.any(axis=1)
+
+        # Forced when exactly one completion exists and it uses a single kind of polygon
+        unique = contains.sum(axis=1) == 1
+        for state in np.flatnonzero(unique & (ANGLE < FULL_ANGLE)):
+            completion = complete[np.argmax(contains[state])] - COUNTS[state]
+            if np.count_nonzero(completion) == 1:
+                forced[mask, state] = completion
+
+    valid.setflags(write=False)
+    forced.setflags(write=False)
+    return valid, forced
+
+VALID, FORCED = _build_tables()
+
+
+
+# Shapes that can be added to each state without making it invalid, as bit masks
+def _build_options():
+    options = np.zeros((ALL_SHAPES + 1, NUM_STATES), dtype=np.int8)
+    states = np.arange(NUM_STATES)
+    for shape, weight in enumerate(WEIGHTS):
+        after = np.minimum(states + weight, NUM_STATES - 1)
+        can_add = VALID[:, states] & VALID[:, after] & (states + weight < NUM_STATES)
+        options |= (can_add << shape).astype(np.int8)
+    options.setflags(write=False)
+    return options
+
+OPTIONS = _build_options()
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(ALL_SHAPES + 1)]) # Number of shapes in each bit mask
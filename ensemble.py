@@ -0,0 +1,99 @@
+# Grow many independent random tilings in parallel and collect summary metrics for each one.
+#
+# Every run is a headless fill_tess in a worker process.  Each run gets its own seed, derived from a single base seed
+# with numpy's SeedSequence, so run i always produces the same tiling no matter how many workers there are or in which
+# order the runs finish.  Choices are uniform between the shapes, or follow the given relative weights.  Workers only
+# send back a small dictionary of metrics, so the runs scale with the number of cores.  Results are written to a JSON
+# lines file (one run per line) as soon as each run finishes:
+#     > run, seed, shapes, weights, max_fill: what was asked for
+#     > vert_filled, vertices, border: filled vertices, all vertices, and unfilled (border) vertices at the end
+#     > poly_counts: number of [Triangles, Squares, Hexagons, Dodecagons]
+#     > rejected_polys, dead_end: polygons that failed to insert, and whether the run stopped at a dead end
+#     > elapsed: seconds spent filling
+#
+# Usage:
+#     python ensemble.py --runs 1000 --max-fill 2500 --shapes 0 1 [--weights 3 1] --seed 0 --output ensemble.jsonl
+
+import numpy as np
+import multiprocessing
+import argparse
+import json
+import time
+
+from tessellation import Tessellation
+from tessellation_fill import fill_tess
+from policy import UniformPolicy, WeightedPolicy
+
+
+
+# Grow a single tiling and return its metrics. Takes a single tuple so it can be mapped over a pool.
+def run_one(task):
+    run, seed, shapes, weights, max_fill = task
+    policy = UniformPolicy(shapes, seed) if weights is None else WeightedPolicy(shapes, weights, seed)
+    tess = Tessellation(shapes=shapes, policy=policy)
+
+    start = time.perf_counter()
+    fill_tess(tess, max_fill)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'run': run,
+        'seed': seed,
+        'shapes': list(shapes),
+        'weights': list(weights) if weights is not None else None,
+        'max_fill': max_fill,
+        'vert_filled': tess.vert_filled,
+        'vertices': tess.store.size,
+        'border': len(tess.store.unfilled()),
+        'poly_counts': tess.poly_counts.tolist(),
+        'rejected_polys': tess.rejected_polys,
+        'dead_end': tess.dead_end,
+        'elapsed': elapsed,
+    }
+
+
+
+# Seed of every run, derived from the base seed. Run i gets the same seed for any number of runs.
+def run_seeds(seed, runs):
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(runs)]
+
+
+
+# Grow runs tilings of every size in max_fills across a pool of processes (all cores by default), appending one line
+# of metrics per run to output as the runs finish. weights are the relative probabilities of the shapes (None: equal).
+# Returns the number of runs written.
+def run_ensemble(runs, max_fills, shapes=(0,1), seed=0, processes=None, output='ensemble.jsonl', weights=None):
+    seeds = run_seeds(seed, runs)
+    weights = tuple(weights) if weights is not None else None
+    tasks = [(run, seeds[run], tuple(shapes), weights, max_fill) for max_fill in max_fills for run in range(runs)]
+
+    written = 0
+    with multiprocessing.Pool(processes) as pool, open(output, 'a') as f:
+        for result in pool.imap_unordered(run_one, tasks):
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            written += 1
+    return written
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grow many random tilings in parallel and record their metrics.')
+    parser.add_argument('--runs', type=int, default=100, help='number of tilings of each size')
+    parser.add_argument('--max-fill', type=int, nargs='+', default=[2500], help='vertices to fill (several sizes allowed)')
+    parser.add_argument('--shapes', type=int, nargs='+', default=[0, 1], help='0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon')
+    parser.add_argument('--weights', type=float, nargs='+', default=None, help='relative probability of each shape')
+    parser.add_argument('--seed', type=int, default=0, help='base seed that every run seed is derived from')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--output', default='ensemble.jsonl', help='JSON lines file the results are appended to')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = run_ensemble(args.runs, args.max_fill, args.shapes, args.seed, args.processes, args.output, args.weights)
+    elapsed = time.perf_counter() - start
+    print('Wrote {} runs to {} in {:.1f} s ({:.2f} runs/sec)'.format(written, args.output, elapsed, written/elapsed))
+
+
+
+if __name__ == "__main__":
+    main()
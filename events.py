@@ -0,0 +1,62 @@
+# Events yielded by Tessellation.grow as the tessellation grows.
+#
+# Every event is a small named tuple of plain numbers (vertex ids index the tessellation's VertexStore):
+#     > PolygonAdded(shape, corners, forced): a polygon of the given shape id was inserted, with the ids of its corners
+#       in order.  forced is True when the auto-fill added it (it was the only way to complete a vertex).
+#     > VertexFilled(vertex): the vertex became completely filled.
+#     > NextVertex(vertex, vert_filled): the fill moved on to the given vertex.  Nothing of the fill is held between
+#       vertices, so this is where a consumer can e.g. save a checkpoint.
+#     > Waiting(): the policy has not made a choice yet (e.g. waiting on a click).  Window events can be sent back
+#       into the generator for the policy, see Tessellation.grow.
+#     > Finished(vert_filled, dead_end): the fill has ended, with whether it stopped at a dead end.
+#
+# grow is a generator, so each consumer pulls events as it is ready for them, and nothing holds on to more than the
+# events of a single step of the fill.  Several consumers can share one fill with broadcast.
+
+from collections import namedtuple
+
+PolygonAdded = namedtuple('PolygonAdded', ['shape', 'corners', 'forced'])
+VertexFilled = namedtuple('VertexFilled', ['vertex'])
+NextVertex = namedtuple('NextVertex', ['vertex', 'vert_filled'])
+Waiting = namedtuple('Waiting', [])
+Finished = namedtuple('Finished', ['vert_filled', 'dead_end'])
+
+WAITING = Waiting()
+
+
+
+# Pass every event to each of the consumers (callables taking one event) in turn. Returns the last event.
+def broadcast(events, consumers):
+    event = None
+    for event in events:
+        for consumer in consumers:
+            consumer(event)
+    return event
+
+
+
+# Consumer accumulating statistics of the fill from its events
+class Statistics:
+    def __init__(self):
+        self.polygons = {} # Shape id: number of polygons added
+        self.forced = 0 # Polygons added by the auto-fill
+        self.vertices_filled = 0 # Vertices completely filled (by any polygon)
+        self.steps = 0 # Vertices the fill moved on to
+        self.dead_end = False
+
+    def __call__(self, event):
+        kind = type(event)
+        if kind is PolygonAdded:
+            self.polygons[event.shape] = self.polygons.get(event.shape, 0) + 1
+            self.forced += event.forced
+        elif kind is VertexFilled:
+            self.vertices_filled += 1
+        elif kind is NextVertex:
+            self.steps += 1
+        elif kind is Finished:
+            self.dead_end = event.dead_end
+
+    # Fraction of the added polygons of each shape
+    def fractions(self):
+        total = sum(self.polygons.values())
+        return {shape: count/total for shape, count in self.polygons.items()} if total else {}
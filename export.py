@@ -0,0 +1,148 @@
+# Vector export of tessellations, as SVG or as JSON lines.
+#
+# Both exporters are sinks (see render.py), so they can be given to a Tessellation (or combined with a window through
+# a TeeSink) and write every polygon as soon as it is inserted, while the tiling grows.  Nothing is kept per polygon:
+# each one is formatted and written straight to the file, so memory stays constant however large the tiling gets.
+# An already grown (or loaded) tessellation is exported with export_tessellation.
+#
+# Coordinates are in units of the polygon side length, with the first vertex of the tessellation at the origin and y
+# downward, as on the window.  Paths ending in .gz are written through a gzip stream (or pass compress=True).
+#     > JsonlSink: one JSON object per line
+#           {"type": "Square", "sides": 4, "color": [255, 0, 0], "coords": [[x0, y0], [x1, y1], ...]}
+#     > SvgSink: one <polygon> element per line, with the shape name as its class
+#
+# Usage:
+#     python export.py checkpoint.bin tiling.svg[.gz]|tiling.jsonl[.gz]
+
+import gzip
+import sys
+
+import configurations
+
+VIEWBOX_WIDTH = 64 # Characters reserved for the SVG viewBox, so it can be filled in once the extent is known
+
+
+
+# Open a text file for writing, through gzip if asked to or if the path ends in .gz
+def open_output(path, compress=None):
+    if compress is None:
+        compress = str(path).endswith('.gz')
+    if compress:
+        return gzip.open(path, 'wt', encoding='ascii'), True
+    return open(path, 'w', encoding='ascii'), False
+
+
+
+# Corners of a polygon as (x, y) pairs rounded to the given number of decimals
+def corner_coords(poly, precision):
+    return [(round(float(x), precision), round(float(y), precision)) for x, y in (vert.coords for vert in poly.vertex_list)]
+
+
+
+# Sink writing every polygon as a line of JSON
+class JsonlSink:
+    def __init__(self, path, compress=None, precision=6):
+        self.file, self.compressed = open_output(path, compress)
+        self.precision = precision # Decimals kept of each coordinate
+        self.polygons = 0 # Polygons written
+
+    def draw_poly(self, poly, color):
+        coords = ', '.join('[{!r}, {!r}]'.format(x, y) for x, y in corner_coords(poly, self.precision))
+        sides = len(poly.vertex_list)
+        self.file.write('{{"type": "{}", "sides": {}, "color": [{}, {}, {}], "coords": [{}]}}\n'.format(
+            shape_name(sides), sides, *color, coords))
+        self.polygons += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+
+# Sink writing every polygon as an SVG <polygon>.
+# The extent of the tiling is only known at the end.  A plain file gets its exact viewBox written in when closed, a
+# compressed stream cannot be rewritten, so it shows extent polygon sides around the origin instead.
+class SvgSink:
+    def __init__(self, path, compress=None, precision=4, extent=100, stroke=(0,0,0), stroke_width=0.05):
+        self.file, self.compressed = open_output(path, compress)
+        self.precision = precision # Decimals kept of each coordinate
+        self.polygons = 0 # Polygons written
+        self.bounds = None # [xmin, ymin, xmax, ymax] of every polygon written
+
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write('<svg xmlns="http://www.w3.org/2000/svg" viewBox="')
+        self.viewbox_offset = None if self.compressed else self.file.tell()
+        self.file.write(viewbox(-extent, -extent, extent, extent).ljust(VIEWBOX_WIDTH) + '">\n')
+        self.file.write('<g stroke="rgb({},{},{})" stroke-width="{}" stroke-linejoin="round">\n'.format(*stroke, stroke_width))
+
+    def draw_poly(self, poly, color):
+        corners = corner_coords(poly, self.precision)
+        xs = [x for x, y in corners]
+        ys = [y for x, y in corners]
+        if self.bounds is None:
+            self.bounds = [min(xs), min(ys), max(xs), max(ys)]
+        else:
+            self.bounds = [min(self.bounds[0], min(xs)), min(self.bounds[1], min(ys)),
+                           max(self.bounds[2], max(xs)), max(self.bounds[3], max(ys))]
+
+        points = ' '.join('{!r},{!r}'.format(x, y) for x, y in corners)
+        self.file.write('<polygon class="{}" fill="rgb({},{},{})" points="{}"/>\n'.format(
+            shape_name(len(corners)), *color, points))
+        self.polygons += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.write('</g>\n</svg>\n')
+        if self.viewbox_offset is not None and self.bounds is not None:
+            self.file.seek(self.viewbox_offset)
+            self.file.write(viewbox(*self.bounds).ljust(VIEWBOX_WIDTH))
+        self.file.close()
+
+
+
+# SVG viewBox covering the given bounds, with a small margin
+def viewbox(xmin, ymin, xmax, ymax, margin=0.5):
+    return '{:.6g} {:.6g} {:.6g} {:.6g}'.format(xmin - margin, ymin - margin, xmax - xmin + 2*margin, ymax - ymin + 2*margin)
+
+
+
+# Name of the regular polygon with the given number of sides
+def shape_name(sides):
+    return configurations.SHAPES[configurations.SIDES.index(sides)]
+
+
+
+# Sink for a path: SVG for .svg (or .svg.gz), JSON lines otherwise
+def export_sink(path, **options):
+    name = str(path)[:-3] if str(path).endswith('.gz') else str(path)
+    return SvgSink(path, **options) if name.endswith('.svg') else JsonlSink(path, **options)
+
+
+
+# Write every polygon of a tessellation to path (see export_sink). Returns the number of polygons written.
+def export_tessellation(tessellation, path, **options):
+    sink = export_sink(path, **options)
+    colors = (tessellation.tri_color, tessellation.sq_color, tessellation.hex_color, tessellation.dodec_color)
+    for poly_id, poly in tessellation.polygons():
+        sink.draw_poly(poly, colors[poly_id])
+    sink.close()
+    return sink.polygons
+
+
+
+def main():
+    from tessellation import Tessellation
+    if len(sys.argv) != 3:
+        print('Usage: python export.py checkpoint output.svg[.gz]|output.jsonl[.gz]')
+        return
+    count = export_tessellation(Tessellation.load(sys.argv[1]), sys.argv[2])
+    print('Wrote {} polygons to {}'.format(count, sys.argv[2]))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Opt-in instrumentation of a tessellation fill: per-phase timers, event counters and maxima.
+#
+# A tessellation (and fill_tess) always reports to an instrumentation object.  By default this is a
+# NullInstrumentation, whose methods do nothing, so an uninstrumented fill only pays for a few empty method calls.
+# Passing an Instrumentation to the Tessellation records:
+#     > phases: total seconds and number of calls of each phase.  Phases can be nested, each reports its full time:
+#         - choose: picking the next polygon (polling window events, or the random choice)
+#         - insert: building a polygon and inserting it (or failing to)
+#         - autofill: filling vertices with a single solution, including the inserts this makes
+#         - draw: handing polygons to the sink and flushing it
+#     > counters: number of times each event happened
+#         - polys_inserted, polys_rejected: polygons inserted, and rejected by check_add_poly ("Cannot add this polygon")
+#         - finish_fill, finish_fill_empty: vertices checked by the auto-fill, and those without a single solution
+#         - autofill_touched: vertices checked by all auto-fills together
+#     > maxima: largest value seen
+#         - autofill_touched: vertices checked by a single auto-fill (the size of the cascade)
+#         - autofill_depth: longest chain of vertices filled one because of the other in a single auto-fill
+#
+# A snapshot adds the size of the tessellation (filled vertices, all vertices, and the length of the border) and can
+# be written as JSON, or summarised in one line for the window caption.
+#
+# With a window, the fill runs on a worker thread while the window thread times the drawing and shows the caption (see
+# fill_tess), so every record and read of an Instrumentation holds its lock.
+
+import json
+import threading
+import time
+
+
+
+# Instrumentation that records nothing
+class NullInstrumentation:
+    enabled = False
+
+    def start(self):
+        return None
+
+    def stop(self, phase, started):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def maximum(self, name, value):
+        pass
+
+
+
+class Instrumentation:
+    enabled = True
+
+    def __init__(self):
+        self.phases = {} # Phase name: [total seconds, calls]
+        self.counters = {} # Event name: count
+        self.maxima = {} # Name: largest value seen
+        self.lock = threading.Lock() # Guards the records, which the worker and window threads of a fill both use
+
+
+
+    # Start timing a phase. Returns the start time to pass to stop.
+    def start(self):
+        return time.perf_counter()
+
+    # Add the time since started to a phase
+    def stop(self, phase, started):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            totals = self.phases.get(phase)
+            if totals is None:
+                self.phases[phase] = [elapsed, 1]
+            else:
+                totals[0] += elapsed
+                totals[1] += 1
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def maximum(self, name, value):
+        with self.lock:
+            if value > self.maxima.get(name, value - 1):
+                self.maxima[name] = value
+
+
+
+    # Everything recorded so far, plus the size of the tessellation, as a dictionary that can be stored as JSON.
+    def snapshot(self, tessellation):
+        store = tessellation.store
+        with self.lock:
+            return {
+                'vert_filled': tessellation.vert_filled,
+                'vertices': store.size,
+                'border': store.size - store.filled,
+                'dead_end': tessellation.dead_end,
+                'phases': {phase: {'seconds': seconds, 'calls': calls} for phase, (seconds, calls) in self.phases.items()},
+                'counters': dict(self.counters),
+                'maxima': dict(self.maxima),
+            }
+
+
+
+    # Write a snapshot to a JSON file.
+    def write_json(self, path, tessellation):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(tessellation), f, indent=2)
+
+
+
+    # One line summary for the window caption
+    def caption(self, tessellation, max_fill):
+        with self.lock:
+            phases = ' '.join('{} {:.2f}s'.format(phase, seconds) for phase, (seconds, calls) in self.phases.items())
+            rejected, cascade = self.counters.get('polys_rejected', 0), self.maxima.get('autofill_touched', 0)
+        return 'Filled {}/{} | border {} | rejected {} | cascade max {} | {}'.format(
+            tessellation.vert_filled, max_fill, tessellation.store.size - tessellation.store.filled,
+            rejected, cascade, phases)
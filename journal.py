@@ -0,0 +1,94 @@
+# Journal of the steps of a fill, so that they can be undone and redone (see Tessellation.undo and Tessellation.redo).
+#
+# A step is everything one choice of the policy changes: the polygon it adds and the auto-fill that follows.  Every
+# change to the vertices is already recorded on the VertexStore's undo trail with the value it replaced, so undoing a
+# step is store.undo back to the mark taken when the step began.  When a step ends, the new values of what it changed
+# are read off the store once (store.changes), so redoing a step makes the same changes again without repeating the
+# fill.  Either way the cost follows the size of the step, not the size of the tessellation.
+#
+# Each step also keeps the cursor and counters of the tessellation (see checkpoint.cursor_state) from before and after
+# it, and the polygons it added, so the polygon index and the window can follow.
+#
+# The steps can also be appended to a file as the fill goes, one JSON line each, as an incremental save on top of a
+# checkpoint: checkpoint.load replays them (see checkpoint.py).
+
+import json
+
+import checkpoint
+
+
+class Step:
+    def __init__(self, mark, before, polygons_before):
+        self.mark = mark # Length of the store's undo trail when the step began
+        self.before = before # Cursor and counters of the tessellation before the step
+        self.polygons_before = polygons_before # Size of the polygon index before the step
+        self.after = None # Cursor and counters after the step
+        self.changes = None # (column, id, direction, new value) of every change to the vertices, see VertexStore.changes
+        self.polygons = [] # (shape id, corner ids) of every polygon added, in order
+
+    # One line of a journal file
+    def to_json(self):
+        return json.dumps({'step': {'before': self.before, 'after': self.after, 'changes': self.changes, 'polygons': self.polygons}})
+
+
+
+class Journal:
+    def __init__(self, store):
+        self.store = store
+        self.mark = store.mark() # Start recording every change on the store's undo trail
+        self.steps = [] # Steps that can be undone, oldest first
+        self.undone = [] # Steps that can be redone, the most recently undone last
+        self.step = None # Step being recorded
+        self.policy = None # Policy making the choices of the steps, its state is kept with the cursor
+        self.unwritten = [] # Lines not yet appended to the journal file
+
+    def __len__(self):
+        return len(self.steps)
+
+
+
+    # Start recording a step, taken when the policy has chosen the polygon to add
+    def begin(self, tessellation):
+        self.step = Step(self.store.mark(), checkpoint.cursor_state(tessellation, self.policy), len(tessellation.polygon_index))
+
+    # Finish the step being recorded, with the (shape id, corner ids) of the polygons it added. A choice that added
+    # nothing (the polygon did not fit) is not kept as a step. Any step that was undone can no longer be redone.
+    def end(self, tessellation, polygons):
+        step = self.step
+        self.step = None
+        if not polygons:
+            return
+        step.after = checkpoint.cursor_state(tessellation, self.policy)
+        step.changes = self.store.changes(step.mark)
+        step.polygons = polygons
+        self.steps.append(step)
+        self.undone = []
+        self.unwritten.append(step.to_json())
+
+
+
+    # Take the last step off the journal (or put an undone one back). Returns None if there is none.
+    def pop_undo(self):
+        if not self.steps:
+            return None
+        step = self.steps.pop()
+        self.undone.append(step)
+        self.unwritten.append(json.dumps({'undo': 1}))
+        return step
+
+    def pop_redo(self):
+        if not self.undone:
+            return None
+        step = self.undone.pop()
+        self.steps.append(step)
+        self.unwritten.append(json.dumps({'redo': 1}))
+        return step
+
+
+
+    # Append the steps (and undos and redos) since the last write to the journal file
+    def write(self, path):
+        if self.unwritten:
+            with open(path, 'a') as f:
+                f.write(''.join(line + '\n' for line in self.unwritten))
+            self.unwritten = []
@@ -0,0 +1,85 @@
+# Exact coordinates for the vertices of the tessellation.
+#
+# Every polygon edge has unit length and points along one of the 12 directions w^k, where w = exp(i*pi/6).
+# Any vertex is therefore an integer combination of these 12 directions.  Since w^4 = w^2 - 1 (and so w^6 = -1),
+# every such combination can be written uniquely as
+#     a + b*w + c*w^2 + d*w^3
+# with integers (a, b, c, d).  Vertices store these 4-tuples: moving along an edge is integer addition, and the
+# direction between two adjacent vertices is found with a dictionary lookup instead of trigonometry.
+
+import numpy as np
+
+N_DIRECTIONS = 12 # Number of directions an edge can point along, each 360/12 degrees apart
+
+# Lattice coordinates of the unit vector in each of the 12 directions.
+# Directions 6-11 are the negatives of directions 0-5.
+_HALF_TURN = ((1,0,0,0), (0,1,0,0), (0,0,1,0), (0,0,0,1), (-1,0,1,0), (0,-1,0,1))
+DIRECTIONS = _HALF_TURN + tuple(tuple(-x for x in d) for d in _HALF_TURN)
+
+# Inverse of DIRECTIONS: unit vector -> direction index
+DIRECTION_INDEX = {d: k for k, d in enumerate(DIRECTIONS)}
+
+# Cartesian coordinates of the basis 1, w, w^2, w^3
+BASIS = np.array([[np.cos(k*np.pi/6), np.sin(k*np.pi/6)] for k in range(4)])
+
+# The same basis with sqrt(3) changed to -sqrt(3) (w to w^5): the perpendicular coordinates of a lattice point. Every
+# edge moves one side there as well, but along a tiling the moves mostly cancel out: vertices tens of sides apart on
+# the plane are only a few sides apart there.
+PERP_BASIS = np.array([[np.cos(5*k*np.pi/6), np.sin(5*k*np.pi/6)] for k in range(4)])
+
+
+
+# Move from a point one unit along the given direction.
+def step(coords, direction):
+    d = DIRECTIONS[direction % N_DIRECTIONS]
+    return (coords[0]+d[0], coords[1]+d[1], coords[2]+d[2], coords[3]+d[3])
+
+
+
+# Direction index of the unit edge from point a to point b, or None if the points are not one edge apart.
+def direction(a, b):
+    return DIRECTION_INDEX.get((b[0]-a[0], b[1]-a[1], b[2]-a[2], b[3]-a[3]))
+
+
+
+# Cartesian (x, y) coordinates of a lattice point, or of an (n, 4) array of lattice points.
+def to_cartesian(coords):
+    return np.dot(coords, BASIS)
+
+# Perpendicular coordinates (see PERP_BASIS) of a lattice point, or of an (n, 4) array of lattice points.
+def to_perpendicular(coords):
+    return np.dot(coords, PERP_BASIS)
+
+
+
+# Pack lattice coordinates into a single integer, used as a hash key for the point.
+# Each coordinate is stored in 16 bits, so points are limited to coordinates in [-32768, 32767].
+PACK_OFFSET = 1 << 15
+
+def pack(coords):
+    if not all(-PACK_OFFSET <= x < PACK_OFFSET for x in coords):
+        raise OverflowError('Lattice coordinates {} are too large to pack'.format(coords))
+    return ((coords[0]+PACK_OFFSET) << 48) | ((coords[1]+PACK_OFFSET) << 32) | ((coords[2]+PACK_OFFSET) << 16) | (coords[3]+PACK_OFFSET)
+
+
+
+# Vectorized pack for an (n, 4) array of lattice points. Returns an array of np.uint64 keys.
+def pack_array(coords):
+    shifted = (np.asarray(coords, dtype=np.int64) + PACK_OFFSET).astype(np.uint64)
+    return (shifted[:,0] << 48) | (shifted[:,1] << 32) | (shifted[:,2] << 16) | shifted[:,3]
+
+
+
+# The angle around a vertex is cut into 12 wedges of 30 degrees: wedge k runs from direction k to direction k+1.
+# Bit mask of the units wedges counter-clockwise from the given direction (the angle covered by a polygon corner).
+def wedge_mask(direction, units):
+    return sum(1 << ((direction + k) % N_DIRECTIONS) for k in range(units))
+
+# For each mask of filled wedges, the most counter-clockwise edge of a filled arc: the first direction with a filled
+# wedge just before it and an open one after it. -1 if no wedge or every wedge is filled.
+ARC_END = np.array([next((k for k in range(N_DIRECTIONS) if (mask >> (k - 1) % N_DIRECTIONS) & 1 and not (mask >> k) & 1), -1)
+                    for mask in range(1 << N_DIRECTIONS)], dtype=np.int8)
+
+# Number of separate filled arcs for each mask of filled wedges: 0 if no wedge or every wedge is filled.
+ARC_COUNT = np.array([sum(1 for k in range(N_DIRECTIONS) if (mask >> (k - 1) % N_DIRECTIONS) & 1 and not (mask >> k) & 1)
+                      for mask in range(1 << N_DIRECTIONS)], dtype=np.int8)
@@ -1,8 +1,13 @@
 from tessellation import Tessellation
 from tessellation_fill import *
-from button import Button
+import configurations
+from instrument import Instrumentation
+from policy import UniformPolicy, WeightedPolicy
+from export import export_sink
+from render import PygameSink, TeeSink
 import numpy as np
-import pygame
+import time
+import os
 
 
 
@@ -12,8 +17,44 @@ def main():
     polygon_side_length = 12 # How large is the polygon
     maximum_vertices_filled = 2500 # How large is the entire tessellation
     randomly_fill_vertices = True # Should each choice of polygon be made by a person (False) or filled randomly (True)
+    polygon_shapes = (0, 1) # Which polygons to build with: 0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon
+    polygon_weights = None # Relative probability of each of the shapes when filling randomly (None: all equally likely)
+    random_seed = None # Seed of the random choices, the same seed always gives the same tessellation (None: a new one)
+    headless = False # Fill without a window (pygame is not needed) and report the generation rate
+    checkpoint_file = None # Save the tessellation to this file as it grows, and resume from it if it already exists
+    instrument_file = None # Record timers and counters of the fill (shown in the window title) and save them to this file
+    export_file = None # Write every polygon to this .svg or .jsonl file (.gz to compress) as the tessellation grows
     
+    instrument = Instrumentation() if instrument_file is not None else None
+    if polygon_weights is None:
+        policy = UniformPolicy(polygon_shapes, random_seed)
+    else:
+        policy = WeightedPolicy(polygon_shapes, polygon_weights, random_seed)
     
+    
+    if headless:
+        # Pure generation: no window, no drawing, every choice made at random
+        sink = export_sink(export_file) if export_file is not None else None
+        if checkpoint_file is not None and os.path.exists(checkpoint_file):
+            tess = Tessellation.load(checkpoint_file, sink=sink, instrument=instrument)
+            if sink is not None:
+                tess.redraw() # The export also gets the polygons of the saved tessellation
+        else:
+            tess = Tessellation(shapes=polygon_shapes, sink=sink, instrument=instrument, policy=policy)
+        start = time.perf_counter()
+        fill_tess(tess, maximum_vertices_filled, checkpoint_path=checkpoint_file)
+        elapsed = time.perf_counter() - start
+        print('Filled {} vertices in {:.3f} s ({:.0f} vertices/sec)'.format(
+            tess.vert_filled, elapsed, tess.vert_filled/elapsed))
+        tess.sink.close()
+        if instrument is not None:
+            instrument.write_json(instrument_file, tess)
+        return
+    
+    # pygame is only required when drawing to a window
+    import pygame
+    from button import Button
+    from viewer import Viewer
         
     # Set up the Pygame window
     pygame.init()
@@ -26,32 +67,39 @@ def main():
     win = pygame.display.set_mode((xmax,ymax))
     win.fill((255,255,255)) # White Background
 
-    # Setup button properties for adding triangles and squares
-    # Buttons located at at bottom middle of screen with slight offset. (Pixel location of top left corner)
+    # Setup button properties for adding each polygon shape
+    # Buttons located at at bottom middle of screen, side by side with a slight gap. (Pixel location of top left corner)
     # If the vertices will be randomly filled, we do not need to initialize or redraw these buttons
     button_list = []
     if not randomly_fill_vertices:
         button_size = np.array([100,50])
+        gap = 4
+        left = xmax//2 - (len(polygon_shapes)*(button_size[0] + gap) - gap)//2
 
-        tri_but_loc = np.array([xmax//2,ymax]) - button_size - np.array([2,0])
-        tri_but = Button(tri_but_loc, button_size, (200,200,200), 'Triangle')
+        for i, shape in enumerate(polygon_shapes):
+            but_loc = np.array([left + i*(button_size[0] + gap), ymax - button_size[1]])
+            button_list.append(Button(but_loc, button_size, (200,200,200), configurations.SHAPES[shape]))
 
-        sq_but_loc = np.array([xmax//2,ymax]) - np.array([0,1])*button_size + np.array([2,0])
-        sq_but = Button(sq_but_loc, button_size, (200,200,200), 'Square')
-        
-        button_list = [tri_but, sq_but]
+    # Draw to the window, and also to the export file if there is one
+    sink = PygameSink(win, center, polygon_side_length)
+    if export_file is not None:
+        sink = TeeSink(sink, export_sink(export_file))
 
-    # Initialize the tessellation
-    tess = Tessellation(win, center, polygon_side_length)
+    # Initialize the tessellation, or continue a saved one (drawing everything it already has)
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        tess = Tessellation.load(checkpoint_file, win, center, polygon_side_length, sink, instrument=instrument)
+        tess.redraw()
+    else:
+        tess = Tessellation(win, center, polygon_side_length, sink, shapes=polygon_shapes, instrument=instrument, policy=policy)
     
-    # Continue to fill and display until quiting
-    run = True
-    while run and fill_tess(tess, maximum_vertices_filled, win, button_list, randomly_fill_vertices):
-        for event in pygame.event.get():       
-            if event.type == pygame.QUIT:
-                run = False
+    # Fill and display, then pan and zoom around the tessellation until quiting
+    if fill_tess(tess, maximum_vertices_filled, win, button_list, randomly_fill_vertices, checkpoint_file):
+        Viewer(tess, win, center, polygon_side_length).run()
     
+    tess.sink.close()
     pygame.quit()
+    if instrument is not None:
+        instrument.write_json(instrument_file, tess)
     
 
     
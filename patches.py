@@ -0,0 +1,623 @@
+# Grow one large tessellation as a grid of cells, several cells at once in worker processes.
+#
+# A single tessellation grows along one border, one vertex at a time.  Here the plane is cut into a grid of square
+# cells, each grown on its own by a worker with its own seed, and the seams between the cells are closed afterwards:
+#     > Each cell is filled by the region solver (see solver.py), stopping short of the sides it shares with other
+#       cells (see seam_width), so neighboring patches never meet.  The cells depend on nothing else, and are all grown
+#       at once.
+#     > Patches grown apart only fit together where their borders agree in perpendicular coordinates (see lattice.py),
+#       and a tiling grown at random wanders off there by a few sides across a cell.  So every vertex of every patch
+#       is kept within WINDOW of the origin there (each patch grown from the lattice point of its cell nearest the
+#       origin there, see cell_origin), and the patches stay close enough everywhere for their seams to be closed.
+#     > Each seam is closed by the solver on a band around it.  The polygons centered in the band are taken out, and
+#       the band is filled again from the borders of the patches on both sides, checking every polygon against the
+#       vertices and edges around it (check_overlap), as those borders can meet anywhere.  Where the band cannot be
+#       filled, it is widened into the patches, taking more of them out each time (see close_seam).
+#     > The seams along the sides of the cells are closed first, all at once, each stopping short of the junctions
+#       where four cells meet, and left open there.  A junction closed as a pocket between four patches would have to
+#       hold a number of squares fixed by its border, which the seams around it leave to chance, so each junction is
+#       closed together with one of the seams along its sides (left open until then), reaching the next junction
+#       towards the edge of the grid or past the edge.  The junctions farthest from the edge are closed first (in four
+#       batches each time, so the junctions closed at once are two cells apart), and each stays open into a junction
+#       closed later, until the last ones open past the edge of the grid.
+#     > A seam that cannot be closed even at the widest band is left open. Everything right of the middle of the
+#       column of cells before it is then taken out and grown again by the solver in one piece (not in parallel), from
+#       the border left, so the grid is always completed.
+#     > A worker is given the polygons around its cell or seam, builds a vertex store from them in one vectorized pass
+#       (build_store), and returns the polygons it added and those it took out.  The main process only keeps every
+#       polygon as arrays (corners, sides and shape of each), and builds the vertex store of the whole tessellation
+#       from them once, at the end.
+# The first cell is centered on the origin, where the first vertex of the tessellation is.
+#
+# Usage:
+#     python patches.py --columns 8 --rows 8 --cell 50 --shapes 0 1 --seed 0 --processes 4 --output tiling.bin
+#     python patches.py --check
+
+import numpy as np
+import multiprocessing
+import argparse
+import time
+import sys
+
+import configurations
+import lattice
+from vertex import VertexStore
+from tessellation import Tessellation
+from render import NullSink
+from solver import RegionSolver, RectangleRegion, DiskRegion, UnionRegion, COVER_MARGIN
+from ensemble import run_seeds
+
+BANDS = (0, 1, 2, 3) # Width added to a seam's band on each try, in gap widths (see close_seam)
+SEEDS = 2 # Seeds tried for each width
+MAX_NODES = 2000 # Choices tried for a cell or a seam before starting it again with the next seed or width
+WINDOW = 1.5 # Radius around the origin in perpendicular coordinates every vertex of the patches and seams is kept in
+
+# Direction of each unit lattice vector, indexed by its coordinates (each -1, 0 or 1) read as a base 3 number
+DIRECTION_TABLE = np.full(81, -1, dtype=np.int64)
+for k, d in enumerate(lattice.DIRECTIONS):
+    DIRECTION_TABLE[sum((x + 1)*3**i for i, x in enumerate(d))] = k
+
+
+
+# Build a vertex store from polygons, given back to back by the lattice coordinates of their corners (in order around
+# each polygon, either way round), with the number of sides and the shape id of each polygon.
+def build_store(corners, sides, shape_ids, shapes):
+    corners = np.asarray(corners, dtype=np.int64).reshape(-1, 4)
+    sides = np.asarray(sides, dtype=np.int64)
+    shape_ids = np.asarray(shape_ids, dtype=np.int64)
+
+    # One vertex for each distinct point, numbered in the order the points first appear
+    keys, first, inverse = np.unique(lattice.pack_array(corners), return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    vertex = rank[inverse]
+
+    store = VertexStore(capacity=1 << max(len(keys) - 1, 1).bit_length(), shapes=shapes) # The hash needs a power of two
+    store.lattice[:len(keys)] = corners[first[order]]
+    store.size = len(keys)
+    store.rehash(2*len(store.is_filled))
+
+    # Previous and next corner of every corner
+    starts = np.repeat(np.cumsum(sides) - sides, sides)
+    position = np.arange(len(corners)) - starts
+    polygon_sides = np.repeat(sides, sides)
+    following = starts + (position + 1) % polygon_sides
+    preceding = starts + (position - 1) % polygon_sides
+    to_next = direction_between(corners, corners[following])
+    to_previous = direction_between(corners, corners[preceding])
+
+    # The polygon covers the angle from its first edge counter-clockwise to its second, whichever way round it was given
+    angle = configurations.ANGLES[np.repeat(shape_ids, sides)]
+    start = np.where((to_next + angle) % lattice.N_DIRECTIONS == to_previous, to_next, to_previous)
+    end = (start + angle) % lattice.N_DIRECTIONS
+    wedges = np.zeros(len(corners), dtype=np.int64)
+    for k in range(configurations.ANGLES.max()):
+        wedges |= np.where(k < angle, 1 << ((start + k) % lattice.N_DIRECTIONS), 0)
+
+    store.neighbors[vertex, to_next] = vertex[following]
+    store.neighbors[vertex, to_previous] = vertex[preceding]
+    np.add.at(store.state, vertex, np.asarray(configurations.WEIGHTS)[np.repeat(shape_ids, sides)].astype(store.state.dtype))
+    filled_wedges = np.zeros(store.size, dtype=np.int64)
+    np.bitwise_or.at(filled_wedges, vertex, wedges)
+
+    store.is_filled[:store.size] = configurations.ANGLE[store.state[:store.size]] == configurations.FULL_ANGLE
+    store.filled = int(store.is_filled[:store.size].sum())
+    store.wedges[:store.size] = filled_wedges
+    store.ccw_max_index[vertex] = end # Filled vertices keep the end of any of their polygons
+    arc_end = lattice.ARC_END[filled_wedges]
+    open_side = arc_end >= 0
+    store.ccw_max_index[:store.size][open_side] = arc_end[open_side]
+    return store
+
+
+
+# Direction of the unit edge from each point to the matching other point
+def direction_between(a, b):
+    difference = b - a
+    return DIRECTION_TABLE[((difference + 1)*np.array([1, 3, 9, 27])).sum(axis=1)]
+
+
+
+# Replace the vertices of a tessellation with a store, as loading a checkpoint does. It continues from its oldest
+# vertex that is not filled yet.
+def adopt_store(tessellation, store):
+    tessellation.store = store
+    tessellation.v0 = store.vertex(0)
+    tessellation.v1 = store.vertex(1)
+    tessellation.vert_filled = store.filled
+    unfilled = store.unfilled()
+    if len(unfilled):
+        tessellation.current_vertex = store.vertex(int(unfilled[0]))
+        tessellation.reference_vertex = tessellation.current_vertex.neighbor(tessellation.current_vertex.ccw_max_index)
+
+
+
+# Widest polygon of the shapes (the diameter of its corners' circle): the corners of a polygon are at most half this
+# away from its center.
+def gap_width(shapes):
+    return max(1/np.sin(np.pi/configurations.SIDES[shape]) for shape in shapes)
+
+
+
+# How far the polygons placed by the solver can reach past its region: they complete every vertex within COVER_MARGIN
+# of it. A cell stops this far short of a seam, so the patches on either side of it leave an open gap.
+def seam_width(shapes):
+    return COVER_MARGIN + gap_width(shapes)
+
+
+
+# Length of the arms of the cross around a junction, which the seams along the sides of the cells stop short of. The
+# seams closed at once, widened as far as BANDS allows, are then too far apart for their polygons to meet.
+def junction_width(shapes):
+    gap = gap_width(shapes)
+    return 3*seam_width(shapes) + BANDS[-1]*gap + gap
+
+
+
+# Polygons this close to a seam's band are given to its worker: those in the widest band it may refill, and those
+# around it (holding the borders it grows from, and checked against the polygons it adds).
+def context_width(shapes):
+    return (BANDS[-1] + 1)*gap_width(shapes) + 2*seam_width(shapes)
+
+
+
+# Seed of an attempt at a cell or a seam
+def attempt_seed(seed, attempt):
+    return int(np.random.SeedSequence([seed, attempt]).generate_state(1)[0])
+
+
+
+# The polygons of a tessellation as arrays: the lattice coordinates of their corners back to back, and the number of
+# sides and shape id of each.
+def polygon_arrays(store, polygons):
+    corners, sides, shape_ids = [], [], []
+    for shape_id, poly in polygons:
+        corners.append(store.lattice[[vert.id for vert in poly.vertex_list]])
+        sides.append(len(poly.vertex_list))
+        shape_ids.append(shape_id)
+    return (np.concatenate(corners).astype(np.int16) if corners else np.zeros((0,4), dtype=np.int16),
+            np.array(sides, dtype=np.int8), np.array(shape_ids, dtype=np.int8))
+
+
+
+# Center of each polygon, given as corners back to back with the number of sides of each
+def polygon_centers(corners, sides):
+    if len(sides) == 0:
+        return np.zeros((0,2))
+    starts = np.cumsum(sides.astype(np.int64)) - sides
+    return np.add.reduceat(lattice.to_cartesian(corners), starts)/sides[:,None]
+
+
+
+# The polygons of a tessellation built from the given polygons (the store then holding given vertices) that were added
+# since, as arrays: those with a new corner, or made of corners that were there but not one of the polygons given
+# (filling a notch of the border).
+def added_polygons(tess, given, corners, sides):
+    store = tess.store
+    starts = np.cumsum(sides.astype(np.int64)) - sides
+    known = {frozenset(lattice.pack_array(corners[start:start+count]).tolist())
+             for start, count in zip(starts.tolist(), sides.tolist())}
+    return polygon_arrays(store, [(shape_id, poly) for shape_id, poly in tess.polygons()
+                                  if max(vert.id for vert in poly.vertex_list) >= given
+                                  or frozenset(lattice.pack_array(store.lattice[[vert.id for vert in poly.vertex_list]]).tolist())
+                                  not in known])
+
+
+
+# The lattice point a cell is grown from, near (x, y) and as near the origin as it can be in perpendicular coordinates
+# (see lattice.py), so the first vertex of the patch is well inside WINDOW.
+def cell_origin(x, y):
+    b, c = round(x/np.sqrt(3)), round(y/np.sqrt(3)) # Perpendicular coordinates 0 means x = 2a + c = b*sqrt(3), and
+    a, d = round((x - c)/2), round((y - b)/2)       # y = b + 2d = c*sqrt(3)
+    steps = np.array(np.meshgrid(*[(-1, 0, 1)]*4)).reshape(4, -1).T
+    points = np.array([a, b, c, d]) + steps
+    near = np.hypot(*(lattice.to_cartesian(points) - (x, y)).T) <= 2
+    points = points[near]
+    return points[np.argmin(np.hypot(*lattice.to_perpendicular(points).T))]
+
+
+
+# Fill one cell, short of its inner sides. Takes a single tuple so it can be mapped over a pool: the cell's index and
+# seed, the shapes, the bounds of the region to fill and the solver's node limit. The cell is grown from a new
+# tessellation, on its own, and moved to the lattice point of cell_origin.
+# A cell gets SEEDS tries in the window. The last try is not kept in the window and has no node limit, so the cell is
+# always filled (the seams around it are then unlikely to close, see grow_cells).
+# Returns the polygons grown, with the number of choices and attempts it took.
+def grow_core(task):
+    index, seed, shapes, (xmin, ymin, xmax, ymax), max_nodes = task
+    started = time.perf_counter()
+    offset = cell_origin((xmin + xmax)/2, (ymin + ymax)/2)
+    x, y = lattice.to_cartesian(offset)
+    px, py = lattice.to_perpendicular(offset)
+    region = RectangleRegion(xmin - x, ymin - y, xmax - x, ymax - y)
+    window = DiskRegion(-px, -py, WINDOW) # Around the origin, seen from the first vertex of the patch
+    nodes = 0
+    for attempt in range(SEEDS + 1):
+        tess = Tessellation(shapes=shapes)
+        solver = RegionSolver(tess, region, attempt_seed(seed, attempt), max_nodes if attempt < SEEDS else None,
+                              window=window if attempt < SEEDS else None)
+        solved = solver.solve()
+        nodes += solver.nodes
+        if solved:
+            break
+    corners, sides, shape_ids = polygon_arrays(tess.store, tess.polygons())
+    return {
+        'index': index,
+        'corners': corners + offset.astype(np.int16),
+        'sides': sides,
+        'shape_ids': shape_ids,
+        'refilled': np.zeros(0, dtype=np.int64),
+        'closed': True,
+        'nodes': nodes,
+        'attempts': attempt + 1,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+
+# Close one seam. Takes a single tuple so it can be mapped over a pool: the seam's index and seed, the shapes, the
+# rectangles of its band (each as bounds, and which way it is widened: 1 or 0 along x and along y), the bounds of the
+# rectangles closed by a later stage (where the seam may leave vertices with separate arcs), the polygons around it
+# (corners, sides and shape ids) and the solver's node limit.
+# The polygons centered in the band are taken out, and the band is filled again from the borders around it. After
+# SEEDS tries, the band is widened by the next width of BANDS.
+# Returns the polygons added, and the polygons given that were taken out (as indices into those given), with whether
+# the seam was closed (if not, nothing is added or taken out) and the number of choices and attempts it took.
+def close_seam(task):
+    index, seed, shapes, rectangles, later, corners, sides, shape_ids, max_nodes = task
+    gap = gap_width(shapes)
+    centers = polygon_centers(corners, sides)
+    later = UnionRegion(RectangleRegion(*bounds) for bounds in later)
+    window = DiskRegion(0, 0, WINDOW)
+    started = time.perf_counter()
+    nodes = 0
+    closed = False
+    for attempt in range(len(BANDS)*SEEDS):
+        band = BANDS[attempt // SEEDS]*gap
+        bounds = [(xmin - band*along_x, ymin - band*along_y, xmax + band*along_x, ymax + band*along_y)
+                  for (xmin, ymin, xmax, ymax), (along_x, along_y) in rectangles]
+        refill = UnionRegion(RectangleRegion(*rectangle) for rectangle in bounds).contains(centers)
+        given = None
+        tess = Tessellation(shapes=shapes)
+        adopt_store(tess, build_store(corners[np.repeat(~refill, sides)], sides[~refill], shape_ids[~refill], tess.shapes))
+        store = tess.store
+
+        # The corners of the polygons taken out are at most half a gap outside the band, and must be filled again
+        region = UnionRegion(RectangleRegion(xmin - gap/2, ymin - gap/2, xmax + gap/2, ymax + gap/2)
+                             for xmin, ymin, xmax, ymax in bounds)
+        unfilled = store.unfilled()
+        inside = region.contains(lattice.to_cartesian(store.lattice[unfilled]), COVER_MARGIN)
+        if not inside.any(): # The patches happen to meet exactly
+            refill[:] = False
+            closed = True
+            break
+        tess.current_vertex = store.vertex(int(unfilled[inside][0]))
+        given = store.size # Vertices before the seam is filled again
+
+        solver = RegionSolver(tess, region, attempt_seed(seed, attempt), max_nodes, check_overlap=True, later=later,
+                              window=window)
+        closed = solver.solve()
+        nodes += solver.nodes
+        if closed:
+            break
+
+    if closed and given is not None:
+        new_corners, new_sides, new_shape_ids = added_polygons(tess, given, corners[np.repeat(~refill, sides)], sides[~refill])
+    else:
+        refill[:] = False
+        new_corners, new_sides, new_shape_ids = polygon_arrays(None, [])
+    return {
+        'index': index,
+        'corners': new_corners,
+        'sides': new_sides,
+        'shape_ids': new_shape_ids,
+        'refilled': np.flatnonzero(refill),
+        'closed': closed,
+        'nodes': nodes,
+        'attempts': attempt + 1,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+
+# Every polygon of the tessellation so far, as arrays. Polygons are added a stage at a time, and those taken out again
+# to be refilled are only marked as removed, so indices stay the same.
+class Polygons:
+    def __init__(self):
+        self.corners = np.zeros((0,4), dtype=np.int16) # Lattice coordinates of the corners of each polygon, back to back
+        self.sides = np.zeros(0, dtype=np.int8) # Number of sides of each polygon
+        self.shape_ids = np.zeros(0, dtype=np.int8)
+        self.bounds = np.zeros((0,4)) # xmin, ymin, xmax, ymax of each polygon
+        self.removed = np.zeros(0, dtype=bool)
+
+    def add(self, corners, sides, shape_ids):
+        if len(sides) == 0:
+            return
+        points = lattice.to_cartesian(corners)
+        starts = np.cumsum(sides.astype(np.int64)) - sides
+        self.corners = np.concatenate([self.corners, corners])
+        self.sides = np.concatenate([self.sides, sides])
+        self.shape_ids = np.concatenate([self.shape_ids, shape_ids])
+        self.bounds = np.concatenate([self.bounds, np.column_stack([np.minimum.reduceat(points, starts),
+                                                                    np.maximum.reduceat(points, starts)])])
+        self.removed = np.concatenate([self.removed, np.zeros(len(sides), dtype=bool)])
+
+    def remove(self, indices):
+        self.removed[indices] = True
+
+    # Corners, sides and shape ids of the polygons at the given indices (in order)
+    def select(self, indices):
+        mask = np.zeros(len(self.sides), dtype=bool)
+        mask[indices] = True
+        return self.corners[np.repeat(mask, self.sides)], self.sides[mask], self.shape_ids[mask]
+
+    def arrays(self):
+        return self.select(np.flatnonzero(~self.removed))
+
+    # Indices of the polygons whose bounding box meets the rectangle
+    def near(self, xmin, ymin, xmax, ymax):
+        bounds = self.bounds
+        meets = (bounds[:,0] <= xmax) & (bounds[:,2] >= xmin) & (bounds[:,1] <= ymax) & (bounds[:,3] >= ymin)
+        return np.flatnonzero(meets & ~self.removed)
+
+
+
+# Bounds (xmin, ymin, xmax, ymax) of cell (column, row), the first cell centered on the origin
+def cell_bounds(column, row, cell):
+    return ((column - 0.5)*cell, (row - 0.5)*cell, (column + 0.5)*cell, (row + 0.5)*cell)
+
+
+
+# Cells must be wide enough for the seams along their sides to stop short of the junctions at their corners
+def min_cell(shapes):
+    return 2*junction_width(shapes)
+
+
+
+# The regions grown for a columns x rows grid: the bounds of each cell (stopping a seam width short of every side
+# shared with another cell), and the seams in stages, each a list of seams closed at once. Each seam is given as the
+# rectangles of its band (bounds, and how the band widens) and the bounds of the rectangles closed by a later stage.
+def layout(columns, rows, cell, shapes):
+    seam = seam_width(shapes)
+    junction = junction_width(shapes)
+    gap = gap_width(shapes)
+    cells = []
+    for row in range(rows):
+        for column in range(columns):
+            xmin, ymin, xmax, ymax = cell_bounds(column, row, cell)
+            cells.append((xmin + seam*(column > 0), ymin + seam*(row > 0),
+                          xmax - seam*(column < columns - 1), ymax - seam*(row < rows - 1)))
+
+    # The cross around the junction below and right of cell (column, row): its arm along x, then its arm along y
+    def arms(column, row):
+        x, y = (column + 0.5)*cell, (row + 0.5)*cell
+        return [((x - junction, y - seam, x + junction, y + seam), (0, 1)),
+                ((x - seam, y - junction, x + seam, y + junction), (1, 0))]
+
+    # The seams along the sides of the cells: ('x', column, row) between columns column and column + 1 in the row, and
+    # ('y', column, row) between rows row and row + 1 in the column. Each is its band, and the junctions at its ends
+    # (None where it reaches past the edge of the grid).
+    sides = {}
+    for row in range(rows):
+        for column in range(columns - 1):
+            x = (column + 0.5)*cell
+            ymin = (row - 0.5)*cell + junction if row > 0 else -0.5*cell - seam
+            ymax = (row + 0.5)*cell - junction if row < rows - 1 else (rows - 0.5)*cell + seam
+            sides['x', column, row] = (((x - seam, ymin, x + seam, ymax), (1, 0)),
+                                       ((column, row - 1) if row > 0 else None, (column, row) if row < rows - 1 else None))
+    for column in range(columns):
+        for row in range(rows - 1):
+            y = (row + 0.5)*cell
+            xmin = (column - 0.5)*cell + junction if column > 0 else -0.5*cell - seam
+            xmax = (column + 0.5)*cell - junction if column < columns - 1 else (columns - 0.5)*cell + seam
+            sides['y', column, row] = (((xmin, y - seam, xmax, y + seam), (0, 1)),
+                                       ((column - 1, row) if column > 0 else None, (column, row) if column < columns - 1 else None))
+
+    # A seam may leave vertices with separate arcs in the arm along it of the junction at its end, out to the corners
+    # of the polygons the junction refills
+    def later(key, end):
+        (xmin, ymin, xmax, ymax), (along_x, along_y) = arms(*end)[key[0] == 'x']
+        return (xmin - gap/2*along_x, ymin - gap/2*along_y, xmax + gap/2*along_x, ymax + gap/2*along_y)
+
+    # Each junction is closed with the seam along its sides leading towards the nearest edge of the grid (through the
+    # fewest junctions), so it stays open until then
+    parents = {}
+    for row in range(rows - 1):
+        for column in range(columns - 1):
+            steps = {('y', column, row): column + 1, ('x', column, row): row + 1,
+                     ('y', column + 1, row): columns - 1 - column, ('x', column, row + 1): rows - 1 - row}
+            key = min(steps, key=steps.get)
+            parents[column, row] = (key, steps[key])
+
+    tree = {key for key, depth in parents.values()}
+    stages = [[([band], [later(key, end) for end in ends if end is not None])
+               for key, (band, ends) in sides.items() if key not in tree]]
+    for depth in range(max((depth for key, depth in parents.values()), default=0), 0, -1):
+        for parity in range(4):
+            batch = []
+            for (column, row), (key, steps) in parents.items():
+                if steps == depth and column % 2 + 2*(row % 2) == parity:
+                    band, ends = sides[key]
+                    batch.append((arms(column, row) + [band],
+                                  [later(key, end) for end in ends if end is not None and end != (column, row)]))
+            if batch:
+                stages.append(batch)
+    return cells, stages
+
+
+
+# Take out every polygon centered right of x, and grow everything right of it within the bounds of the grid again with
+# the solver, in one piece from the border left (or the whole grid from the origin, if nothing is left).
+# Returns the polygons added, the indices of the polygons taken out, and the solver.
+def regrow(polygons, x, bounds, shapes, seed):
+    gap = gap_width(shapes)
+    xmin, ymin, xmax, ymax = bounds
+    kept = np.flatnonzero(~polygons.removed)
+    corners, sides, shape_ids = polygons.select(kept)
+    taken = polygon_centers(corners, sides)[:,0] >= x
+    if not taken.all():
+        tess = Tessellation(shapes=shapes)
+        adopt_store(tess, build_store(corners[np.repeat(~taken, sides)], sides[~taken], shape_ids[~taken], tess.shapes))
+        store = tess.store
+        region = RectangleRegion(x - gap/2, ymin, xmax, ymax)
+        unfilled = store.unfilled()
+        inside = region.contains(lattice.to_cartesian(store.lattice[unfilled]), COVER_MARGIN)
+        tess.current_vertex = store.vertex(int(unfilled[inside][0]))
+        given = store.size
+        solver = RegionSolver(tess, region, seed, check_overlap=True)
+        if solver.solve():
+            return added_polygons(tess, given, corners[np.repeat(~taken, sides)], sides[~taken]), kept[taken], solver
+        taken[:] = True # The border left cannot be grown from after all
+
+    tess = Tessellation(shapes=shapes)
+    solver = RegionSolver(tess, RectangleRegion(xmin, ymin, xmax, ymax), seed)
+    solver.solve()
+    return polygon_arrays(tess.store, tess.polygons()), kept, solver
+
+
+
+# Grow a columns x rows grid of cells of cell x cell polygon sides, across a pool of processes (all cores by default):
+# every cell at once, then the seams along their sides, then the junctions. Returns the tessellation and a dictionary
+# of timings and counts.
+# Extra options (e.g. sink, index) are passed on to the Tessellation, which is given every polygon once grown.
+def grow_cells(columns, rows, cell, shapes=(0,1), seed=0, processes=None, max_nodes=MAX_NODES, **options):
+    shapes = tuple(shapes)
+    if cell <= min_cell(shapes):
+        raise ValueError('Cells must be wider than {:.2f} polygon sides'.format(min_cell(shapes)))
+    cells, stages = layout(columns, rows, cell, shapes)
+    seeds = run_seeds(seed, len(cells) + sum(len(stage) for stage in stages) + 1)
+    gap = gap_width(shapes)
+    context = context_width(shapes)
+    polygons = Polygons()
+    nodes = 0
+    attempts = 0
+    refilled = 0
+    closed = 0
+    cut = None # Left of every seam left open, and of every polygon it could have changed
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.map(grow_core, [(index, seeds[index], shapes, bounds, max_nodes) for index, bounds in enumerate(cells)]):
+            polygons.add(result['corners'], result['sides'], result['shape_ids'])
+            nodes += result['nodes']
+            attempts += result['attempts']
+        grown = time.perf_counter()
+
+        index = len(cells)
+        for stage in stages:
+            tasks = []
+            given = [] # Indices of the polygons given to each task
+            for rectangles, later in stage:
+                bounds = np.array([rectangle for rectangle, widen in rectangles])
+                near = polygons.near(bounds[:,0].min() - context, bounds[:,1].min() - context,
+                                     bounds[:,2].max() + context, bounds[:,3].max() + context)
+                given.append(near)
+                tasks.append((index, seeds[index], shapes, rectangles, later) + polygons.select(near) + (max_nodes,))
+                index += 1
+            for (rectangles, later), near, result in zip(stage, given, pool.map(close_seam, tasks)):
+                polygons.remove(near[result['refilled']])
+                polygons.add(result['corners'], result['sides'], result['shape_ids'])
+                refilled += len(result['refilled'])
+                closed += result['closed']
+                nodes += result['nodes']
+                attempts += result['attempts']
+                if not result['closed']:
+                    reach = min(xmin - BANDS[-1]*gap*along_x for (xmin, ymin, xmax, ymax), (along_x, along_y) in rectangles)
+                    reach -= gap/2 + seam_width(shapes) # Past the corners of the polygons it took out and added
+                    cut = reach if cut is None else min(cut, reach)
+    closing = time.perf_counter()
+
+    # Grow everything right of the middle of the column of cells left of every seam left open again
+    regrown = 0
+    if cut is not None:
+        x = np.floor(cut/cell)*cell
+        (xmin, ymin, _, _), (_, _, xmax, ymax) = cell_bounds(0, 0, cell), cell_bounds(columns - 1, rows - 1, cell)
+        (corners, sides, shape_ids), taken, solver = regrow(polygons, x, (xmin, ymin, xmax, ymax), shapes, seeds[index])
+        polygons.remove(taken)
+        polygons.add(corners, sides, shape_ids)
+        regrown = len(taken)
+        nodes += solver.nodes
+    closed_all = time.perf_counter()
+
+    corners, sides, shape_ids = polygons.arrays()
+    tess = Tessellation(shapes=shapes, **options)
+    adopt_store(tess, build_store(corners, sides, shape_ids, tess.shapes))
+    tess.poly_counts[:] = np.bincount(shape_ids, minlength=len(tess.poly_counts))
+    if tess.polygon_index.enabled or not isinstance(tess.sink, NullSink):
+        tess.redraw()
+        for poly_id, poly in tess.polygons():
+            tess.polygon_index.add(poly_id, poly)
+    finished = time.perf_counter()
+
+    return tess, {
+        'cells': columns*rows,
+        'seams': index - len(cells),
+        'closed': closed,
+        'polygons': len(sides),
+        'vertices': tess.store.size,
+        'vert_filled': tess.store.filled,
+        'nodes': nodes,
+        'attempts': attempts,
+        'refilled': refilled,
+        'regrown': regrown,
+        'grow_seconds': grown - started,
+        'seam_seconds': closing - grown,
+        'regrow_seconds': closed_all - closing,
+        'merge_seconds': finished - closed_all,
+    }
+
+
+
+# Grow grids that must come out whole, 3 x 3 and 4 x 4 cells with each seed, and check them with validate.py.
+# Returns the names of the grids that failed.
+def self_check(seeds=range(3), cell=30, shapes=(0,1), processes=None):
+    from validate import validate
+    failures = []
+    for columns, rows in ((3, 3), (4, 4)):
+        for seed in seeds:
+            tess, stats = grow_cells(columns, rows, cell, shapes, seed, processes)
+            if not validate(tess)['ok']:
+                failures.append('{} x {} seed {}'.format(columns, rows, seed))
+    return failures
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grow a tessellation as a grid of cells, several cells at once.')
+    parser.add_argument('--columns', type=int, default=4, help='cells across')
+    parser.add_argument('--rows', type=int, default=4, help='cells down')
+    parser.add_argument('--cell', type=float, default=30, help='width of each cell, in polygon sides')
+    parser.add_argument('--shapes', type=int, nargs='+', default=[0, 1], help='0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon')
+    parser.add_argument('--seed', type=int, default=0, help='base seed that every cell seed is derived from')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--max-nodes', type=int, default=MAX_NODES, help='most choices tried for a cell or a seam before starting it again')
+    parser.add_argument('--output', default=None, help='.svg or .jsonl file (.gz to compress) of the polygons, or a checkpoint')
+    parser.add_argument('--check', action='store_true', help='grow 3 x 3 and 4 x 4 grids with a few seeds and validate them')
+    args = parser.parse_args()
+
+    if args.check:
+        failures = self_check(processes=args.processes)
+        print('\n'.join('Failed: ' + name for name in failures) or 'Every check passed')
+        sys.exit(1 if failures else 0)
+
+    tess, stats = grow_cells(args.columns, args.rows, args.cell, args.shapes, args.seed, args.processes, args.max_nodes)
+    print('{} cells grown in {:.2f} s, {} of {} seams closed in {:.2f} s ({} polygons refilled), {} polygons grown '
+          'again in {:.2f} s, merged in {:.2f} s: {} polygons, {} vertices, {} filled'.format(
+              stats['cells'], stats['grow_seconds'], stats['closed'], stats['seams'], stats['seam_seconds'],
+              stats['refilled'], stats['regrown'], stats['regrow_seconds'], stats['merge_seconds'], stats['polygons'],
+              stats['vertices'], stats['vert_filled']))
+
+    if args.output is not None:
+        name = args.output[:-3] if args.output.endswith('.gz') else args.output
+        if name.endswith('.svg') or name.endswith('.jsonl'):
+            from export import export_tessellation
+            export_tessellation(tess, args.output)
+        else:
+            tess.save(args.output)
+        print('Wrote {}'.format(args.output))
+
+
+
+if __name__ == "__main__":
+    main()
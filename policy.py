@@ -0,0 +1,147 @@
+# Policies deciding which polygon to add next when filling a tessellation.
+#
+# fill_tess asks the policy for a shape id (0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon) every time it needs to add a
+# polygon at the current vertex:
+#     > choose(tessellation, events): the shape to add, or None if there is no choice yet (e.g. waiting on a click).
+#       events are the window events since the last call (empty when headless).
+#     > finished: set once the policy has no more choices to make, which ends the fill.
+#
+# Random policies draw from their own seeded numpy Generator, so a seed reproduces a fill exactly, independently of
+# numpy's global random state.  Choices are drawn in large blocks, so the fill only indexes into a list.
+# Their state (the generator at the start of the current block, and the position in it) can be saved with get_state
+# and restored with restore_policy, which is how checkpoints resume a fill exactly.
+
+import numpy as np
+
+BLOCK_SIZE = 4096 # Number of random choices drawn at once
+
+
+
+# Choose uniformly at random between the shapes
+class UniformPolicy:
+    name = 'uniform'
+    finished = False
+
+    def __init__(self, shapes, seed=None, block_size=BLOCK_SIZE):
+        self.shapes = tuple(shapes) # Shapes to choose from
+        self.seed = seed
+        self.block_size = block_size
+        self.rng = np.random.default_rng(seed)
+        self.draw_block()
+
+    # Draw the next block of choices, remembering the generator state it was drawn from
+    def draw_block(self):
+        self.block_state = self.rng.bit_generator.state
+        self.block = self.draw(self.block_size)
+        self.position = 0
+
+    def draw(self, size):
+        return np.asarray(self.shapes)[self.rng.integers(len(self.shapes), size=size)].tolist()
+
+    def choose(self, tessellation, events=()):
+        if self.position == len(self.block):
+            self.draw_block()
+        shape = self.block[self.position]
+        self.position += 1
+        return shape
+
+    # Everything needed to continue making the same choices, as a dictionary that can be stored as JSON
+    def get_state(self):
+        return {'policy': self.name, 'shapes': list(self.shapes), 'block_size': self.block_size,
+                'block_state': self.block_state, 'position': self.position}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['block_state']
+        self.draw_block()
+        self.position = state['position']
+
+
+
+# Choose at random with the given relative weight for each shape (e.g. weights=(3,1) makes 3 in 4 choices triangles
+# when building with triangles and squares).
+class WeightedPolicy(UniformPolicy):
+    name = 'weighted'
+
+    def __init__(self, shapes, weights, seed=None, block_size=BLOCK_SIZE):
+        if len(weights) != len(shapes) or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError('Need one non-negative weight for each of the shapes {}, got {}'.format(tuple(shapes), tuple(weights)))
+        self.weights = tuple(weights)
+        self.probabilities = np.asarray(weights, dtype=float)/sum(weights)
+        super().__init__(shapes, seed, block_size)
+
+    def draw(self, size):
+        return np.asarray(self.shapes)[self.rng.choice(len(self.shapes), size=size, p=self.probabilities)].tolist()
+
+    def get_state(self):
+        state = super().get_state()
+        state['weights'] = list(self.weights)
+        return state
+
+
+
+# Make the choices in the given order. Once the sequence runs out, it starts over if repeat is True, otherwise the
+# policy is finished.
+class ScriptedPolicy:
+    name = 'scripted'
+
+    def __init__(self, sequence, repeat=False):
+        self.sequence = list(sequence) # Shape ids, in the order they are chosen
+        self.repeat = repeat
+        self.position = 0
+        self.finished = len(self.sequence) == 0
+
+    def choose(self, tessellation, events=()):
+        shape = self.sequence[self.position]
+        self.position += 1
+        if self.position == len(self.sequence):
+            if self.repeat:
+                self.position = 0
+            else:
+                self.finished = True
+        return shape
+
+    def get_state(self):
+        return {'policy': self.name, 'sequence': self.sequence, 'repeat': self.repeat, 'position': self.position}
+
+    def set_state(self, state):
+        self.position = state['position']
+        self.finished = not self.repeat and self.position == len(self.sequence)
+
+
+
+# Let a person choose by clicking one of the buttons, one button for each of the shapes in the same order.
+# Needs a window, so pygame is imported when the policy is created.
+class ButtonPolicy:
+    name = 'buttons'
+    finished = False
+
+    def __init__(self, shapes, buttons):
+        import pygame
+        self.pygame = pygame
+        self.shapes = tuple(shapes)
+        self.buttons = list(buttons)
+
+    def choose(self, tessellation, events=()):
+        shape = None
+        for event in events:
+            if event.type == self.pygame.MOUSEBUTTONDOWN:
+                for button_shape, button in zip(self.shapes, self.buttons):
+                    if button.mouse_on_button(event.pos):
+                        shape = button_shape
+        return shape
+
+
+
+# Create a policy from a state returned by get_state, continuing with the same choices.
+def restore_policy(state):
+    kind = state['policy']
+    if kind == 'uniform':
+        policy = UniformPolicy(state['shapes'], block_size=state['block_size'])
+    elif kind == 'weighted':
+        policy = WeightedPolicy(state['shapes'], state['weights'], block_size=state['block_size'])
+    elif kind == 'scripted':
+        policy = ScriptedPolicy(state['sequence'], state['repeat'])
+    else:
+        raise ValueError('Cannot restore a policy of kind {}'.format(kind))
+    policy.set_state(state)
+    return policy
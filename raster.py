@@ -0,0 +1,166 @@
+# Offscreen rasterizer for tessellations of any size.
+#
+# The pygame window can only show a tessellation that fits on the screen.  This sink instead records every polygon
+# (compactly, as float32 corner coordinates) and afterwards rasterizes the whole tessellation in fixed size square
+# tiles.  Only one tile of pixels is held in memory at a time, and each finished tile is written straight to disk,
+# either as its own PNG file or into a memory-mapped raw RGB image.  The scale (pixels per polygon side) is free, so
+# the output can be far larger than any window.
+#
+# Pixels are laid out the same way as on the window: x to the right and y downward.
+# No pygame (or image library) is needed, PNG files are written with zlib directly.
+
+import numpy as np
+import struct
+import zlib
+import os
+
+
+class TiledRasterSink:
+    def __init__(self, scale, tile_size=4096, background=(255,255,255), border=(0,0,0)):
+        self.scale = scale # Length of each side of polygons in pixels
+        self.tile_size = tile_size # Width and height of each tile in pixels
+        self.background = background # RGB color where there is no polygon
+        self.border = border # RGB color of the 1 pixel outline around every polygon
+
+        # Polygons are stored back to back: the corners of polygon i are points[starts[i]:starts[i]+sides[i]]
+        self.num_polys = 0
+        self.num_points = 0
+        self.points = np.zeros((1024,2), dtype=np.float32)
+        self.starts = np.zeros(256, dtype=np.int64)
+        self.sides = np.zeros(256, dtype=np.int8)
+        self.colors = np.zeros((256,3), dtype=np.uint8)
+
+
+
+    # Record a polygon, in units of the polygon side length.
+    def draw_poly(self, poly, color):
+        corners = np.array([vert.coords for vert in poly.vertex_list], dtype=np.float32)
+
+        # Double the storage whenever it runs out
+        while self.num_points + len(corners) > len(self.points):
+            self.points = np.concatenate([self.points, np.zeros_like(self.points)])
+        if self.num_polys == len(self.starts):
+            self.starts = np.concatenate([self.starts, np.zeros_like(self.starts)])
+            self.sides = np.concatenate([self.sides, np.zeros_like(self.sides)])
+            self.colors = np.concatenate([self.colors, np.zeros_like(self.colors)])
+
+        self.points[self.num_points:self.num_points+len(corners)] = corners
+        self.starts[self.num_polys] = self.num_points
+        self.sides[self.num_polys] = len(corners)
+        self.colors[self.num_polys] = color
+        self.num_points += len(corners)
+        self.num_polys += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+
+    # Pixel bounding box (xmin, ymin, xmax, ymax) of every polygon, with the image origin at the top left corner.
+    # Also returns the (width, height) of the image, which has a one pixel margin around the tessellation.
+    def pixel_bounds(self):
+        pts = self.points[:self.num_points].astype(np.float64)*self.scale
+        starts = self.starts[:self.num_polys]
+        lo = np.minimum.reduceat(pts, starts, axis=0)
+        hi = np.maximum.reduceat(pts, starts, axis=0)
+        self.origin = lo.min(axis=0) - 1 # Pixel position of the tessellation point (0, 0) is -origin
+        size = np.ceil(hi.max(axis=0) - self.origin + 1).astype(int)
+        return np.hstack([lo - self.origin, hi - self.origin]), (int(size[0]), int(size[1]))
+
+
+
+    # Rasterize a single tile with top left pixel (x0, y0), returning an (h, w, 3) uint8 array.
+    def render_tile(self, bounds, x0, y0, w, h):
+        tile = np.empty((h, w, 3), dtype=np.uint8)
+        tile[:] = self.background
+
+        # Only polygons whose bounding box reaches into the tile
+        hits = np.flatnonzero((bounds[:,0] < x0 + w) & (bounds[:,2] >= x0) & (bounds[:,1] < y0 + h) & (bounds[:,3] >= y0))
+        for i in hits:
+            corners = self.points[self.starts[i]:self.starts[i]+self.sides[i]].astype(np.float64)*self.scale - self.origin
+
+            # Pixel window of the polygon, clipped to the tile
+            px0 = max(int(np.floor(bounds[i,0])) - 1, x0)
+            px1 = min(int(np.ceil(bounds[i,2])) + 1, x0 + w)
+            py0 = max(int(np.floor(bounds[i,1])) - 1, y0)
+            py1 = min(int(np.ceil(bounds[i,3])) + 1, y0 + h)
+            if px0 >= px1 or py0 >= py1:
+                continue
+            xs = np.arange(px0, px1) + 0.5 # Pixel centers
+            ys = np.arange(py0, py1)[:,None] + 0.5
+
+            # Signed distance (in pixels) from every pixel center to every edge, positive inside the convex polygon
+            edges = np.roll(corners, -1, axis=0) - corners
+            orientation = np.sign(np.sum(corners[:,0]*np.roll(corners[:,1],-1) - np.roll(corners[:,0],-1)*corners[:,1]))
+            lengths = np.hypot(edges[:,0], edges[:,1])
+            dist = np.full((py1-py0, px1-px0), np.inf)
+            for (cx, cy), (ex, ey), length in zip(corners, edges, lengths):
+                dist = np.minimum(dist, orientation*(ex*(ys - cy) - ey*(xs - cx))/length)
+
+            # Fill the polygon, then outline it with a 1 pixel wide border centered on its edges
+            window = tile[py0-y0:py1-y0, px0-x0:px1-x0]
+            window[dist >= 0.5] = self.colors[i]
+            window[(dist > -0.5) & (dist < 0.5)] = self.border
+        return tile
+
+
+
+    # Iterate over every tile of the image as (row, col, x0, y0, tile array).
+    def tiles(self):
+        bounds, (width, height) = self.pixel_bounds()
+        for row, y0 in enumerate(range(0, height, self.tile_size)):
+            for col, x0 in enumerate(range(0, width, self.tile_size)):
+                w = min(self.tile_size, width - x0)
+                h = min(self.tile_size, height - y0)
+                yield row, col, x0, y0, self.render_tile(bounds, x0, y0, w, h)
+
+
+
+    # Write every tile as its own PNG file, tile_<row>_<col>.png, in the given directory.
+    # Returns the (width, height) of the full image.
+    def write_png_tiles(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for row, col, x0, y0, tile in self.tiles():
+            write_png(os.path.join(directory, 'tile_{}_{}.png'.format(row, col)), tile)
+        return self.image_size()
+
+
+
+    # Write the full image into a memory-mapped raw RGB file (height x width x 3 bytes, row major).
+    # Returns the (width, height) of the full image.
+    def write_raw(self, path):
+        width, height = self.image_size()
+        image = np.memmap(path, dtype=np.uint8, mode='w+', shape=(height, width, 3))
+        for row, col, x0, y0, tile in self.tiles():
+            image[y0:y0+tile.shape[0], x0:x0+tile.shape[1]] = tile
+            image.flush()
+        del image
+        return width, height
+
+
+
+    # (width, height) of the full image in pixels
+    def image_size(self):
+        return self.pixel_bounds()[1]
+
+
+
+# Write an (h, w, 3) uint8 array as an 8-bit RGB PNG file.
+def write_png(path, rgb):
+    height, width = rgb.shape[:2]
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    # Every scanline starts with filter type 0 (no filter)
+    raw = np.zeros((height, 1 + 3*width), dtype=np.uint8)
+    raw[:,1:] = rgb.reshape(height, 3*width)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
@@ -0,0 +1,172 @@
+# Rendering sinks for the tessellation.
+#
+# The tessellation never draws anything itself.  Every polygon that is successfully inserted is handed to a sink
+# together with its color, and the sink decides what to do with it.  This keeps the generation code free of pygame,
+# so a tiling can be grown on a machine without a display (or without pygame installed at all).
+#
+# Every sink provides the same three methods:
+#     > draw_poly(poly, color): receive a newly inserted polygon
+#     > flush(): push anything that is buffered to its destination
+#     > close(): flush and release any resources held by the sink
+# A sink that can take polygons away again (a window) also provides erase(erased, redrawn), called when a step of the
+# fill is undone: erased are the corner coordinates of the removed polygons, redrawn (corners, color) the remaining
+# polygons around them, which are drawn again over the cleared area.
+
+import numpy as np
+import threading
+import time
+
+
+# Sink that discards every polygon.  Used for pure generation runs.
+class NullSink:
+    def draw_poly(self, poly, color):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+
+# Sink that draws polygons onto a pygame window.
+# pygame is only imported when this sink is created, so headless runs never need it.
+#
+# Polygons are queued rather than drawn immediately.  Once per frame (frame_time seconds) the queue is drawn, followed
+# by any overlays (e.g. buttons) and the window caption, and only the union of the rectangles that changed is pushed
+# to the display.  This replaces a full display update for every single polygon.
+# With auto_flush False, polygons are only queued and another thread (the one that owns the window) calls flush, see
+# fill_tess.
+class PygameSink:
+    def __init__(self, win, center, scale, frame_time=1/60, background=(255,255,255)):
+        import pygame
+        self.pygame = pygame
+
+        self.win = win # Window where the Tessellation will be drawn
+        self.center = center # Location on window of the center of the tessellation
+        self.scale = scale # Length of each side of polygons in pixels
+        self.background = background # Color of the window where there is no polygon
+        
+        self.frame_time = frame_time # Minimum time between display updates, in seconds
+        self.auto_flush = True # Push a frame from draw_poly once frame_time has passed
+        self.lock = threading.Lock() # Guards the queue, polygons can be queued from another thread than flush is called from
+        self.last_flush = 0. # Time of the last display update
+        self.queue = [] # Polygons (pixel coords, color, width, border color) waiting to be drawn
+        self.dirty = [win.get_rect()] # Rectangles of the window changed since the last display update (all of it at first)
+        
+        self.overlays = [] # Objects drawn on top of the tessellation every frame, with draw_button(win) -> rect
+        self.caption = None # Window caption to show at the next frame
+        self.shown_caption = None # Window caption currently shown
+
+    def draw_poly(self, poly, color, width=0):
+        self.draw_corners([vert.coords for vert in poly.vertex_list], color, width)
+        
+    def draw_corners(self, corners, color, width=0, outline=(0,0,0)):
+        vertex_coords = []
+        for coords in corners:
+            vertex_coords.append(tuple(self.center + self.scale*np.asarray(coords)))
+        with self.lock:
+            self.queue.append((tuple(vertex_coords), color, width, outline))
+        
+        # Push the frame once the time budget is used up
+        if self.auto_flush and time.perf_counter() - self.last_flush >= self.frame_time:
+            self.flush()
+
+    # Draw every queued polygon, then the overlays, and update only the changed parts of the display
+    def flush(self):
+        with self.lock:
+            queue, self.queue = self.queue, []
+        if queue:
+            for vertex_coords, color, width, outline in queue:
+                rect = self.pygame.draw.polygon(self.win, color, vertex_coords, width)
+                rect = self.pygame.draw.polygon(self.win, outline, vertex_coords, 1) # Add a (black) border to the polygon
+                self.dirty.append(rect)
+            
+            # The tessellation may have been drawn over the overlays
+            for overlay in self.overlays:
+                self.dirty.append(overlay.draw_button(self.win))
+        
+        if self.caption != self.shown_caption:
+            self.pygame.display.set_caption(self.caption)
+            self.shown_caption = self.caption
+        
+        if self.dirty:
+            self.pygame.display.update(self.dirty)
+            self.dirty = []
+        self.last_flush = time.perf_counter()
+        
+    # Clear the erased polygons to the background and draw the polygons around them again
+    def erase(self, erased, redrawn):
+        for corners in erased:
+            self.draw_corners(corners, self.background, outline=self.background)
+        for corners, color in redrawn:
+            self.draw_corners(corners, color)
+        
+    # Draw the overlays without waiting for a polygon to be drawn
+    def draw_overlays(self):
+        for overlay in self.overlays:
+            self.dirty.append(overlay.draw_button(self.win))
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+
+# The PygameSink among the sinks of a TeeSink (however deeply nested), or the sink itself if it is one. None if no
+# sink draws to a window.
+def window_sink(sink):
+    if isinstance(sink, PygameSink):
+        return sink
+    for inner in getattr(sink, 'sinks', ()):
+        found = window_sink(inner)
+        if found is not None:
+            return found
+    return None
+
+
+
+# Sink that writes each polygon to a text file, one polygon per line:
+#     sides r g b x0 y0 x1 y1 ...
+# Coordinates are in units of the polygon side length, with the first vertex of the tessellation at the origin.
+class FileSink:
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def draw_poly(self, poly, color):
+        values = [len(poly.vertex_list)] + list(color)
+        for vert in poly.vertex_list:
+            values.extend(vert.coords)
+        self.file.write(' '.join('{:.6g}'.format(v) for v in values) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+
+# Sink passing every polygon on to several sinks, e.g. a window and an export file.
+class TeeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def draw_poly(self, poly, color):
+        for sink in self.sinks:
+            sink.draw_poly(poly, color)
+
+    # Only the sinks that can take polygons away again are told about erased ones
+    def erase(self, erased, redrawn):
+        for sink in self.sinks:
+            if hasattr(sink, 'erase'):
+                sink.erase(erased, redrawn)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,491 @@
+# Fill a target region completely, with backtracking instead of random growth.
+#
+# The random fill (fill_tess) only avoids dead ends through the auto-fill, and stops when it meets one.  The solver
+# instead searches for a tiling that covers a whole region (a rectangle, a disk or a polygon), trying every option of
+# every choice until one is found or the node limit is reached. That is only exhaustive as far as the checks on each
+# polygon go: by default (check_overlap off) a polygon is checked against the vertices it shares, not against a part of
+# the border it does not touch, so a border that curls back on itself can let an overlapping tiling through or turn
+# away a valid one. Solve with check_overlap (see RegionSolver) for such regions, and check results with validate.py.
+#     > Every vertex inside the region (or within one polygon side of it, so no border edge can cut across the region)
+#       is required to be filled.  Vertices outside are left unfilled, but the polygons around each of them must still
+#       form a single arc (two arcs with a gap between them would leave a thread the growth cannot follow), except in
+#       the region given as later, which a later solve fills (see patches.py).
+#     > The shapes that can still be added at each unfilled vertex are a bit mask, looked up in configurations.OPTIONS.
+#       Choices that are forced are propagated straight away, as in the auto-fill: a vertex with a single completion
+#       (finish_fill) is completed, and a vertex with a single option gets that polygon.
+#     > Otherwise the required vertex with the fewest options is picked, and each of its options is tried in turn
+#       (in a seeded random order) as the next polygon at its most counter-clockwise edge.  Some polygon must go there,
+#       so trying every option misses no tiling.
+#     > A contradiction (a polygon that cannot be inserted, or a vertex without options) undoes every change back to
+#       the last choice through the vertex store's undo trail, and the next option is tried.
+# The number of choices tried per second is reported as the search rate.
+#
+# Regions are given in units of the polygon side length, with the first vertex of the tessellation at the origin and
+# y downward, as on the window.  The region must contain the first vertex.
+#
+# Usage:
+#     python solver.py --disk 0 0 10 --shapes 0 1 --seed 0 --output tiling.svg
+#     python solver.py --rectangle -8 -5 8 5 --output tiling.bin
+
+import numpy as np
+import argparse
+import time
+
+import configurations
+import lattice
+from polygon import Polygon, POLYGON_TYPES
+
+COVER_MARGIN = 1. # Vertices this close to the region must be filled too, so every edge crossing the region is covered
+CELL_SIZE = 2. # Width and height of the cells vertices are looked up in by the overlap check
+EPSILON = 1e-9
+
+
+
+# Single integer key of a cell of the overlap check, for each of the (n, 2) points
+def cell_keys(points):
+    cells = np.floor(points/CELL_SIZE).astype(np.int64)
+    return cell_key(cells[:,0], cells[:,1])
+
+def cell_key(column, row):
+    return (column + (1 << 24))*(1 << 25) + row + (1 << 24)
+
+
+
+# Axis aligned rectangle
+class RectangleRegion:
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self.bounds = (xmin, ymin, xmax, ymax)
+
+    # Whether each of the (n, 2) points is in the region, or at most margin away from it
+    def contains(self, points, margin=0.):
+        xmin, ymin, xmax, ymax = self.bounds
+        x, y = points[:,0], points[:,1]
+        return (x >= xmin - margin) & (x <= xmax + margin) & (y >= ymin - margin) & (y <= ymax + margin)
+
+
+
+class DiskRegion:
+    def __init__(self, x, y, radius):
+        self.center = np.array([x, y], dtype=float)
+        self.radius = radius
+
+    def contains(self, points, margin=0.):
+        return np.hypot(*(points - self.center).T) <= self.radius + margin
+
+
+
+# Region inside a closed polygon, given by its corners in order
+class PolygonRegion:
+    def __init__(self, corners):
+        self.corners = np.asarray(corners, dtype=float)
+
+    def contains(self, points, margin=0.):
+        x, y = points[:,0:1], points[:,1:2]
+        a = self.corners
+        b = np.roll(self.corners, -1, axis=0)
+
+        # Even-odd rule: count the edges crossed by a ray from each point along +x
+        straddles = (a[:,1] > y) != (b[:,1] > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing_x = a[:,0] + (y - a[:,1])*(b[:,0] - a[:,0])/(b[:,1] - a[:,1])
+        inside = (straddles & (x < crossing_x)).sum(axis=1) % 2 == 1
+        if margin <= 0:
+            return inside
+
+        # Distance from each point to the nearest edge
+        edge = b - a
+        t = np.clip(((x - a[:,0])*edge[:,0] + (y - a[:,1])*edge[:,1])/(edge**2).sum(axis=1), 0, 1)
+        distance = np.hypot(x - (a[:,0] + t*edge[:,0]), y - (a[:,1] + t*edge[:,1])).min(axis=1)
+        return inside | (distance <= margin)
+
+
+
+# Union of several regions (e.g. the rectangles of a seam, see patches.py)
+class UnionRegion:
+    def __init__(self, regions):
+        self.regions = list(regions)
+
+    def contains(self, points, margin=0.):
+        inside = np.zeros(len(points), dtype=bool)
+        for region in self.regions:
+            inside |= region.contains(points, margin)
+        return inside
+
+
+
+# A tessellation grown from a single vertex only ever meets its own border at existing vertices, which the
+# configuration checks cover.  Borders grown apart (e.g. the patches of patches.py) can meet anywhere, so with
+# check_overlap every polygon is also checked against the vertices and edges around it, and undone if it overlaps them.
+# On a torus (see torus.py) the border meets itself everywhere, and polygons can wrap around it any number of times:
+# there max_area (the area of the torus) bounds the total area of the polygons, so no layer starts over a full one. The
+# angle still open around the vertices needs at least area_per_angle of area per unit, which counts against it too.
+class RegionSolver:
+    def __init__(self, tessellation, region, seed=None, max_nodes=None, check_overlap=False, max_area=None,
+                 later=None, window=None):
+        self.tessellation = tessellation
+        self.store = tessellation.store
+        self.region = region
+        self.later = later # Region whose vertices may be left with separate arcs, as a later solve fills them (None: none)
+        self.window = window # Region of perpendicular space (see lattice.py) every vertex placed must be in (None: any)
+        self.rng = np.random.default_rng(seed) # Order in which the options of each choice are tried
+        self.max_nodes = max_nodes # Most choices to try before giving up (None: no limit)
+        self.check_overlap = check_overlap
+        self.max_area = max_area # Most total area of the polygons placed by the search (None: no limit)
+        self.area = 0. # Total area of the polygons placed by the search
+        # Least area a polygon of the shapes brings per unit of angle it covers at its corners
+        self.area_per_angle = min(configurations.AREAS[shape]/(configurations.ANGLES[shape]*configurations.SIDES[shape])
+                                  for shape in tessellation.shapes)
+        self.areas = [] # (mark before placing, area before) for every polygon placed that is not undone
+
+        self.required = np.zeros(1024, dtype=bool) # Whether each vertex must be filled
+        self.split = np.zeros(1024, dtype=bool) # Whether each vertex that is not required may have separate arcs
+        self.points = np.zeros((1024,2)) # Cartesian coordinates of each vertex
+        self.known = 0 # Vertices whose entries in required and points are up to date
+        self.frontier = set() # Every required vertex that is not filled (and possibly some that are filled by now)
+
+        # Cells of the overlap check. The vertices there before the search are sorted by cell once, those added during
+        # the search are listed in a dictionary, and taken out again when they are undone.
+        self.base_size = None # Number of vertices before the search
+        self.base_cells = None # Cell key of the vertices before the search, sorted
+        self.base_ids = None # Their ids in the same order
+        self.cells = {} # Cell key: ids of the vertices added during the search
+        self.cell_of = np.zeros(1024, dtype=np.int64) # Cell key of each vertex added during the search
+
+        self.nodes = 0 # Choices tried
+        self.placements = 0 # Polygons inserted, forced or chosen
+        self.backtracks = 0 # Choices whose every option led to a contradiction
+        self.elapsed = 0. # Seconds spent searching
+
+
+
+    # Bring required up to date with the vertices of the store (ids can be reused after an undo)
+    def update_required(self):
+        store = self.store
+        self.known = min(self.known, store.size)
+        if self.known == store.size:
+            return
+        while store.size > len(self.required):
+            self.required = np.concatenate([self.required, np.zeros_like(self.required)])
+            self.split = np.concatenate([self.split, np.zeros_like(self.split)])
+            self.points = np.concatenate([self.points, np.zeros_like(self.points)])
+            self.cell_of = np.concatenate([self.cell_of, np.zeros_like(self.cell_of)])
+        points = lattice.to_cartesian(store.lattice[self.known:store.size])
+        required = self.region.contains(points, COVER_MARGIN)
+        self.required[self.known:store.size] = required
+        self.split[self.known:store.size] = self.later is not None and self.later.contains(points)
+        self.points[self.known:store.size] = points
+        self.frontier.update((np.flatnonzero(required & ~store.is_filled[self.known:store.size]) + self.known).tolist())
+
+        if self.check_overlap:
+            keys = cell_keys(points)
+            if self.base_size is None:
+                order = np.argsort(keys, kind='stable')
+                self.base_size = store.size
+                self.base_cells = keys[order]
+                self.base_ids = order + self.known
+            else:
+                self.cell_of[self.known:store.size] = keys
+                for id, key in enumerate(keys.tolist(), self.known):
+                    self.cells.setdefault(key, []).append(id)
+        self.known = store.size
+
+
+
+    # Revert the store to a mark, keeping track of the vertices that are no longer filled
+    def undo(self, mark):
+        store = self.store
+        for column, id, direction, value in store.trail[mark:]:
+            if column == 'is_filled':
+                self.frontier.add(id)
+        store.undo(mark)
+        while self.areas and self.areas[-1][0] >= mark:
+            self.area = self.areas.pop()[1]
+        if self.base_size is not None:
+            for id in range(self.known - 1, max(store.size, self.base_size) - 1, -1):
+                self.cells[self.cell_of[id]].remove(id)
+        self.known = min(self.known, store.size)
+
+
+
+    # Ids of the vertices within the rectangle's cells
+    def vertices_near(self, xmin, ymin, xmax, ymax):
+        found = set()
+        for column in range(int(np.floor(xmin/CELL_SIZE)), int(np.floor(xmax/CELL_SIZE)) + 1):
+            for row in range(int(np.floor(ymin/CELL_SIZE)), int(np.floor(ymax/CELL_SIZE)) + 1):
+                key = cell_key(column, row)
+                first, last = np.searchsorted(self.base_cells, [key, key + 1])
+                found.update(self.base_ids[first:last].tolist())
+                found.update(self.cells.get(key, ()))
+        return found
+
+
+
+    # Whether a newly inserted polygon overlaps the rest of the tessellation: an edge leaving one of its corners into
+    # its interior, another vertex inside it or on its sides, or another edge crossing one of its sides.
+    def overlaps(self, poly):
+        store = self.store
+        self.update_required()
+        ids = [vert.id for vert in poly.vertex_list]
+        sides = len(ids)
+        for i, id in enumerate(ids):
+            start = poly.vertex_list[i].neighbor_num(poly.vertex_list[(i+1) % sides])
+            if (store.neighbors[id, [(start + k) % lattice.N_DIRECTIONS for k in range(1, poly.ang_units)]] >= 0).any():
+                return True
+
+        corners = self.points[ids]
+        xmin, ymin = corners.min(axis=0) - 1
+        xmax, ymax = corners.max(axis=0) + 1
+        near = np.array(sorted(self.vertices_near(xmin, ymin, xmax, ymax) - set(ids)), dtype=np.int64)
+        if len(near) == 0:
+            return False
+        a = corners
+        edge = np.roll(corners, -1, axis=0) - corners
+
+        # side[j, i]: which side of polygon edge i point j is on. Inside or on the boundary means no sign change.
+        points = self.points[near]
+        side = edge[None,:,0]*(points[:,None,1] - a[None,:,1]) - edge[None,:,1]*(points[:,None,0] - a[None,:,0])
+        if ((side >= -EPSILON).all(axis=1) | (side <= EPSILON).all(axis=1)).any():
+            return True
+
+        # Edges from the nearby vertices (those from the corners are covered above) crossing a side of the polygon
+        ends = store.neighbors[near]
+        starts, ends = np.repeat(near, lattice.N_DIRECTIONS)[ends.ravel() >= 0], ends[ends >= 0]
+        keep = ~np.isin(ends, ids)
+        c, d = self.points[starts[keep]], self.points[ends[keep]]
+        if len(c) == 0:
+            return False
+        cross_c = edge[None,:,0]*(c[:,None,1] - a[None,:,1]) - edge[None,:,1]*(c[:,None,0] - a[None,:,0])
+        cross_d = edge[None,:,0]*(d[:,None,1] - a[None,:,1]) - edge[None,:,1]*(d[:,None,0] - a[None,:,0])
+        segment = d - c
+        cross_a = segment[:,None,0]*(a[None,:,1] - c[:,None,1]) - segment[:,None,1]*(a[None,:,0] - c[:,None,0])
+        b = a + edge
+        cross_b = segment[:,None,0]*(b[None,:,1] - c[:,None,1]) - segment[:,None,1]*(b[None,:,0] - c[:,None,0])
+        return bool(((cross_c*cross_d < -EPSILON) & (cross_a*cross_b < -EPSILON)).any())
+
+
+
+    # Insert a polygon of the given shape at the most counter-clockwise edge of a vertex. Returns it, or None.
+    def place(self, id, shape):
+        vert = self.store.vertex(id)
+        mark = self.store.mark()
+        poly = POLYGON_TYPES[shape](vert, vert.neighbor(vert.ccw_max_index), self.store)
+        if not poly.inserted:
+            return None
+        self.update_required()
+        ids = [vert.id for vert in poly.vertex_list]
+        if (lattice.ARC_COUNT[self.store.wedges[ids]] > 1)[~self.required[ids] & ~self.split[ids]].any():
+            self.undo(mark)
+            return None
+        if self.window is not None and not self.window.contains(lattice.to_perpendicular(self.store.lattice[ids])).all():
+            self.undo(mark)
+            return None
+        if self.check_overlap and self.overlaps(poly):
+            self.undo(mark)
+            return None
+        if self.max_area is not None:
+            # The angle still open around every vertex has to be covered by polygons yet to be placed, so their area
+            # is at least that angle times area_per_angle
+            store = self.store
+            open_angle = configurations.FULL_ANGLE*store.size - configurations.ANGLE[store.state[:store.size]].sum()
+            if self.area + configurations.AREAS[shape] + open_angle*self.area_per_angle > self.max_area + EPSILON:
+                self.undo(mark)
+                return None
+            self.areas.append((mark, self.area))
+            self.area += configurations.AREAS[shape]
+        self.placements += 1
+        return poly
+
+
+
+    # Make every forced choice, starting from the given vertices and continuing from the corners of every polygon it
+    # inserts. Returns False on a contradiction.
+    def propagate(self, ids):
+        store = self.store
+        mask = store.shape_mask
+        work_list = list(ids)
+        while work_list:
+            id = work_list.pop()
+            self.update_required()
+            if store.is_filled[id] or not self.required[id]:
+                continue
+
+            state = store.state[id]
+            forced = configurations.FORCED[mask, state]
+            if forced.any():
+                shapes = [shape for shape, count in enumerate(forced) for i in range(count)]
+            else:
+                options = configurations.OPTIONS[mask, state]
+                if options == 0:
+                    return False
+                if configurations.POPCOUNT[options] > 1:
+                    continue
+                shapes = [int(options).bit_length() - 1]
+
+            for shape in shapes:
+                poly = self.place(id, shape)
+                if poly is None:
+                    return False
+                work_list.extend(vert.id for vert in poly.vertex_list if not vert.is_filled)
+        return True
+
+
+
+    # Required vertex that is not filled yet with the fewest options (the oldest one of those), or None if there is none.
+    # Only vertices on the frontier (those touched since they were last checked) can be candidates.
+    def choose(self):
+        store = self.store
+        self.update_required()
+        candidates = np.array(sorted(self.frontier), dtype=np.int64)
+        if len(candidates) == 0:
+            return None
+        candidates = candidates[candidates < store.size]
+        candidates = candidates[~store.is_filled[candidates] & self.required[candidates]]
+        self.frontier = set(candidates.tolist())
+        if len(candidates) == 0:
+            return None
+        options = configurations.OPTIONS[store.shape_mask, store.state[candidates]]
+        return int(candidates[np.argmin(configurations.POPCOUNT[options])])
+
+
+
+    # Search for a tiling filling the region. Returns True once found, with the tessellation holding it (drawn to its
+    # sink and ready to grow further). Otherwise the tessellation is left as it was and False is returned.
+    def solve(self):
+        tess = self.tessellation
+        store = self.store
+        self.update_required()
+        if not self.region.contains(lattice.to_cartesian(store.lattice[tess.current_vertex.id])[None], COVER_MARGIN)[0]:
+            raise ValueError('The region must contain the current vertex of the tessellation')
+
+        kept_trail = store.trail is not None
+        start = store.mark()
+        verbose = Polygon.verbose
+        Polygon.verbose = False # Rejected polygons are part of the search
+        started = time.perf_counter()
+        try:
+            solved = self.search()
+        finally:
+            Polygon.verbose = verbose
+            self.elapsed += time.perf_counter() - started
+
+        if not solved:
+            self.undo(start)
+        if not kept_trail:
+            store.stop_trail()
+        if solved:
+            self.finish()
+        return solved
+
+
+
+    # Depth first search over the choices, undoing back to the last choice on every contradiction.
+    def search(self):
+        store = self.store
+        stack = [] # [vertex id, options still to try, mark before trying them]
+        descend = self.propagate(np.flatnonzero(~store.is_filled[:store.size]))
+        if not descend:
+            return False
+        while True:
+            if descend:
+                id = self.choose()
+                if id is None:
+                    return True
+                options = int(configurations.OPTIONS[store.shape_mask, store.state[id]])
+                order = [int(shape) for shape in self.rng.permutation(len(configurations.SHAPES)) if (options >> shape) & 1]
+                stack.append([id, order, store.mark()])
+
+            if not stack:
+                return False
+            id, order, mark = stack[-1]
+            self.undo(mark)
+            if not order:
+                stack.pop()
+                self.backtracks += 1
+                descend = False
+                continue
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                return False
+
+            self.nodes += 1
+            poly = self.place(id, order.pop())
+            descend = poly is not None and self.propagate([vert.id for vert in poly.vertex_list])
+
+
+
+    # Hand the solved tessellation over: draw every polygon, and set the counters and the vertex to grow from
+    def finish(self):
+        tess = self.tessellation
+        store = self.store
+        colors = (tess.tri_color, tess.sq_color, tess.hex_color, tess.dodec_color)
+        tess.poly_counts[:] = 0
+        for poly_id, poly in tess.polygons():
+            tess.poly_counts[poly_id] += 1
+            tess.sink.draw_poly(poly, colors[poly_id])
+            tess.polygon_index.add(poly_id, poly)
+        tess.sink.flush()
+
+        tess.vert_filled = store.filled
+        tess.dead_end = False
+        tess.unfinished_autofill = []
+        unfilled = store.unfilled()
+        if len(unfilled): # Everything can be filled on a torus (see torus.py)
+            tess.current_vertex = store.vertex(int(unfilled[0]))
+            tess.reference_vertex = tess.current_vertex.neighbor(tess.current_vertex.ccw_max_index)
+
+
+
+    # Summary of the search
+    def stats(self):
+        return {
+            'nodes': self.nodes,
+            'placements': self.placements,
+            'backtracks': self.backtracks,
+            'elapsed': self.elapsed,
+            'nodes_per_second': self.nodes/self.elapsed if self.elapsed else 0.,
+        }
+
+
+
+def main():
+    from tessellation import Tessellation
+    parser = argparse.ArgumentParser(description='Fill a region completely, searching with backtracking.')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--rectangle', type=float, nargs=4, metavar=('XMIN', 'YMIN', 'XMAX', 'YMAX'))
+    group.add_argument('--disk', type=float, nargs=3, metavar=('X', 'Y', 'RADIUS'))
+    group.add_argument('--polygon', type=float, nargs='+', metavar='X Y', help='corners of the region, x y pairs in order')
+    parser.add_argument('--shapes', type=int, nargs='+', default=[0, 1], help='0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the order in which options are tried')
+    parser.add_argument('--max-nodes', type=int, default=None, help='most choices to try before giving up')
+    parser.add_argument('--output', default=None, help='.svg or .jsonl file (.gz to compress) of the polygons, or a checkpoint')
+    args = parser.parse_args()
+
+    if args.rectangle is not None:
+        region = RectangleRegion(*args.rectangle)
+    elif args.disk is not None:
+        region = DiskRegion(*args.disk)
+    else:
+        if len(args.polygon) < 6 or len(args.polygon) % 2:
+            parser.error('--polygon needs at least three x y pairs')
+        region = PolygonRegion(np.reshape(args.polygon, (-1, 2)))
+
+    tess = Tessellation(shapes=args.shapes)
+    solver = RegionSolver(tess, region, args.seed, args.max_nodes)
+    solved = solver.solve()
+    stats = solver.stats()
+    print('{} after {} choices ({} backtracks, {} polygons placed) in {:.3f} s ({:.0f} choices/sec)'.format(
+        'Solved' if solved else 'No tiling found', stats['nodes'], stats['backtracks'], stats['placements'],
+        stats['elapsed'], stats['nodes_per_second']))
+
+    if solved and args.output is not None:
+        name = args.output[:-3] if args.output.endswith('.gz') else args.output
+        if name.endswith('.svg') or name.endswith('.jsonl'):
+            from export import export_tessellation
+            export_tessellation(tess, args.output)
+        else:
+            tess.save(args.output)
+        print('Wrote {}'.format(args.output))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Spatial index of the polygons of a tessellation.
+#
+# Polygons are only drawn once, when they are inserted.  To draw any part of the tessellation again (e.g. after
+# panning or zooming the window) the tessellation keeps its polygons in a uniform grid: the plane is cut into square
+# cells of cell_size polygon sides, and each cell lists the polygons whose bounding box overlaps it.  Finding the
+# polygons in a rectangle only looks at the cells it covers, so the cost follows the size of the rectangle, not the
+# size of the tessellation.
+#
+# Polygons are stored back to back as float32 corner coordinates (in units of the polygon side length), as in
+# TiledRasterSink, together with their shape id and bounding box.
+#
+# Every index provides:
+#     > add(shape_id, poly): record an inserted polygon
+#     > truncate(size): forget every polygon added after the first size (e.g. the polygons of an undone step)
+#     > query(xmin, ymin, xmax, ymax): indices of the polygons whose bounding box meets the rectangle
+#     > corners(i), shape(i): the corners and shape id of polygon i
+
+import numpy as np
+import math
+
+
+# Index that keeps nothing.  Used for pure generation runs, which never draw anything again.
+class NullPolygonIndex:
+    enabled = False
+
+    def add(self, shape_id, poly):
+        pass
+
+    def truncate(self, size):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+
+class PolygonGrid:
+    enabled = True
+
+    def __init__(self, cell_size=8.):
+        self.cell_size = cell_size # Width and height of each cell, in polygon sides
+        self.cells = {} # (column, row): list of the indices of the polygons overlapping the cell
+
+        # Polygons are stored back to back: the corners of polygon i are points[starts[i]:starts[i]+sides[i]]
+        self.num_polys = 0
+        self.num_points = 0
+        self.points = np.zeros((1024,2), dtype=np.float32)
+        self.starts = np.zeros(256, dtype=np.int64)
+        self.sides = np.zeros(256, dtype=np.int8)
+        self.shapes = np.zeros(256, dtype=np.int8)
+        self.bounds = np.zeros((256,4), dtype=np.float32) # xmin, ymin, xmax, ymax of each polygon
+
+    def __len__(self):
+        return self.num_polys
+
+
+
+    # Record a polygon of the given shape id
+    def add(self, shape_id, poly):
+        corners = np.array([vert.coords for vert in poly.vertex_list], dtype=np.float32)
+
+        # Double the storage whenever it runs out
+        while self.num_points + len(corners) > len(self.points):
+            self.points = np.concatenate([self.points, np.zeros_like(self.points)])
+        if self.num_polys == len(self.starts):
+            self.starts = np.concatenate([self.starts, np.zeros_like(self.starts)])
+            self.sides = np.concatenate([self.sides, np.zeros_like(self.sides)])
+            self.shapes = np.concatenate([self.shapes, np.zeros_like(self.shapes)])
+            self.bounds = np.concatenate([self.bounds, np.zeros_like(self.bounds)])
+
+        index = self.num_polys
+        xmin, ymin = corners.min(axis=0)
+        xmax, ymax = corners.max(axis=0)
+        self.points[self.num_points:self.num_points+len(corners)] = corners
+        self.starts[index] = self.num_points
+        self.sides[index] = len(corners)
+        self.shapes[index] = shape_id
+        self.bounds[index] = xmin, ymin, xmax, ymax
+        self.num_points += len(corners)
+        self.num_polys += 1
+
+        for cell in self.cells_in(xmin, ymin, xmax, ymax):
+            polys = self.cells.get(cell)
+            if polys is None:
+                self.cells[cell] = [index]
+            else:
+                polys.append(index)
+
+
+
+    # Forget the polygons added after the first size. Each cell lists its polygons in the order they were added, so the
+    # forgotten ones are at the end of their cells' lists.
+    def truncate(self, size):
+        for index in range(self.num_polys - 1, size - 1, -1):
+            for cell in self.cells_in(*self.bounds[index]):
+                polys = self.cells[cell]
+                polys.pop()
+                if not polys:
+                    del self.cells[cell]
+        if size < self.num_polys:
+            self.num_points = int(self.starts[size])
+            self.num_polys = size
+
+
+
+    # Every cell (column, row) the rectangle overlaps
+    def cells_in(self, xmin, ymin, xmax, ymax):
+        size = self.cell_size
+        columns = range(math.floor(xmin/size), math.floor(xmax/size) + 1)
+        rows = range(math.floor(ymin/size), math.floor(ymax/size) + 1)
+        return [(column, row) for column in columns for row in rows]
+
+
+
+    # Indices of the polygons whose bounding box meets the rectangle, in the order they were added.
+    def query(self, xmin, ymin, xmax, ymax):
+        found = [self.cells[cell] for cell in self.cells_in(xmin, ymin, xmax, ymax) if cell in self.cells]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(found))
+
+        # Cells are larger than the rectangle's edges, keep only the polygons that actually meet it
+        bounds = self.bounds[candidates]
+        meets = (bounds[:,0] <= xmax) & (bounds[:,2] >= xmin) & (bounds[:,1] <= ymax) & (bounds[:,3] >= ymin)
+        return candidates[meets]
+
+
+
+    def corners(self, index):
+        start = self.starts[index]
+        return self.points[start:start+self.sides[index]]
+
+    def shape(self, index):
+        return int(self.shapes[index])
+
+
+
+    # Bounding box (xmin, ymin, xmax, ymax) of every polygon together, or None without polygons
+    def extent(self):
+        if self.num_polys == 0:
+            return None
+        bounds = self.bounds[:self.num_polys]
+        return bounds[:,0].min(), bounds[:,1].min(), bounds[:,2].max(), bounds[:,3].max()
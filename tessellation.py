@@ -1,12 +1,34 @@
-from vertex import Vertex
+from vertex import VertexStore
 from polygon import *
+from render import NullSink, PygameSink
+from instrument import NullInstrumentation
+from policy import UniformPolicy
+from spatial import NullPolygonIndex, PolygonGrid
+from events import PolygonAdded, VertexFilled, NextVertex, Finished, WAITING
+from journal import Journal
+import configurations
+import checkpoint
+import lattice
 import numpy as np
 
 class Tessellation:
-    def __init__(self, win, center, length):
+    # The tessellation can be drawn to a pygame window (win), or to any other rendering sink (see render.py).
+    # With neither a window nor a sink, the tessellation is grown headless and nothing is drawn.
+    # shapes are the ids of the polygons to build with: 0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon.
+    # An Instrumentation (see instrument.py) records timers and counters of the fill, by default nothing is recorded.
+    # The policy (see policy.py) makes the random choices of polygon, by default uniformly from the shapes with a fresh
+    # seed. Pass e.g. UniformPolicy(shapes, seed) for a reproducible fill.
+    # The polygons are kept in a spatial index (see spatial.py) so any part can be drawn again, e.g. by viewer.py. By
+    # default only a tessellation with a window keeps them.
+    def __init__(self, win=None, center=np.array([0,0]), length=1, sink=None, shapes=(0,1), instrument=None, policy=None, index=None):
+        self.shapes = tuple(shapes) # Polygons that can be chosen when filling a vertex
+        
+        # Array-backed storage of every vertex. Also resolves every polygon corner to the one vertex at that point.
+        self.store = VertexStore(shapes=self.shapes)
+        
         # Setup first two vertices
-        self.v0 = Vertex(np.array([0,0])) # First vertex to be filled
-        self.v1 = Vertex(np.array([1,0])) # First reference vertex
+        self.v0 = self.store.add((0,0,0,0)) # First vertex to be filled
+        self.v1 = self.store.add((1,0,0,0)) # First reference vertex, one unit along direction 0
         self.v0.set_neighbor(self.v1)
         self.v1.set_neighbor(self.v0)
         self.v0.store_ccw_index(self.v1)
@@ -17,14 +39,254 @@ class Tessellation:
         
         self.tri_color = (235,235,0)#(91, 132, 177) # RGB color for triangles
         self.sq_color =  (255,0,0)#(252, 118, 106) # RGB color for squares
+        self.hex_color = (0,120,255) # RGB color for hexagons
+        self.dodec_color = (0,170,70) # RGB color for dodecagons
         
         self.win = win # Window where the Tessellation will be drawn
         self.center_loc = center # Location on window of the center of the tessellation on
         self.scale = length # Length of each side of polygons
         
+        # Sink receiving every inserted polygon. Only a window requires pygame.
+        if sink is None:
+            sink = PygameSink(win, center, length) if win is not None else NullSink()
+        self.sink = sink
+        self.instrument = instrument if instrument is not None else NullInstrumentation()
+        self.policy = policy if policy is not None else UniformPolicy(self.shapes)
+        if index is None:
+            index = PolygonGrid() if win is not None else NullPolygonIndex()
+        self.polygon_index = index
+        
         self.vert_filled = 0 # Total number of vertices filled
+        self.dead_end = False # Set once some vertex can no longer be filled by any polygon
+        self.poly_counts = np.zeros(len(configurations.SHAPES), dtype=np.int64) # Polygons inserted of each shape
+        self.rejected_polys = 0 # Polygons that could not be inserted where they were tried
+        self.last_autofill_touched = 0 # Number of vertices checked by the last auto-fill
+        self.unfinished_autofill = [] # Vertices an auto-fill stopped at its limit had still to check
+        self.events = None # Events not yet yielded by grow (None when not growing, see events.py)
+        self.journal = None # Steps of the fill that can be undone, None when not kept (see start_journal)
+    
+    
+    
+    # Save the vertices, cursor, counters and policy state to a checkpoint file (see checkpoint.py).
+    def save(self, path):
+        checkpoint.save(self, path)
+        
+        
+        
+    # Create a tessellation from a checkpoint file, ready to continue filling.
+    # The window/sink arguments are the same as for a new tessellation. Nothing is drawn until redraw is called.
+    # The saved policy continues making the same choices as the saved run would have, unless another policy is given.
+    @classmethod
+    def load(cls, path, win=None, center=np.array([0,0]), length=1, sink=None, instrument=None, policy=None, index=None):
+        shapes = checkpoint.read_header(path)['shapes']
+        return checkpoint.load(cls(win, center, length, sink, shapes, instrument, policy, index), path, policy is None)
+    
+    
+    
+    # Keep a journal of every step of the fill from now on (each choice of the policy with its auto-fill), so steps can
+    # be undone and redone, see journal.py. The state of the policy (the tessellation's own by default) is kept with
+    # each step.
+    def start_journal(self, policy=None):
+        self.journal = Journal(self.store)
+        self.journal.policy = policy if policy is not None else self.policy
+        
+        
+        
+    # Undo the last step of the fill: its polygon and everything the auto-fill added after it.
+    # The policy is left where it was, so a random policy makes a new choice in its place.
+    # The polygons are taken out of the polygon index, and a sink that can (a window) erases them.
+    # Returns False if there is no step to undo.
+    def undo(self):
+        step = self.journal.pop_undo() if self.journal is not None else None
+        if step is None:
+            return False
+        erased = [lattice.to_cartesian(self.store.lattice[list(corners)]) for shape, corners in step.polygons]
+        self.store.undo(step.mark)
+        checkpoint.restore_cursor(self, step.before)
+        self.polygon_index.truncate(step.polygons_before)
+        
+        # The polygons around the erased ones lost part of their borders
+        erase = getattr(self.sink, 'erase', None)
+        if erase is not None and erased:
+            redrawn = []
+            if self.polygon_index.enabled:
+                colors = (self.tri_color, self.sq_color, self.hex_color, self.dodec_color)
+                xmin, ymin = np.min([corners.min(axis=0) for corners in erased], axis=0)
+                xmax, ymax = np.max([corners.max(axis=0) for corners in erased], axis=0)
+                for index in self.polygon_index.query(xmin, ymin, xmax, ymax):
+                    redrawn.append((self.polygon_index.corners(index), colors[self.polygon_index.shape(index)]))
+            erase(erased, redrawn)
+        return True
+    
+    
+    
+    # Make the last undone step again, exactly as it was made. Returns False if there is no step to redo.
+    def redo(self):
+        step = self.journal.pop_redo() if self.journal is not None else None
+        if step is None:
+            return False
+        self.store.apply(step.changes)
+        checkpoint.restore_cursor(self, step.after)
+        state = step.after['policy']
+        if state is not None:
+            self.journal.policy.set_state(state)
+        self.add_step_polygons(step)
+        return True
+    
+    
+    
+    # Put the polygons added by a step in the polygon index, and pass them to the sink unless draw is False
+    def add_step_polygons(self, step, draw=True):
+        colors = (self.tri_color, self.sq_color, self.hex_color, self.dodec_color)
+        for poly_id, corners in step.polygons:
+            poly = PlacedPolygon([self.store.vertex(id) for id in corners])
+            if draw:
+                self.sink.draw_poly(poly, colors[poly_id])
+            self.polygon_index.add(poly_id, poly)
+        
+        
+        
+    # Every polygon of the tessellation, rebuilt from the vertices alone, as (shape id, PlacedPolygon).
+    # Each polygon is found by walking around its edges: arriving at a vertex, the next edge is the first one
+    # clockwise from the edge just walked. The angle between them is covered by a polygon, unless the vertex is on the
+    # border and that angle is its open side (starting at its most counter-clockwise filled edge). Walks that meet
+    # an open side trace the outside of the tessellation and are skipped.
+    def polygons(self):
+        store = self.store
+        neighbors = store.neighbors[:store.size]
+        ccw_max_index = store.ccw_max_index[:store.size]
+        is_filled = store.is_filled[:store.size]
+        walked = neighbors < 0 # Directed edges (vertex, direction) already walked, or that do not exist
+        
+        for start, start_direction in zip(*np.nonzero(~walked)):
+            vert, direction = int(start), int(start_direction)
+            corners = []
+            closed = True
+            while not walked[vert, direction]:
+                walked[vert, direction] = True
+                vert, back = int(neighbors[vert, direction]), (direction + lattice.N_DIRECTIONS//2) % lattice.N_DIRECTIONS
+                direction = next(d % lattice.N_DIRECTIONS for d in range(back - 1, back - lattice.N_DIRECTIONS - 1, -1)
+                                 if neighbors[vert, d % lattice.N_DIRECTIONS] >= 0)
+                if not is_filled[vert] and ccw_max_index[vert] == direction:
+                    closed = False
+                corners.append(vert)
+                
+            if closed and len(corners) in configurations.SIDES:
+                yield configurations.SIDES.index(len(corners)), PlacedPolygon([store.vertex(id) for id in corners])
+                
+                
+                
+    # Pass every polygon of the tessellation to the sink again (e.g. after loading a checkpoint).
+    def redraw(self):
+        colors = (self.tri_color, self.sq_color, self.hex_color, self.dodec_color)
+        for poly_id, poly in self.polygons():
+            self.sink.draw_poly(poly, colors[poly_id])
+        self.sink.flush()
+    
+    
+    
+    # Grow the tessellation until max_fill vertices are filled, yielding events as it grows (see events.py).
+    # Each polygon is chosen by the policy (the tessellation's own by default). While the policy waits (e.g. on a
+    # click), Waiting is yielded, and the window events for the policy can be sent back in: events = growth.send(...).
+    # The events of each step of the fill are yielded before the next step is taken, so consumers set the pace.
+    def grow(self, max_fill, policy=None):
+        if policy is None:
+            policy = self.policy
+        instrument = self.instrument
+        journal = self.journal
+        if journal is not None:
+            journal.policy = policy
+        self.events = []
         
-        self.autofill_list = []
+        # Shapes that failed to insert at the current vertex and reference. If every shape fails there, the vertex can
+        # never be filled and the tessellation has reached a dead end.
+        rejected = set()
+        rejected_at = None
+        inputs = ()
+        
+        try:
+            # Finish an auto-fill that an earlier fill stopped at its limit
+            if self.unfinished_autofill and self.vert_filled < max_fill:
+                if journal is not None:
+                    journal.begin(self)
+                self.autofill(self.unfinished_autofill, max_fill)
+                if journal is not None:
+                    journal.end(self, [(event.shape, event.corners) for event in self.events if type(event) is PolygonAdded])
+                for event in self.take_events():
+                    yield event
+            
+            # Loop until the tessellation fills to the maximum, or cannot be grown any further (or the policy has no
+            # more choices). A tessellation with every vertex filled (a torus, see torus.py) has nowhere left to grow.
+            while not self.dead_end and not policy.finished and self.vert_filled < max_fill and self.store.filled < self.store.size:
+                
+                # At start of loop, check if the current vertex is filled.
+                # This is an important step since previous auto-fills may have filled the current vertex already
+                self.current_vertex.check_filled()
+                
+                # On a not-filled vertex, continue to loop until the vertex becomes filled
+                while not self.dead_end and not policy.finished and not self.current_vertex.is_filled and self.vert_filled < max_fill:
+                    # A vertex that no shape can be added to any more can never be filled
+                    if not configurations.OPTIONS[self.store.shape_mask, self.store.state[self.current_vertex.id]]:
+                        self.dead_end = True
+                        break
+                    started = instrument.start()
+                    add_poly = policy.choose(self, inputs)
+                    instrument.stop('choose', started)
+                    inputs = ()
+                    if add_poly is None:
+                        inputs = (yield WAITING) or ()
+                        continue
+                    
+                    # Add the polygon, and update reference vertex for next polygon
+                    if journal is not None:
+                        journal.begin(self)
+                    position = (self.current_vertex, self.reference_vertex)
+                    if rejected_at != position:
+                        rejected = set()
+                        rejected_at = position
+                    new_poly = self.add_poly_to_tess(add_poly, self.current_vertex, self.reference_vertex)
+                    if new_poly is not None:
+                        rejected_at = None
+                    else:
+                        rejected.add(add_poly)
+                        if rejected.issuperset(self.shapes):
+                            self.dead_end = True
+                    self.update_vertex_reference()
+                    
+                    # Auto-fill every corner of the new polygon, and from there any vertex that is left with a single
+                    # solution, to avoid possible 135 degree angles. This has the extra benefit of auto-filling the
+                    # current vertex as well.
+                    if new_poly is not None:
+                        self.autofill(new_poly.vertex_list, max_fill)
+                    if journal is not None:
+                        journal.end(self, [(event.shape, event.corners) for event in self.events if type(event) is PolygonAdded])
+                        
+                    for event in self.take_events(): # Anything sent in here is ignored
+                        yield event
+                    
+                # Stopping at max_fill part way through a vertex (or an auto-fill) leaves the rest to the next fill, which
+                # then carries on exactly as if it had never stopped.
+                if self.vert_filled >= max_fill and (self.unfinished_autofill or not self.current_vertex.is_filled):
+                    break
+                    
+                # Vertices should always be auto-filled for at least the last polygon.
+                # Whenever the auto-fill completes the vertex, need to move to next vertex to fill and update reference.
+                self.update_vertex_reference()
+                self.events.append(NextVertex(self.current_vertex.id, self.vert_filled))
+                for event in self.take_events():
+                    yield event
+                
+            yield Finished(self.vert_filled, self.dead_end)
+        finally:
+            self.events = None
+            
+            
+            
+    # Events recorded since the last call, emptying the record
+    def take_events(self):
+        events = self.events
+        self.events = []
+        return events
     
     
     
@@ -33,79 +295,127 @@ class Tessellation:
         
         # If the current vertex is filled, need to update both current and reference vertices
         # The current vertex is simply moved to the next element in the `border' linked list
-        if self.current_vertex.is_filled:
-            self.current_vertex = self.current_vertex.neighbors[self.current_vertex.ccw_max_index]
+        # The walk skips any further filled vertices. Coming back to a vertex already passed means the walk was on the
+        # border of an enclosed hole (a polygon joined two distant parts of the border) that has now been filled.
+        # The walk then carries on from the oldest vertex that is not filled yet, if there is one.
+        passed = set()
+        while self.current_vertex.is_filled:
+            if self.current_vertex in passed:
+                unfilled = self.store.unfilled()
+                if len(unfilled) == 0:
+                    return # Every vertex is filled, which is not a dead end: grow stops as there is nothing to fill
+                self.current_vertex = self.store.vertex(int(unfilled[0]))
+                break
+            passed.add(self.current_vertex)
+            self.current_vertex = self.current_vertex.neighbor(self.current_vertex.ccw_max_index)
         
         # Reference vertex must still be updated to the current vertex's most Counter Clockwise point
-        self.reference_vertex = self.current_vertex.neighbors[self.current_vertex.ccw_max_index]
+        self.reference_vertex = self.current_vertex.neighbor(self.current_vertex.ccw_max_index)
             
     
         
-    # Add a polygon
-    def add_poly_to_tess(self, poly_id, central_vertex, reference_vertex):
-        # Properties setup if adding Triangle
-        if poly_id == 0:
-            new_poly = Triangle(central_vertex, reference_vertex)
-            color = self.tri_color
-        # Properties setup if adding Square
-        else:
-            new_poly = Square(central_vertex, reference_vertex)
-            color = self.sq_color
+    # Add a polygon of the given shape id (0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon)
+    # forced marks polygons added by the auto-fill.
+    # Returns the polygon if it could be inserted, otherwise None.
+    def add_poly_to_tess(self, poly_id, central_vertex, reference_vertex, forced=False):
+        instrument = self.instrument
+        started = instrument.start()
+        new_poly = POLYGON_TYPES[poly_id](central_vertex, reference_vertex, self.store)
+        instrument.stop('insert', started)
+        color = (self.tri_color, self.sq_color, self.hex_color, self.dodec_color)[poly_id]
             
-        # If the polygon can be inserted successfully, draw the polygon to the window
-        if new_poly.inserted:
-            new_poly.draw_poly(self.win, self.center_loc, self.scale, color)
+        # If the polygon can be inserted successfully, pass the polygon to the sink to be drawn
+        if not new_poly.inserted:
+            self.rejected_polys += 1
+            instrument.count('polys_rejected')
+            return None
+        self.poly_counts[poly_id] += 1
+        instrument.count('polys_inserted')
+        started = instrument.start()
+        self.sink.draw_poly(new_poly, color)
+        self.polygon_index.add(poly_id, new_poly)
+        instrument.stop('draw', started)
+        
+        # While growing, record the polygon and every corner it completed (a filled vertex cannot take another polygon,
+        # so each vertex is reported once)
+        if self.events is not None:
+            self.events.append(PolygonAdded(poly_id, tuple(vert.id for vert in new_poly.vertex_list), forced))
+            for vert in new_poly.vertex_list:
+                if vert.is_filled:
+                    self.events.append(VertexFilled(vert.id))
+        return new_poly
     
     
     
-    # Fill the vertex (and all associated vertices) with the list of polygons (triangles, squares).
+    # Fill the vertex (and all associated vertices) with the list of polygons (triangles, squares, hexagons, dodecagons).
+    # These polygons are the only way to complete the vertex, so if one of them cannot be inserted the tessellation
+    # has reached a dead end.
+    # Returns the inserted polygons, or None if one of them could not be inserted.
     def fill_with_poly(self, polys_to_add, temp_check_vert):
-        # Add Triangles
-        for i in range(polys_to_add[0]):
-            self.add_poly_to_tess(0, temp_check_vert, temp_check_vert.neighbors[temp_check_vert.ccw_max_index])
-        # Add Squares
-        for i in range(polys_to_add[1]):
-            self.add_poly_to_tess(1, temp_check_vert, temp_check_vert.neighbors[temp_check_vert.ccw_max_index])
+        inserted = []
+        for poly_id, count in enumerate(polys_to_add):
+            for i in range(count):
+                new_poly = self.add_poly_to_tess(poly_id, temp_check_vert, temp_check_vert.neighbor(temp_check_vert.ccw_max_index), True)
+                if new_poly is None:
+                    self.dead_end = True
+                    return None
+                inserted.append(new_poly)
+        return inserted
     
-            
     
-    # Fill any vertex adjacent to the current one that has a single valid solution/orientation
-    # Iterative DFS search algorithm for auto-filling vertices
-    def autofill_adjacent(self, current_check_neighbors):
-        
-        # Expection for the current vertex. Check for auto-filling neighboring vertices, even if we cannot auto-fill the current one.
-        append_if_fill = False
-        self.autofill_list.append(current_check_neighbors)
+    
+    # Fill every vertex that has a single valid solution/orientation, starting from the given vertices.
+    # Vertices waiting to be checked are kept in a work list, together with a set of the ones already on it, so a
+    # vertex is only checked once for each change made to it: only the corners of newly inserted polygons change,
+    # and only those are added back to the list.  The cost therefore follows the size of the region that gets filled,
+    # not the number of paths that lead to each vertex, and there is no recursion depth to run out of.
+    # Filling stops early at a dead end, or once limit vertices are filled (forced regions can grow without end, e.g.
+    # with only hexagons). The vertices still to be checked are then kept in unfinished_autofill, and grow finishes
+    # them first when it continues, so a fill that is stopped and continued matches one that never stopped.
+    # Returns the number of vertices checked, which is also kept in last_autofill_touched.
+    def autofill(self, start_vertices, limit=None):
+        started = self.instrument.start()
+        work_list = [] # (vertex, number of fills that led to it being checked)
+        pending = set()
+        for vert in start_vertices:
+            if vert not in pending:
+                work_list.append((vert, 0))
+                pending.add(vert)
         
-        while len(self.autofill_list) > 0: # Check until no more vertices left to check
-            temp_check_vert = self.autofill_list.pop() # Look at the farthest vertex
-            polys_to_add = temp_check_vert.finish_fill()
-            if not append_if_fill or (polys_to_add != [0,0]).any(): # If the vertex can be filled (or is the first one)...
-                append_if_fill = True
-                
-                # If the vertex can be filled, add all its neighbors to check for filling
-                for vert_index in temp_check_vert.neighbors:
-                    self.autofill_list.append(temp_check_vert.neighbors[vert_index])
-                    
-                # Fill the vertex. Newly created vertices cannot be auto-filled, so we do not need to check them with the previous append.
-                self.fill_with_poly(polys_to_add, temp_check_vert)
-                self.vert_filled += 1
-                
-                
-                
-    # Fill any vertex adjacent to the current one that has a single valid solution/orientation
-    # Recursive DFS search algorithm for auto-filling vertices
-    # Unlike the iterative version, no special exception is made for the first vertex.
-    def autofill_adjacent_recursive(self, current_check_neighbors):
-        polys_to_add = current_check_neighbors.finish_fill()
-        
-        # If the vertex can be filled, fill with those polygons.
-        # Make a copy of neighbor dictionary before inserting vertices so we do not check these extra vertices for filling
-        if (polys_to_add != [0,0]).any():
-            current_neighbor_dict = current_check_neighbors.neighbors.copy()
-            self.fill_with_poly(polys_to_add, current_check_neighbors)
+        touched = 0
+        filled = 0
+        depth = 0
+        while work_list and not self.dead_end and (limit is None or self.vert_filled < limit):
+            vert, vert_depth = work_list.pop() # Look at the farthest vertex
+            pending.discard(vert)
+            touched += 1
+            
+            polys_to_add = vert.finish_fill()
+            if not polys_to_add.any():
+                continue
+            
+            inserted = self.fill_with_poly(polys_to_add, vert)
+            if inserted is None:
+                break
             self.vert_filled += 1
+            filled += 1
+            depth = max(depth, vert_depth + 1)
             
-            # Check each neighbor, excluding newly created ones, for autofilling.
-            for vert_index in current_neighbor_dict:
-                self.autofill_adjacent_recursive(current_check_neighbors.neighbors[vert_index])
\ No newline at end of file
+            # Every corner of the new polygons may now have a single solution
+            for poly in inserted:
+                for corner in poly.vertex_list:
+                    if corner not in pending and not corner.is_filled:
+                        work_list.append((corner, vert_depth + 1))
+                        pending.add(corner)
+        
+        self.unfinished_autofill = [] if self.dead_end else [vert for vert, vert_depth in work_list]
+        
+        instrument = self.instrument
+        instrument.stop('autofill', started)
+        instrument.count('finish_fill', touched)
+        instrument.count('finish_fill_empty', touched - filled)
+        instrument.count('autofill_touched', touched)
+        instrument.maximum('autofill_touched', touched)
+        instrument.maximum('autofill_depth', depth)
+        self.last_autofill_touched = touched
+        return touched
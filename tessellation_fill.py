@@ -1,72 +1,203 @@
 from tessellation import Tessellation
-from button import Button
+from policy import ButtonPolicy
+from events import NextVertex, Waiting
+from checkpoint import JOURNAL_SUFFIX
+from render import window_sink
 import numpy as np
-import pygame
-
-
-def fill_tess(tessellation, max_fill, window, button_list, random_fill):
-    # Loop until the tessellation fills to the maximum
-    while tessellation.vert_filled < max_fill:
-        
-        # Display how many vertices are currently filled as the window title
-        pygame.display.set_caption(
-            'Tessellation ------ Vertices Filled: {} out of {}'.format(tessellation.vert_filled, max_fill)
-        )
-        
-        # Redraw the buttons for each frame, in case the tessellation is drawn over the buttons
-        for buts in button_list:
-            buts.draw_button(window)
-            
-        # At start of loop, check if the current vertex is filled.
-        # This is an important step since previous auto-fills may have filled the current vertex already
-        tessellation.current_vertex.check_filled()
-        
-        # On a not-filled vertex, continue to loop until the vertex becomes filled
-        while not tessellation.current_vertex.is_filled:
-            add_poly = -1 # Make sure polygons do not accidentally get added multiple times
-            
-            for event in pygame.event.get():
-                # End all loops and exit
-                if event.type == pygame.QUIT:
-                    return False
-
-                # Check if one of the polygon buttons is clicked only if random fill option off
-                if (not random_fill and event.type == pygame.MOUSEBUTTONDOWN):
-                    mouse_pos = pygame.mouse.get_pos()
-                    if (button_list[0]).mouse_on_button(mouse_pos):
-                        add_poly = 0 # Triangle
-                    if (button_list[1]).mouse_on_button(mouse_pos):
-                        add_poly = 1 # Square
-                        
-            if random_fill: # Mark a polygon at random to be filled, with random fill option on
-                add_poly = np.random.randint(2)
-                
-            # Add the polygon (whether random fill or not), and update reference vertex for next polygon
-            if add_poly != -1:
-                tessellation.add_poly_to_tess(add_poly, tessellation.current_vertex, tessellation.reference_vertex)
-                tessellation.update_vertex_reference()
-    
-            # Auto-fill all adjacent points, as well as two spaces ahead, to avoid possible 135 degree angles.
-            # This has the extra benefit of auto-filling the current vertex as well.
-            tessellation.autofill_adjacent_recursive(tessellation.current_vertex)
-        
-        # Vertices should always be auto-filled for at least the last polygon.
-        # Whenever the auto-fill completes the vertex, need to move to next vertex to fill and update reference.
-        tessellation.update_vertex_reference()
-    
-    # When tessellation has reached the maximum value, update title and wait for quit
-    pygame.display.set_caption('Tessellation ------ Maximum Vertices Filled: {}'.format(tessellation.vert_filled))
-    pygame.display.update()
+import queue
+import threading
+
+
+FRAME_RATE = 60 # Most frames a second pushed to the window while the tessellation grows
+
+
+# Fill the tessellation until max_fill vertices are filled.
+# Each polygon is chosen by the tessellation's policy (random by default, see policy.py), or with random_fill False,
+# by a person clicking the buttons. Another policy can also be passed for just this fill.
+# Without a window (window=None) the fill runs headless: no events are polled, nothing is drawn,
+# and no choice can wait for a click. With a window, the fill runs on a worker thread, see below.
+# With a checkpoint_path, the tessellation is saved there every checkpoint_every filled vertices and when the fill
+# ends. A run resumed from the checkpoint (Tessellation.load) continues exactly as the saved run would have.
+# While waiting on a click, Ctrl+Z undoes the last choice (with its auto-fill) and Ctrl+Y (or Ctrl+Shift+Z) redoes it,
+# see Tessellation.undo. With a checkpoint_path, every choice is also appended to the checkpoint's journal as it is
+# made, so closing the window (or a crash) loses nothing.
+def fill_tess(tessellation, max_fill, window=None, button_list=(), random_fill=True, checkpoint_path=None, checkpoint_every=10000, policy=None):
+    headless = window is None
+    if headless and (not random_fill or isinstance(policy, ButtonPolicy)):
+        raise ValueError('A headless fill cannot wait for button clicks, random_fill must be True')
+    if policy is None:
+        policy = tessellation.policy if random_fill else ButtonPolicy(tessellation.shapes, button_list)
+    if not headless:
+        import pygame # pygame is only needed when a window is attached
+        wake = pygame.USEREVENT # Posted by the worker when it stops waiting
+        input_events = (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN) # Window events passed on to the policy
+
+        # The window sink redraws the buttons on every frame, in case the tessellation is drawn over the buttons
+        sink = window_sink(tessellation.sink)
+        if sink is None:
+            raise ValueError('A fill with a window needs a PygameSink (on its own or in a TeeSink) to draw to it')
+        sink.overlays = list(button_list)
+        sink.draw_overlays()
+
+    # Choices made by a person can be undone
+    journal_path = None
+    if not headless and isinstance(policy, ButtonPolicy):
+        if tessellation.journal is None:
+            tessellation.start_journal(policy)
+        if checkpoint_path is not None:
+            tessellation.save(checkpoint_path) # The journal is appended to this checkpoint
+            journal_path = checkpoint_path + JOURNAL_SUFFIX
+
+    next_checkpoint = tessellation.vert_filled + checkpoint_every
+    instrument = tessellation.instrument
+
+    if not headless:
+        # Display how many vertices are currently filled as the window title (shown with the next frame)
+        # With instrumentation on, the title shows a summary of its counters and timers instead
+        def update_caption():
+            if instrument.enabled:
+                sink.caption = instrument.caption(tessellation, max_fill)
+            else:
+                sink.caption = 'Tessellation ------ Vertices Filled: {} out of {}'.format(tessellation.vert_filled, max_fill)
+        update_caption()
+
+    # The fill itself runs on a worker thread, while this thread owns the window: it waits on window events, and pushes
+    # what the worker has drawn at most FRAME_RATE times a second. While the policy waits on a click, this thread
+    # blocks until the next window event, so an idle window uses no CPU. Clicks and keys are queued for the policy in
+    # the order they were made, also while the worker is busy: they are taken when the policy next waits. The worker
+    # posts a wake event when it takes them, so this thread stops blocking and draws what the choice adds.
+    growth = tessellation.grow(max_fill, policy)
+    choices = queue.Queue() # Window events sent to a waiting policy, None to stop the fill
+    waiting = threading.Event() # Set while the policy waits on window events
+    stop = threading.Event() # Set when the window is closed
+    failed = [] # Exception that ended the fill on the worker thread
+
+    # Grow the tessellation, taking checkpoints between vertices and passing window events to a waiting policy
+    def grow():
+        nonlocal next_checkpoint
+        inputs = None
+        try:
+            while not stop.is_set():
+                try:
+                    event = growth.send(inputs)
+                except StopIteration:
+                    break
+                inputs = None
+                kind = type(event)
+
+                # Checkpoints are only taken between vertices, where the fill does not hold any state of its own
+                if kind is NextVertex and checkpoint_path is not None and tessellation.vert_filled >= next_checkpoint:
+                    tessellation.save(checkpoint_path)
+                    next_checkpoint = tessellation.vert_filled + checkpoint_every
+                elif kind is Waiting:
+                    if headless:
+                        raise ValueError('The policy is waiting for window events, but the fill has no window')
+                    if journal_path is not None:
+                        tessellation.journal.write(journal_path)
+
+                    # Undo and redo while waiting, until there are other window events for the policy
+                    inputs = ()
+                    while not inputs:
+                        waiting.set()
+                        inputs = choices.get()
+                        waiting.clear()
+                        pygame.event.post(pygame.event.Event(wake))
+                        if inputs is None or stop.is_set():
+                            inputs = None # Clicks still queued when the window was closed are dropped
+                            break
+                        edits = [edit for edit in map(history_edit, inputs) if edit is not None]
+                        for edit in edits:
+                            if edit == 'undo':
+                                tessellation.undo()
+                            else:
+                                tessellation.redo()
+                        if edits and journal_path is not None:
+                            tessellation.journal.write(journal_path)
+                        inputs = [window_event for window_event in inputs if history_edit(window_event) is None]
+                    if inputs is None:
+                        break
+        except BaseException as error:
+            failed.append(error)
+        finally:
+            growth.close()
+
+    if headless:
+        grow()
+    else:
+        sink.auto_flush = False # Only this thread draws to the window
+        worker = threading.Thread(target=grow, daemon=True)
+        worker.start()
+        clock = pygame.time.Clock()
+        while worker.is_alive():
+            # Whatever the worker drew before it started waiting is pushed before blocking
+            idle = waiting.is_set()
+            update_caption()
+            started = instrument.start()
+            sink.flush()
+            instrument.stop('draw', started)
+
+            if idle:
+                window_events = [pygame.event.wait()] + pygame.event.get()
+            else:
+                clock.tick(FRAME_RATE)
+                window_events = pygame.event.get()
+
+            # End all loops and exit
+            if any(window_event.type == pygame.QUIT for window_event in window_events):
+                stop.set()
+                choices.put(None)
+                worker.join()
+                sink.auto_flush = True
+                if checkpoint_path is not None:
+                    tessellation.save(checkpoint_path)
+                return False
+
+            # The policy gets the clicks and keys (button clicks, undo and redo) one at a time, when it next waits, so
+            # every click makes its own choice
+            for window_event in window_events:
+                if window_event.type in input_events:
+                    choices.put([window_event])
+        worker.join()
+        sink.auto_flush = True
+    if failed:
+        raise failed[0]
+
+    if checkpoint_path is not None:
+        tessellation.save(checkpoint_path)
+
+    # When tessellation has reached the maximum value (or a dead end), update title and wait for quit
+    if not headless:
+        if tessellation.dead_end:
+            sink.caption = 'Tessellation ------ Dead End After {} Vertices Filled'.format(tessellation.vert_filled)
+        else:
+            sink.caption = 'Tessellation ------ Maximum Vertices Filled: {}'.format(tessellation.vert_filled)
+    started = instrument.start()
+    tessellation.sink.flush()
+    instrument.stop('draw', started)
     return True
-    
 
-    
+
+
+# 'undo' for Ctrl+Z, 'redo' for Ctrl+Y or Ctrl+Shift+Z, otherwise None
+def history_edit(window_event):
+    import pygame
+    if window_event.type != pygame.KEYDOWN or not window_event.mod & pygame.KMOD_CTRL:
+        return None
+    if window_event.key == pygame.K_z:
+        return 'redo' if window_event.mod & pygame.KMOD_SHIFT else 'undo'
+    if window_event.key == pygame.K_y:
+        return 'redo'
+    return None
+
+
+
 if __name__ == "__main__":
+    import pygame
     pygame.init()
 
     center = np.array([200,200])
     win = pygame.display.set_mode((400,400))
     win.fill((255,255,255))
-    
+
     tess = Tessellation(win,center,10)
-    fill_tess(tess, 100, win, [], True)
\ No newline at end of file
+    fill_tess(tess, 100, win, [], True)
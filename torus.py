@@ -0,0 +1,318 @@
+# Periodic tilings, grown on a torus and drawn by repeating a single fundamental domain.
+#
+# A periodic tiling is given by two periods: lattice vectors (see lattice.py) that move the tiling onto itself.  The
+# tiling is then fully described by what lies in one fundamental domain, the parallelogram spanned by the periods, with
+# opposite sides glued together into a torus.  TorusStore is a vertex store on that torus: every point is reduced into
+# the domain before it is looked up, so a polygon reaching over one side of the domain finds (or creates) its corners
+# on the opposite side, and the vertices are linked across the sides as neighbors.  Everything else (the polygons, the
+# configuration rules, the auto-fill and the solver) is unchanged.
+#
+# The torus is filled completely by the solver (see solver.py), with every vertex required.  Generating the tiling
+# therefore costs the same however much of the plane it covers.  Covering an area is then only copying: the polygons of
+# the domain are translated by every combination of the periods as whole arrays (replicate), or drawn once onto a
+# surface that is blitted across a window (draw_periodic).
+#
+# For example, with triangles and squares the periods 4 0 0 0 (four sides to the right) and 0 0 2 2 (twice up one
+# square and then one row of triangles) fit layers of squares and triangles, as in the README.  The domain must be large
+# enough that no two points of the torus can be joined by two different edges: every period has to be longer than
+# 2 sides (0 0 1 1 alone is too short).
+#
+# The search is a plain backtracking search, and even small domains can take thousands of choices at about a
+# millisecond each: polygons can wrap around the torus in ways no tiling of the plane allows, and those are only ruled
+# out once the area they need (see RegionSolver.area_per_angle) no longer fits. Measured over seeds 0-9 with 20000
+# choices at most: 6 0 0 0 / 0 0 2 2 with triangles and squares takes under 2 s, 4 0 0 0 / 0 0 4 4 about 6 s (up to
+# 12000 choices), and the same domain with all four shapes hits the limit on 4 seeds of 10. Larger domains, or more
+# shapes, grow quickly beyond that: keep the domain to a few periods of the intended pattern, try other seeds, or raise
+# --max-nodes.
+#
+# Usage:
+#     python torus.py --period 4 0 0 0 --period 0 0 2 2 --repeat 8 8 --output tiling.svg
+#     python torus.py --period 6 0 0 0 --period 0 0 2 2 --seed 3 --show
+
+import numpy as np
+import argparse
+import math
+import time
+
+import configurations
+import lattice
+from vertex import VertexStore
+from polygon import PlacedPolygon
+
+EPSILON = 1e-9 # Points this close to a side of the domain belong to it. Lattice points are further apart than this
+               # from a side they are not on, for domains of any practical size.
+
+
+
+# z component of the cross product of two cartesian vectors
+def cross(a, b):
+    return float(a[0]*b[1] - a[1]*b[0])
+
+
+
+# Cartesian length squared of a lattice vector
+def norm(vector):
+    return float(np.sum(lattice.to_cartesian(vector)**2))
+
+
+
+# The same lattice of periods, given by its two shortest independent vectors (Lagrange-Gauss reduction), which makes
+# the fundamental domain as compact as possible. Works on the exact lattice coordinates.
+def reduce_periods(periods):
+    u, v = (np.array(period, dtype=np.int64) for period in periods)
+    if abs(cross(lattice.to_cartesian(u), lattice.to_cartesian(v))) < EPSILON:
+        raise ValueError('The periods {} and {} are parallel'.format(tuple(u.tolist()), tuple(v.tolist())))
+    if norm(u) > norm(v):
+        u, v = v, u
+    while True:
+        v = v - round(float(np.dot(lattice.to_cartesian(u), lattice.to_cartesian(v)))/norm(u))*u
+        if norm(v) >= norm(u) - EPSILON:
+            return u, v
+        u, v = v, u
+
+
+
+# Area of the fundamental domain
+def domain_area(periods):
+    return abs(cross(*lattice.to_cartesian(np.asarray(periods))))
+
+
+
+# Vertex store of a tessellation on a torus, see above
+class TorusStore(VertexStore):
+    def __init__(self, periods, capacity=1024, shapes=(0,1)):
+        self.periods = np.array(reduce_periods(periods)) # (2, 4) lattice coords of the periods
+        if norm(self.periods[0]) <= 4 + EPSILON:
+            raise ValueError('The periods must be longer than 2 sides, the shortest is {:.3f}'.format(math.sqrt(norm(self.periods[0]))))
+        self.to_domain = np.linalg.inv(lattice.to_cartesian(self.periods).T) # Cartesian point -> multiples of the periods
+        super().__init__(capacity, shapes)
+
+
+
+    # The point of the domain that the lattice point is a copy of
+    def reduce(self, coords):
+        s, t = self.to_domain @ lattice.to_cartesian(np.asarray(coords))
+        shift = math.floor(s + EPSILON)*self.periods[0] + math.floor(t + EPSILON)*self.periods[1]
+        return tuple((np.asarray(coords) - shift).tolist())
+
+    def add(self, coords):
+        return super().add(self.reduce(coords))
+
+    def find(self, coords):
+        return super().find(self.reduce(coords))
+
+    def find_or_add(self, coords):
+        return super().find_or_add(self.reduce(coords))
+
+
+
+    # Both points are in the domain, so an edge between them crosses at most a side or two of it
+    def wrapped_direction(self, a, b):
+        difference = np.subtract(b, a)
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                direction = lattice.DIRECTION_INDEX.get(tuple((difference + i*self.periods[0] + j*self.periods[1]).tolist()))
+                if direction is not None:
+                    return direction
+        return None
+
+
+
+    # Points that differ by a whole number of each period are the same point of the torus
+    def same_points(self, a, b):
+        multiples = np.rint(lattice.to_cartesian(b - a) @ self.to_domain.T).astype(np.int64)
+        return (b - a == multiples @ self.periods).all(axis=1)
+
+    # Every combination of -1, 0 and 1 times each period: the copies of the domain around it
+    def copy_offsets(self):
+        steps = np.array([(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)])
+        return steps @ lattice.to_cartesian(self.periods)
+
+
+
+# A tessellation on the torus with the given periods, with its first two vertices as a new Tessellation has them.
+# Arguments are passed on to Tessellation. Nothing is drawn (the polygons of a torus are only drawn as copies).
+def torus_tessellation(periods, shapes=(0,1), **options):
+    from tessellation import Tessellation
+    tess = Tessellation(shapes=shapes, **options)
+    store = TorusStore(periods, shapes=tess.shapes)
+    tess.store = store
+    tess.v0 = store.add((0,0,0,0))
+    tess.v1 = store.add((1,0,0,0))
+    tess.v0.set_neighbor(tess.v1)
+    tess.v1.set_neighbor(tess.v0)
+    tess.v0.store_ccw_index(tess.v1)
+    tess.v1.store_ccw_index(tess.v0)
+    tess.current_vertex = tess.v0
+    tess.reference_vertex = tess.v1
+    return tess
+
+
+
+# Region requiring every vertex, for the solver to fill the whole torus
+class TorusRegion:
+    def contains(self, points, margin=0.):
+        return np.ones(len(points), dtype=bool)
+
+
+
+# Fill a torus with the given periods completely, trying the options of each choice in the order given by the seed.
+# The polygons can never cover more than the area of the torus, which ends any search that wraps a second layer of
+# polygons over the first (as soon as the polygons placed and those the open vertices still need no longer fit). A complete tiling covers exactly its area, anything else is counted as no tiling.
+# Returns the tessellation (or None if no tiling was found) and the solver.
+def solve_torus(periods, shapes=(0,1), seed=None, max_nodes=None):
+    from solver import RegionSolver
+    tess = torus_tessellation(periods, shapes)
+    area = domain_area(tess.store.periods)
+    solver = RegionSolver(tess, TorusRegion(), seed, max_nodes, max_area=area)
+    if not solver.solve():
+        return None, solver
+    if abs(float(np.dot(tess.poly_counts, configurations.AREAS)) - area) > 1e-6*area:
+        return None, solver
+    return tess, solver
+
+
+
+# The polygons of a tessellation on a torus as (shape ids, corners, sides): corners holds the cartesian coordinates
+# of every corner, polygon after polygon, and sides how many belong to each. Each polygon starts at its first corner
+# in the domain and continues edge by edge, so polygons reaching over a side of the domain stay in one piece.
+def domain_polygons(tessellation):
+    store = tessellation.store
+    shapes, corners, sides = [], [], []
+    for shape, poly in tessellation.polygons():
+        ids = [vert.id for vert in poly.vertex_list]
+        point = store.lattice[ids[0]].astype(np.int64)
+        for id, next_id in zip(ids, ids[1:] + ids[:1]):
+            corners.append(lattice.to_cartesian(point))
+            point = point + lattice.DIRECTIONS[store.vertex(id).neighbor_num(store.vertex(next_id))]
+        shapes.append(shape)
+        sides.append(len(ids))
+    return np.array(shapes, dtype=np.int8), np.array(corners).reshape(-1, 2), np.array(sides, dtype=np.int64)
+
+
+
+# Copies of the domain polygons for every combination i*period0 + j*period1 with 0 <= i < columns, 0 <= j < rows,
+# made by translating the whole corner array at once. Returns (shape ids, corners, sides) as domain_polygons does.
+def replicate(polygons, periods, columns, rows):
+    shapes, corners, sides = polygons
+    offsets = np.array([(i, j) for j in range(rows) for i in range(columns)]) @ lattice.to_cartesian(np.asarray(periods))
+    copies = corners[None,:,:] + offsets[:,None,:]
+    return np.tile(shapes, len(offsets)), copies.reshape(-1, 2), np.tile(sides, len(offsets))
+
+
+
+# Stand-in for a vertex at a cartesian point. Sinks only look at the coords of the corners of a polygon.
+class Point:
+    __slots__ = ('coords',)
+
+    def __init__(self, coords):
+        self.coords = coords
+
+# Pass polygons (shape ids, corners, sides) on to a sink, with the tessellation's colors
+def draw_polygons(sink, polygons, colors):
+    shapes, corners, sides = polygons
+    starts = np.concatenate([[0], np.cumsum(sides)[:-1]])
+    for shape, start, count in zip(shapes.tolist(), starts.tolist(), sides.tolist()):
+        sink.draw_poly(PlacedPolygon([Point(point) for point in corners[start:start+count]]), colors[shape])
+    sink.flush()
+
+
+
+# Draw a periodic tiling over the whole window: the polygons of the domain are drawn once onto a surface, which is then
+# blitted at every copy of the domain that reaches into the window. center is the window pixel of the origin, and scale
+# the length of a polygon side in pixels. Returns the number of copies blitted.
+# Copies are placed to the nearest pixel, so where two copies meet the outlines can be a pixel apart.
+def draw_periodic(win, center, scale, polygons, periods, colors, background=(255,255,255)):
+    import pygame
+    shapes, corners, sides = polygons
+    starts = np.concatenate([[0], np.cumsum(sides)[:-1]])
+    pixels = scale*corners
+    low = np.floor(pixels.min(axis=0)) - 1
+    size = np.ceil(pixels.max(axis=0) - low) + 2
+
+    # The domain, on a surface that is transparent around its polygons
+    key = (255, 0, 255)
+    tile = pygame.Surface((int(size[0]), int(size[1])))
+    tile.fill(key)
+    tile.set_colorkey(key)
+    for shape, start, count in zip(shapes.tolist(), starts.tolist(), sides.tolist()):
+        points = (pixels[start:start+count] - low).tolist()
+        pygame.draw.polygon(tile, colors[shape], points)
+        pygame.draw.polygon(tile, (0,0,0), points, 1)
+
+    # Every copy (i, j) whose surface meets the window: bound i and j by the window corners, widened by the surface
+    width, height = win.get_size()
+    basis = scale*lattice.to_cartesian(np.asarray(periods))
+    to_copies = np.linalg.inv(basis.T)
+    window = np.array([(x, y) for x in (-size[0], width) for y in (-size[1], height)]) - center - low
+    multiples = window @ to_copies.T
+    i_range = range(math.floor(multiples[:,0].min()), math.ceil(multiples[:,0].max()) + 1)
+    j_range = range(math.floor(multiples[:,1].min()), math.ceil(multiples[:,1].max()) + 1)
+
+    win.fill(background)
+    copies = 0
+    for i in i_range:
+        for j in j_range:
+            x, y = np.asarray(center) + low + i*basis[0] + j*basis[1]
+            if x < width and y < height and x + size[0] > 0 and y + size[1] > 0:
+                win.blit(tile, (round(x), round(y)))
+                copies += 1
+    return copies
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a torus with a periodic tiling, and repeat it over the plane.',
+                                     epilog='The search grows quickly with the domain and the shapes: 4 0 0 0 / 0 0 4 4 '
+                                     'takes seconds with triangles and squares, and with all four shapes often gives up '
+                                     'after 20000 choices. Keep domains small, or try other seeds.')
+    parser.add_argument('--period', type=int, nargs=4, action='append', required=True, metavar=('A', 'B', 'C', 'D'),
+                        help='lattice coords of a period (a + b*w + c*w^2 + d*w^3, see lattice.py), given twice')
+    parser.add_argument('--shapes', type=int, nargs='+', default=[0, 1], help='0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the order in which options are tried')
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help='most choices to try before giving up (small domains can take thousands, see the module header)')
+    parser.add_argument('--repeat', type=int, nargs=2, default=[4, 4], metavar=('COLUMNS', 'ROWS'), help='copies of the domain written')
+    parser.add_argument('--output', default=None, help='.svg or .jsonl file (.gz to compress) of the polygons')
+    parser.add_argument('--show', action='store_true', help='show the tiling repeated over a window')
+    args = parser.parse_args()
+    if len(args.period) != 2:
+        parser.error('--period must be given twice')
+
+    started = time.perf_counter()
+    tess, solver = solve_torus(args.period, args.shapes, args.seed, args.max_nodes)
+    elapsed = time.perf_counter() - started
+    if tess is None:
+        print('No tiling of the torus found after {} choices in {:.3f} s'.format(solver.stats()['nodes'], elapsed))
+        return
+    periods = tess.store.periods
+    polygons = domain_polygons(tess)
+    colors = (tess.tri_color, tess.sq_color, tess.hex_color, tess.dodec_color)
+    print('Filled the torus with {} polygons ({} vertices) after {} choices in {:.3f} s'.format(
+        len(polygons[0]), tess.store.size, solver.stats()['nodes'], elapsed))
+    print('Periods {} and {}'.format(tuple(periods[0].tolist()), tuple(periods[1].tolist())))
+
+    if args.output is not None:
+        from export import export_sink
+        started = time.perf_counter()
+        copies = replicate(polygons, periods, *args.repeat)
+        sink = export_sink(args.output)
+        draw_polygons(sink, copies, colors)
+        sink.close()
+        print('Wrote {} polygons to {} in {:.3f} s'.format(len(copies[0]), args.output, time.perf_counter() - started))
+
+    if args.show:
+        import pygame
+        pygame.init()
+        win = pygame.display.set_mode((1000, 800))
+        count = draw_periodic(win, np.array([500, 400]), 12, polygons, periods, colors)
+        pygame.display.flip()
+        pygame.display.set_caption('Tessellation ------ Periodic, {} copies of {} polygons'.format(count, len(polygons[0])))
+        while pygame.event.wait().type != pygame.QUIT:
+            pass
+        pygame.quit()
+
+
+
+if __name__ == "__main__":
+    main()
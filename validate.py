@@ -0,0 +1,332 @@
+# Check a whole tiling at once, for large outputs.
+#
+# The vertex store is read as whole arrays (graph_arrays) and every check is a vectorized pass over all vertices or
+# all edges, with no Python loop over either, so a tiling of a million vertices is checked in seconds:
+#     > duplicate_vertices: two vertices at the same point.
+#     > hash_table: a vertex that cannot be found at its own point through the store's hash table.
+#     > broken_edges: an edge to a vertex that does not exist, or that does not link back in the opposite direction.
+#     > edge_geometry: an edge whose ends are not one side apart in its direction.
+#     > overfilled_vertices: polygons covering more than 360 degrees around a vertex.
+#     > fill_flags: a vertex marked filled that is not covered by exactly 360 degrees of polygons, or the other way round.
+#     > forbidden_configurations: polygons around a vertex that no complete configuration contains (configurations.VALID).
+#     > wedges: polygons around a vertex covering the same wedge, or wedges not matching the polygons counted.
+#     > vertex_polygons: the polygons counted at a vertex are not the polygons found around it in the graph.
+#     > polygon_shapes: a closed face that is not one of the tessellation's shapes, with its number of sides and area.
+#     > border_threads: a vertex on the border whose ccw_max_index is not the most counter-clockwise edge of its filled
+#       arc (if it has one), or a vertex whose ccw_max_index is not along one of its edges.
+#     > overlapping_polygons: a polygon with a corner or the center of another polygon strictly inside it.
+#
+# The polygons are the closed faces of the graph, found as in Tessellation.polygons: each directed edge is followed by
+# the next edge clockwise around the vertex it reaches, and the cycles of at most 12 edges that are not open on the
+# border are polygons.  Here all the cycles are followed together, one step of every edge at a time.
+#
+# validate returns a report:
+#     {'ok': True, 'vertices': n, 'filled': n, 'polygons': {'Triangle': n, ...}, 'errors': {check: count, ...},
+#      'examples': {check: [vertex ids], ...}, 'closed_threads': n, 'seconds': t}
+# with a count for every check (zero when it passes) and the first few vertices failing each check that does not.
+# The report also counts the filled vertices whose thread of ccw_max_index does not lead back to the border as
+# 'closed_threads'. That is not an error: the threads around a hole that was enclosed and then filled go round in a
+# circle (see Tessellation.update_vertex_reference), and a store built from polygons (patches.build_store) keeps any
+# polygon end on its filled vertices.
+#
+# Usage:
+#     python validate.py checkpoint.bin
+#     python validate.py --check          (validate known good tilings, see self_check)
+
+import numpy as np
+import json
+import sys
+import time
+
+import configurations
+import lattice
+
+TOLERANCE = 1e-6 # Distances and areas closer than this are equal
+EXAMPLES = 10 # Vertices kept as examples of each failed check
+CHUNK = 1 << 18 # Polygons tested for overlaps at once
+
+CHECKS = ('duplicate_vertices', 'hash_table', 'broken_edges', 'edge_geometry', 'overfilled_vertices', 'fill_flags',
+          'forbidden_configurations', 'wedges', 'vertex_polygons', 'polygon_shapes', 'border_threads',
+          'overlapping_polygons')
+
+UNIT = lattice.to_cartesian(np.array(lattice.DIRECTIONS)) # Cartesian unit vector of each direction
+BITS = 1 << np.arange(lattice.N_DIRECTIONS)
+WEDGE_COUNT = np.array([bin(mask).count('1') for mask in range(1 << lattice.N_DIRECTIONS)]) # Number of wedges in each mask
+RADIUS = np.array([1/(2*np.sin(np.pi/sides)) for sides in configurations.SIDES]) # Circumradius of each shape
+
+# Shape id of a face with each number of sides, -1 if no shape has that many
+SHAPE_OF_SIDES = np.full(lattice.N_DIRECTIONS + 1, -1, dtype=np.int64)
+SHAPE_OF_SIDES[list(configurations.SIDES)] = np.arange(len(configurations.SIDES))
+
+
+
+# For each mask of the directions a vertex has edges along, and each direction an edge arrives back from, the next
+# edge clockwise from it: the edge a face continues along. The arriving edge itself if there is no other.
+def _build_next_edge():
+    masks = np.arange(1 << lattice.N_DIRECTIONS)[:,None]
+    back = np.arange(lattice.N_DIRECTIONS)[None,:]
+    following = np.full((len(masks), lattice.N_DIRECTIONS), -1, dtype=np.int64)
+    for offset in range(lattice.N_DIRECTIONS, 0, -1):
+        direction = (back - offset) % lattice.N_DIRECTIONS
+        following = np.where((masks >> direction) & 1, direction, following)
+    return following
+
+NEXT_EDGE = _build_next_edge()
+ORIENTATION = 1 # Sign of the area of every polygon: turning clockwise at each corner goes round it counter-clockwise
+
+
+
+# The columns of a store (or a tessellation's store) as arrays of its size, with the cartesian point of every vertex.
+def graph_arrays(store):
+    n = store.size
+    arrays = {name: np.asarray(getattr(store, name)[:n]) for name in store.columns}
+    arrays['points'] = lattice.to_cartesian(arrays['lattice'])
+    arrays['state'] = arrays['state'].astype(np.int64)
+    arrays['ccw_max_index'] = arrays['ccw_max_index'].astype(np.int64)
+    arrays['wedges'] = arrays['wedges'].astype(np.int64) & ((1 << lattice.N_DIRECTIONS) - 1)
+    return arrays
+
+
+
+# Every directed edge as (from vertex, direction, to vertex), with the id of each edge by vertex and direction (-1
+# where there is none)
+def edge_list(neighbors):
+    tail, direction = np.nonzero(neighbors >= 0)
+    ids = np.full(neighbors.shape, -1, dtype=np.int64)
+    ids[tail, direction] = np.arange(len(tail))
+    return tail, direction, neighbors[tail, direction].astype(np.int64), ids
+
+
+
+# Follow every face of the graph at once. Returns the faces that are polygons as a dict of arrays: 'shape', 'sides',
+# 'corners' (vertex ids, -1 past the last corner), 'coords' (cartesian corners, the first repeated past the last, so a
+# face across the sides of a torus stays in one piece), 'area' (signed, see ORIENTATION) and 'center'.
+# Faces that are not polygons (open on the border, or more than 12 sides) are left out.
+def faces(arrays, tail, direction, head, ids):
+    mask = (arrays['neighbors'] >= 0) @ BITS
+    following = ids[head, NEXT_EDGE[mask[head], (direction + lattice.N_DIRECTIONS//2) % lattice.N_DIRECTIONS]]
+    own = np.arange(len(tail), dtype=np.int32)
+    following = np.where(following >= 0, following, own).astype(np.int32) # Only on a broken graph
+
+    # An edge leaving an unfilled vertex along its ccw_max_index opens the face it is on onto the border
+    opens = ~arrays['is_filled'][tail] & (arrays['ccw_max_index'][tail] == direction)
+
+    # The face of each edge is named by its smallest edge, found by following it for 12 steps
+    label = own.copy()
+    sides = np.zeros(len(tail), dtype=np.int8)
+    is_open = opens.copy()
+    edge = following
+    for step in range(1, lattice.N_DIRECTIONS + 1):
+        np.minimum(label, edge, out=label)
+        is_open |= opens[edge]
+        sides[(sides == 0) & (edge == own)] = step
+        edge = following[edge]
+    first = np.flatnonzero((label == own) & (sides > 0) & ~is_open)
+
+    # Walk each polygon once from its first edge for its corners
+    count = sides[first].astype(np.int64)
+    edges = np.empty((len(first), lattice.N_DIRECTIONS), dtype=np.int64)
+    edge = first
+    for k in range(lattice.N_DIRECTIONS):
+        edges[:,k] = edge
+        edge = following[edge]
+    inside = np.arange(lattice.N_DIRECTIONS)[None,:] < count[:,None]
+    corners = np.where(inside, tail[edges], -1)
+    coords = np.zeros((len(first), lattice.N_DIRECTIONS + 1, 2))
+    np.cumsum(np.where(inside[...,None], UNIT[direction[edges]], 0.), axis=1, out=coords[:,1:])
+    coords += arrays['points'][tail[first]][:,None,:]
+    x, y = coords[...,0], coords[...,1]
+    area = (x[:,:-1]*y[:,1:] - x[:,1:]*y[:,:-1]).sum(axis=1)/2
+    center = (coords[:,:-1].sum(axis=1) - (lattice.N_DIRECTIONS - count)[:,None]*coords[:,0])/count[:,None]
+    return {'shape': SHAPE_OF_SIDES[count], 'sides': count, 'corners': corners, 'coords': coords, 'area': area,
+            'center': center}
+
+
+
+# Polygons with a point strictly inside them, as (polygon, point) index pairs. Each point is only tested against the
+# polygons whose circumcircle holds it, found through a grid of cells as wide as the largest circumcircle, so only the
+# 3x3 cells around the center of a polygon can hold such points. exclude is the polygon each point may lie inside (its
+# own center), -1 if none. offsets are translations of the points to test as well (the copies of the points of a torus
+# around the domain).
+def points_inside(polygons, points, exclude, offsets):
+    coords, sides, orientation = polygons['coords'], polygons['sides'], np.sign(polygons['area'])
+    if not len(sides) or not len(points):
+        return np.zeros((0, 2), dtype=np.int64)
+    center = polygons['center']
+    radius = RADIUS[polygons['shape']]
+    copies = (points[None,:,:] + offsets[:,None,:]).reshape(-1, 2)
+    cell = radius.max()
+    cells = np.floor(copies/cell).astype(np.int64)
+    keys = (cells[:,0] << 32) + cells[:,1]
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    center_cells = np.floor(center/cell).astype(np.int64)
+    by_cell = np.argsort((center_cells[:,0] << 32) + center_cells[:,1]) # Look up neighbouring cells together
+
+    found = []
+    for start in range(0, len(sides), CHUNK):
+        polygon = by_cell[start:start + CHUNK]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                key = ((center_cells[polygon,0] + dx) << 32) + center_cells[polygon,1] + dy
+                low = np.searchsorted(keys, key, 'left')
+                counts = np.searchsorted(keys, key, 'right') - low
+                pair_polygon = np.repeat(polygon, counts)
+                pair_copy = order[np.repeat(low - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+                pair_point = pair_copy % len(points)
+                near = ((copies[pair_copy] - center[pair_polygon])**2).sum(axis=1) < (radius[pair_polygon] - TOLERANCE)**2
+                near &= exclude[pair_point] != pair_polygon
+                pair_polygon, pair_copy, pair_point = pair_polygon[near], pair_copy[near], pair_point[near]
+
+                # Strictly inside: on the inner side of every edge, by more than the tolerance
+                corner = coords[pair_polygon,:-1]
+                edge = coords[pair_polygon,1:] - corner
+                relative = copies[pair_copy][:,None,:] - corner
+                turn = (edge[...,0]*relative[...,1] - edge[...,1]*relative[...,0])*orientation[pair_polygon][:,None]
+                padding = np.arange(lattice.N_DIRECTIONS)[None,:] >= sides[pair_polygon][:,None]
+                inside = ((turn > TOLERANCE) | padding).all(axis=1)
+                found.append(np.stack([pair_polygon[inside], pair_point[inside]], axis=1))
+    return np.concatenate(found)
+
+
+
+# Check the tiling of a tessellation (or of a vertex store), returning the report described above.
+def validate(tessellation):
+    start = time.perf_counter()
+    store = getattr(tessellation, 'store', tessellation)
+    arrays = graph_arrays(store)
+    n = store.size
+    failed = {} # check: ids of the vertices failing it
+
+    # Points
+    keys = lattice.pack_array(arrays['lattice']).astype(np.uint64)
+    order = np.argsort(keys, kind='stable')
+    same = keys[order][1:] == keys[order][:-1]
+    failed['duplicate_vertices'] = np.union1d(order[1:][same], order[:-1][same])
+    slots = np.flatnonzero(np.asarray(store.hash_ids) >= 0)
+    hashed = np.asarray(store.hash_ids)[slots].astype(np.int64)
+    hashed = hashed[(hashed < n) & (np.asarray(store.hash_keys)[slots] == keys[np.minimum(hashed, n - 1)])]
+    found = np.zeros(n, dtype=bool)
+    found[hashed] = True
+    failed['hash_table'] = np.flatnonzero(~found)
+
+    # Edges. Edges to vertices that do not exist are left out of the graph after they are counted.
+    neighbors = arrays['neighbors'].astype(np.int64)
+    missing = neighbors >= n
+    neighbors[missing] = -1
+    arrays['neighbors'] = neighbors
+    tail, direction, head, ids = edge_list(neighbors)
+    back = (direction + lattice.N_DIRECTIONS//2) % lattice.N_DIRECTIONS
+    failed['broken_edges'] = np.union1d(np.flatnonzero(missing.any(axis=1)), tail[neighbors[head, back] != tail])
+    step = np.array(lattice.DIRECTIONS, dtype=np.int64)[direction]
+    geometry = store.same_points(arrays['lattice'][tail].astype(np.int64) + step, arrays['lattice'][head].astype(np.int64))
+    failed['edge_geometry'] = np.unique(tail[~geometry])
+
+    # Configurations
+    known = (arrays['state'] >= 0) & (arrays['state'] < configurations.NUM_STATES)
+    state = np.where(known, arrays['state'], 0)
+    angle = configurations.ANGLE[state]
+    failed['overfilled_vertices'] = np.flatnonzero(known & (angle > configurations.FULL_ANGLE))
+    failed['fill_flags'] = np.flatnonzero(arrays['is_filled'] != (known & (angle == configurations.FULL_ANGLE)))
+    failed['forbidden_configurations'] = np.flatnonzero(~known | ~configurations.VALID[store.shape_mask, state])
+    failed['wedges'] = np.flatnonzero(WEDGE_COUNT[arrays['wedges']] != angle)
+
+    # Polygons
+    polygons = faces(arrays, tail, direction, head, ids)
+    shape = polygons['shape']
+    wrong = shape < 0
+    wrong |= ~((store.shape_mask >> np.maximum(shape, 0)) & 1).astype(bool)
+    wrong |= np.abs(np.abs(polygons['area']) - np.asarray(configurations.AREAS)[shape]) > TOLERANCE
+    wrong |= np.sign(polygons['area']) != ORIENTATION
+    failed['polygon_shapes'] = np.unique(polygons['corners'][wrong,0])
+    polygons = {name: values[~wrong] for name, values in polygons.items()}
+    corners = polygons['corners']
+    counted = corners >= 0
+    around = np.bincount(corners[counted]*len(configurations.SHAPES) + np.broadcast_to(polygons['shape'][:,None], corners.shape)[counted],
+                         minlength=n*len(configurations.SHAPES)).reshape(n, len(configurations.SHAPES))
+    failed['vertex_polygons'] = np.flatnonzero((around != configurations.COUNTS[state]).any(axis=1))
+
+    # Border threads: each vertex on the border points at the end of its filled arc (a vertex no polygon has reached
+    # yet, such as the first two of a tessellation, has no arc and only points along its edge). The threads of the
+    # filled vertices are followed 2^k steps at a time to see which lead back to the border.
+    filled = arrays['is_filled']
+    ccw = arrays['ccw_max_index']
+    target = np.where(ccw >= 0, neighbors[np.arange(n), np.maximum(ccw, 0)], -1)
+    arc_end = lattice.ARC_END[arrays['wedges']]
+    failed['border_threads'] = np.flatnonzero((~filled & (arc_end >= 0) & (ccw != arc_end)) | ((ccw >= 0) & (target < 0)))
+    thread = np.where(filled & (target >= 0), target, np.arange(n))
+    for i in range(max(n, 2).bit_length()):
+        thread = thread[thread]
+    closed_threads = int((filled & filled[thread]).sum()) if not filled.all() else 0
+
+    # Overlaps, between copies of the polygons on every side of a torus
+    count = len(polygons['sides'])
+    points = np.concatenate([arrays['points'], polygons['center']])
+    exclude = np.concatenate([np.full(n, -1), np.arange(count)])
+    pairs = points_inside(polygons, points, exclude, store.copy_offsets())
+    inner = pairs[:,1] - n
+    overlapping = np.union1d(pairs[:,0], inner[inner >= 0])
+    failed['overlapping_polygons'] = corners[overlapping,0]
+
+    errors = {check: len(failed[check]) for check in CHECKS}
+    return {
+        'ok': not any(errors.values()),
+        'vertices': n,
+        'filled': int(filled.sum()),
+        'polygons': {name: int((polygons['shape'] == k).sum()) for k, name in enumerate(configurations.SHAPES)},
+        'errors': errors,
+        'examples': {check: failed[check][:EXAMPLES].tolist() for check in CHECKS if errors[check]},
+        'closed_threads': closed_threads,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+
+# Check a saved tiling (a checkpoint, see checkpoint.py)
+def validate_file(path):
+    from tessellation import Tessellation
+    return validate(Tessellation.load(path))
+
+
+
+# Validate tilings that are known to be right: a new tessellation, fills with each seed (with the shapes of the
+# README), and the same fills with every step undone again. Returns the names of the cases that failed.
+def self_check(seeds=range(3), max_fill=2000):
+    from tessellation import Tessellation
+    from tessellation_fill import fill_tess
+    from policy import UniformPolicy
+    failures = []
+    def check(name, tessellation):
+        if not validate(tessellation)['ok']:
+            failures.append(name)
+
+    check('new', Tessellation())
+    for seed in seeds:
+        for shapes in ((0,1), (0,1,2,3)):
+            tess = Tessellation(shapes=shapes, policy=UniformPolicy(shapes, seed))
+            tess.start_journal()
+            fill_tess(tess, max_fill)
+            check('fill {} seed {}'.format(shapes, seed), tess)
+            while tess.undo():
+                pass
+            check('undone {} seed {}'.format(shapes, seed), tess)
+    return failures
+
+
+
+def main():
+    if sys.argv[1:] == ['--check']:
+        failures = self_check()
+        print('\n'.join('Failed: ' + name for name in failures) or 'Every check passed')
+        sys.exit(1 if failures else 0)
+    if len(sys.argv) != 2:
+        print('Usage: python validate.py checkpoint.bin | --check')
+        return
+    report = validate_file(sys.argv[1])
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['ok'] else 1)
+
+
+
+if __name__ == "__main__":
+    main()
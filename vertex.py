@@ -16,64 +16,106 @@
 
 
 
+import configurations
+import lattice
 import numpy as np
 
+# A vertex of the tessellation.
+# Vertices are light views onto a row of the VertexStore below: all of the data lives in the store's columns,
+# and a Vertex only holds the store and the integer id of its row.  Two views of the same row compare equal.
 class Vertex:
-    def __init__(self,coords):
-        self.coords = coords # np.array
-        self.n = 12 # Maximum number of neighbors
-        self.neighbors = {} # Dictionary of directions:Vertex, 1:, 2:, ... , n:
-        
-        self.tol = 10**(-8) # Tolerance in corrdinates close to zero
-        self.correct_ang_error(self.tol) # Correct any issues where repeated rotations will move points away from zero
-        
-        self.ccw_max_index = None # Store the vertex index corresponding to the most counter-clockwise filled direction.
-        self.is_filled = False # In combination w/ ccw_max_index, have a linked list of the border.
-        
-        # Array of [Triangles, Squares] around the vertex. Order of placement not maintained.
-        # 30 x poly_value = interior angle of polygon.
-        # poly_value correspond to the number of neighbor indices n taken up by the polygon.
-        self.polys = np.array([0,0])
-        self.polys_value = np.array([2,3])
-        
-        self.polys_excl = [[4,1],[1,3]] # Special set of polygon configurations that will lead to unfillable vertices.
-        
-        
-    def correct_ang_error(self, tol):
-        for i in range(2):
-            if abs(self.coords[i]) < tol:
-                self.coords[i] = 0.
+    __slots__ = ('store', 'id')
+    
+    n = lattice.N_DIRECTIONS # Maximum number of neighbors
+    
+    # The polygons around a vertex are counted as [Triangles, Squares, Hexagons, Dodecagons]. Order of placement not maintained.
+    # 30 x poly_value = interior angle of polygon.
+    # poly_value correspond to the number of neighbor indices n taken up by the polygon.
+    # Which configurations are valid, and which are forced, is looked up in the table of configurations.py.
+    polys_value = configurations.ANGLES
+    
+    def __init__(self, store, id):
+        self.store = store # VertexStore holding the data for this vertex
+        self.id = id # Row of this vertex in the store
         
+    def __eq__(self, other):
+        return isinstance(other, Vertex) and self.id == other.id and self.store is other.store
+    
+    def __hash__(self):
+        return hash(self.id)
+    
+    def __repr__(self):
+        return 'Vertex({}, {})'.format(self.id, self.lattice)
+    
+    
+    
+    # Exact integer coordinates (a, b, c, d), see lattice.py
+    @property
+    def lattice(self):
+        return tuple(self.store.lattice[self.id].tolist())
+    
+    # np.array of (x, y), only used for drawing
+    @property
+    def coords(self):
+        return lattice.to_cartesian(self.store.lattice[self.id])
+    
+    # Dictionary of directions:Vertex for every established neighbor
+    @property
+    def neighbors(self):
+        row = self.store.neighbors[self.id]
+        return {int(k): Vertex(self.store, int(row[k])) for k in np.flatnonzero(row >= 0)}
+    
+    # Vertex index corresponding to the most counter-clockwise filled direction, None if not yet set.
+    @property
+    def ccw_max_index(self):
+        index = int(self.store.ccw_max_index[self.id])
+        return None if index < 0 else index
+    
+    # In combination w/ ccw_max_index, have a linked list of the border.
+    @property
+    def is_filled(self):
+        return bool(self.store.is_filled[self.id])
+    
+    # Array of [Triangles, Squares, Hexagons, Dodecagons] around the vertex (a copy, changes go through add_polys)
+    @property
+    def polys(self):
+        return configurations.COUNTS[self.store.state[self.id]].copy()
+    
+    
     
     def info(self):
-        print('Coords: ', self.coords)
+        print('Coords: ', self.coords, self.lattice)
         print('Counter Clockwise Index Set: ', self.ccw_max_index)
         print('Completely Filled: ', self.is_filled)
-        print('Polygons: {} Tri, {} Square'.format(self.polys[0],self.polys[1]))
+        print('Polygons: {} Tri, {} Square, {} Hexagon, {} Dodecagon'.format(*self.polys))
         print('Neighbors: ', self.neighbors)
         
     
     
-    # Take (adjacent) vertex and find the angle with respect to current vertex.
-    # Angle must lie on 1 or 12 directions. Each index corresponds to 360/n degrees.
+    # Return the neighbor in a given direction, or None if no vertex has been established there.
+    def neighbor(self, direction):
+        index = int(self.store.neighbors[self.id, direction])
+        return None if index < 0 else Vertex(self.store, index)
+    
+    
+    
+    # Take (adjacent) vertex and find the direction with respect to current vertex.
+    # Direction must lie on 1 of 12 directions. Each index corresponds to 360/n degrees.
     # Return index number corresponding to this direction.
     def neighbor_num(self, vtx):
-        vec = vtx.coords - self.coords
-        ang = round(np.arccos(vec[0]/np.linalg.norm(vec))/np.pi*self.n/2)
-        if np.linalg.norm(vec) > 1.0001:
-            print('Careful, vector length > 1', np.linalg.norm(vec))
-            print(self.coords)
-        #print('Neighbor_num', vec, ang, np.linalg.norm(vec))
-        if vec[1] < 0:
-            ang = (-ang)%self.n # Fix angle [0,360) from the restriction from principle branch of arccosine/arcsine
-        return int(ang)
+        ang = lattice.direction(self.lattice, vtx.lattice)
+        if ang is None:
+            ang = self.store.wrapped_direction(self.lattice, vtx.lattice) # Only a torus has edges across its sides
+        if ang is None:
+            raise ValueError('Vertices {} and {} are not adjacent'.format(self.lattice, vtx.lattice))
+        return ang
     
     
     
     # Check whether a vertex has already been established in a particular direction.
     # Return Bool, True = Vertex location is open, False = Vertex is already present
     def check_avail(self, vtx):
-        return (self.neighbor_num(vtx) not in self.neighbors)
+        return self.store.neighbors[self.id, self.neighbor_num(vtx)] < 0
     
     
     
@@ -81,36 +123,50 @@ class Vertex:
     # If available, the vertex is assigned that location.
     # If unavailable, do not set any new neighbors.
     def set_neighbor(self, vtx):
-        if self.check_avail(vtx):
-            self.neighbors[self.neighbor_num(vtx)] = vtx
-        else:
-            if vtx != self.neighbors[self.neighbor_num(vtx)]:
-                print('Trying to append a different vertex... uh oh')
+        direction = self.neighbor_num(vtx)
+        current = self.store.neighbors[self.id, direction]
+        if current < 0:
+            self.store.set_neighbor(self.id, direction, vtx.id)
+        elif current != vtx.id:
+            print('Trying to append a different vertex... uh oh')
                 
 
     
     # Update the most counter-clockwise filled direction of the vertex.
     def store_ccw_index(self, vtx):
-        self.ccw_max_index = self.neighbor_num(vtx)
+        self.store.set_ccw_index(self.id, self.neighbor_num(vtx))
+        
+        
+        
+    # Record the angle covered by a polygon corner, counter-clockwise from the given direction by the given units.
+    def add_wedges(self, direction, units):
+        self.store.add_wedges(self.id, lattice.wedge_mask(direction, units))
+        
+        
+        
+    # If a filled wedge follows the most counter-clockwise filled edge, a polygon has closed the gap between two filled
+    # arcs (e.g. where two borders grown apart meet): move the edge on to the end of a filled arc.
+    def skip_filled_wedges(self):
+        wedges = int(self.store.wedges[self.id])
+        index = self.ccw_max_index
+        if index is not None and (wedges >> index) & 1 and lattice.ARC_END[wedges] >= 0:
+            self.store.set_ccw_index(self.id, int(lattice.ARC_END[wedges]))
         
         
         
     # Check whether the current set of polygons around the vertex is a valid configuration.
-    # If configuration does not overfill vertex or a disallowed configuration, return True
-    # If invalid, return False.
-    def check_valid_polys(self, extra_polys=np.array([0,0])):
-        temp_polys = self.polys + extra_polys
-        if (np.dot(temp_polys, self.polys_value) > self.n) or (temp_polys==self.polys_excl).all(axis=1).any():
-            #print('Invalid Configuration of Polygons')
-            return False
-        return True
+    # If configuration can still be completed with the allowed shapes, return True
+    # If invalid (overfilled, or a configuration that will lead to an unfillable vertex), return False.
+    def check_valid_polys(self, extra_polys=(0,0,0,0)):
+        state = self.store.state[self.id] + configurations.encode(extra_polys)
+        return bool(configurations.VALID[self.store.shape_mask, state])
     
     
     
     # Check whether the entire vertex is filled, and update is_filled if so.
     def check_filled(self):
-        if np.dot(self.polys, self.polys_value) == self.n:
-            self.is_filled = True
+        if configurations.ANGLE[self.store.state[self.id]] == self.n:
+            self.store.set_filled(self.id)
             
             
 
@@ -119,28 +175,307 @@ class Vertex:
     def add_polys(self, new_polys):
         if self.check_valid_polys(new_polys):
             #print(f'Adding {new_polys} to vertex config: {self.polys}')
-            self.polys += new_polys
+            self.store.add_polys(self.id, configurations.encode(new_polys))
             
             
     
     # Find the unique solution to fill the vertex, if one exists.
-    # Above a certain plane in the (tri, sq) space, the vertex can be filled with either all triangles or squares.
-    # Graphically, it does not matter the order we add only squares or only triangles, since they will be indistinguishable.
-    # Thus, one of the values in the array will always be zero.
-    # To find this configuration, we leave either # of Triangles or # of Squares the same and check if the number of
-    # squares or triangles, respectively, is an integer value.
-    # Returns np.array with same format as self.polys.
+    # Graphically, it does not matter the order we add polygons of a single kind, since they will be indistinguishable.
+    # So the vertex is only auto-filled when exactly one set of polygons completes it, and that set is a single kind.
+    # Returns np.array with same format as self.polys, all zeros if there is no unique solution.
     def finish_fill(self):
-        if np.dot(self.polys, self.polys_value) > 6: # Special plane that determines if unique solution of possible
-            # Solve how many triangles/squares are needed if the opposite number is held constant
-            temp_sol = ((self.n - self.polys*self.polys_value)/self.polys_value[::-1])[::-1]
+        return configurations.FORCED[self.store.shape_mask, self.store.state[self.id]]
+
+
+
+# Struct-of-arrays storage for every vertex of a tessellation.
+# Each vertex is a row (its integer id) across a set of numpy columns:
+#     > lattice: exact coordinates, (n, 4) int16
+#     > neighbors: id of the neighbor in each of the 12 directions, -1 if none, (n, 12) int32
+#     > state: packed count of [Triangles, Squares, Hexagons, Dodecagons] around the vertex, int16 (see configurations.py)
+#     > ccw_max_index: most counter-clockwise filled direction, -1 if not set, int8
+#     > is_filled: whether the vertex is completely filled, bool
+#     > wedges: which of the 12 wedges of 30 degrees around the vertex are covered by polygons, bit mask, int16 (see lattice.py)
+# Columns are allocated with spare capacity and doubled when full, so adding a vertex is amortized O(1).
+#
+# Points are found through an open addressing hash table (linear probing) of packed lattice coords -> id,
+# also held in numpy arrays, so "is there already a vertex at this point?" is O(1) without a Python object per vertex.
+#
+# Changes can be undone: once mark has been called, every change is recorded on an undo trail together with the
+# value it replaced, and undo(mark) reverts every change made since that mark, newest first (see solver.py).
+# changes(mark) reads the new values of everything changed since a mark, and apply makes those changes again, which is
+# how a journal redoes and replays steps of a fill (see journal.py).
+class VertexStore:
+    # Column name: (shape of one row, dtype, value of an empty row)
+    columns = {
+        'lattice': ((4,), np.int16, 0),
+        'neighbors': ((lattice.N_DIRECTIONS,), np.int32, -1),
+        'state': ((), np.int16, 0),
+        'ccw_max_index': ((), np.int8, -1),
+        'is_filled': ((), np.bool_, False),
+        'wedges': ((), np.int16, 0),
+    }
+    
+    EMPTY = -1 # Hash slot never used
+    REMOVED = -2 # Hash slot whose vertex was removed by truncate
+    
+    # shapes: ids of the polygons the tessellation is built from (0 Triangle, 1 Square, 2 Hexagon, 3 Dodecagon)
+    def __init__(self, capacity=1024, shapes=(0,1)):
+        self.size = 0 # Number of vertices in the store
+        self.filled = 0 # Number of vertices that are completely filled
+        self.shape_mask = configurations.shape_mask(shapes) # Selects the configuration table for these shapes
+        self.trail = None # Undo records (column, id, direction, replaced value) of every change, None when not kept
+        for name, (shape, dtype, empty) in self.columns.items():
+            setattr(self, name, np.full((capacity,) + shape, empty, dtype=dtype))
+        self.rehash(2*capacity)
+            
+    def __len__(self):
+        return self.size
+    
+    
+    
+    # Rebuild the hash table with the given number of slots (a power of two), reinserting every vertex.
+    def rehash(self, slots):
+        self.hash_bits = int(slots).bit_length() - 1
+        self.hash_keys = np.zeros(slots, dtype=np.uint64)
+        self.hash_ids = np.full(slots, self.EMPTY, dtype=np.int32)
+        self.hash_used = 0 # Slots holding a vertex or a removed marker
+        for id, key in enumerate(lattice.pack_array(self.lattice[:self.size]).tolist()):
+            self.hash_insert(key, id)
             
-            # Require the solution to have integer number of polygons and be adding polygons (no deleting triangles/squares)
-            valid = (temp_sol%1 == 0) & (temp_sol - self.polys > 0)
             
-            # Unique solution of the form [x, 0] or [0, x]
-            return ((temp_sol - self.polys)*valid).astype(int)
+            
+    # First slot to probe for a packed key (Fibonacci hashing)
+    def hash_slot(self, key):
+        return ((key * 11400714819323198485) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.hash_bits)
+    
+    
+    
+    # Return the id stored under a packed key, or -1 if the key is not present.
+    def hash_find(self, key):
+        mask = len(self.hash_ids) - 1
+        slot = self.hash_slot(key)
+        while True:
+            id = int(self.hash_ids[slot])
+            if id == self.EMPTY:
+                return -1
+            if id != self.REMOVED and int(self.hash_keys[slot]) == key:
+                return id
+            slot = (slot + 1) & mask
+            
+            
+            
+    # Store an id under a packed key that is known not to be present.
+    def hash_insert(self, key, id):
+        mask = len(self.hash_ids) - 1
+        slot = self.hash_slot(key)
+        while self.hash_ids[slot] >= 0:
+            slot = (slot + 1) & mask
+        if self.hash_ids[slot] == self.EMPTY:
+            self.hash_used += 1
+        self.hash_keys[slot] = key
+        self.hash_ids[slot] = id
         
-        # No unique solution, so do not add any more polygons.
-        # This return matches a failed-to-find solution from before corresponding to polys = [2,1] configuration.
-        return np.array([0,0])
\ No newline at end of file
+        
+        
+    # Mark the slot holding a packed key as removed.
+    def hash_remove(self, key):
+        mask = len(self.hash_ids) - 1
+        slot = self.hash_slot(key)
+        while not (self.hash_ids[slot] >= 0 and int(self.hash_keys[slot]) == key):
+            slot = (slot + 1) & mask
+        self.hash_ids[slot] = self.REMOVED
+    
+    
+    
+    # Double the capacity of every column.
+    def grow(self):
+        capacity = 2*len(self.is_filled)
+        for name, (shape, dtype, empty) in self.columns.items():
+            column = np.full((capacity,) + shape, empty, dtype=dtype)
+            column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+            
+            
+            
+    # Total memory used by the columns and the hash table, in bytes.
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.columns) + self.hash_keys.nbytes + self.hash_ids.nbytes
+    
+    
+    
+    # Return a view of the vertex with the given id.
+    def vertex(self, id):
+        return Vertex(self, id)
+    
+    
+    
+    # Add a new vertex at the given lattice coordinates and return it.
+    def add(self, coords):
+        if self.size == len(self.is_filled):
+            self.grow()
+        if 2*(self.hash_used + 1) > len(self.hash_ids): # Keep the hash table at most half full
+            self.rehash(2*len(self.hash_ids))
+        id = self.size
+        self.hash_insert(lattice.pack(coords), id)
+        self.lattice[id] = coords
+        self.size += 1
+        if self.trail is not None:
+            self.trail.append(('add', id, None, None))
+        return Vertex(self, id)
+    
+    
+    
+    # Direction of the edge between two points that are only adjacent across the sides of a torus (see torus.py).
+    # The plane has no such edges.
+    def wrapped_direction(self, a, b):
+        return None
+    
+    
+    
+    # For arrays of lattice coords, whether each pair is the same point of the store (of the torus, see torus.py).
+    def same_points(self, a, b):
+        return (a == b).all(axis=1)
+    
+    # Cartesian translations taking points to other copies of the same point, only (0, 0) on the plane
+    def copy_offsets(self):
+        return np.zeros((1, 2))
+    
+    
+    
+    # Return the vertex at the given lattice coordinates, or None if the point is empty.
+    def find(self, coords):
+        id = self.hash_find(lattice.pack(coords))
+        return None if id < 0 else Vertex(self, id)
+    
+    
+    
+    # Return the vertex at the given lattice coordinates, adding a new vertex if the point is empty.
+    def find_or_add(self, coords):
+        id = self.hash_find(lattice.pack(coords))
+        return self.add(coords) if id < 0 else Vertex(self, id)
+    
+    
+    
+    # Remove every vertex with id >= size, restoring the store to an earlier size.
+    # Only valid for vertices that no remaining vertex links to (e.g. corners of a polygon that failed to insert).
+    def truncate(self, size):
+        if size >= self.size:
+            return
+        for key in lattice.pack_array(self.lattice[size:self.size]).tolist():
+            self.hash_remove(key)
+        for name, (shape, dtype, empty) in self.columns.items():
+            getattr(self, name)[size:self.size] = empty
+        self.size = size
+        
+        
+        
+    # Every change to a vertex goes through one of the following methods.
+    def set_neighbor(self, id, direction, neighbor_id):
+        if self.trail is not None:
+            self.trail.append(('neighbors', id, direction, int(self.neighbors[id, direction])))
+        self.neighbors[id, direction] = neighbor_id
+        
+    def set_ccw_index(self, id, direction):
+        if self.trail is not None:
+            self.trail.append(('ccw_max_index', id, None, int(self.ccw_max_index[id])))
+        self.ccw_max_index[id] = direction
+        
+    def add_polys(self, id, state_change):
+        if self.trail is not None:
+            self.trail.append(('state', id, None, int(self.state[id])))
+        self.state[id] += state_change
+        
+    def add_wedges(self, id, mask):
+        if self.trail is not None:
+            self.trail.append(('wedges', id, None, int(self.wedges[id])))
+        self.wedges[id] |= mask
+        
+    def set_filled(self, id):
+        if not self.is_filled[id]:
+            if self.trail is not None:
+                self.trail.append(('is_filled', id, None, False))
+            self.is_filled[id] = True
+            self.filled += 1
+            
+            
+            
+    # Start recording changes on the undo trail (if not already) and return a mark of the changes made so far.
+    def mark(self):
+        if self.trail is None:
+            self.trail = []
+        return len(self.trail)
+    
+    
+    
+    # Revert every change recorded since the mark, newest first. Vertices added since then are removed.
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            column, id, direction, value = trail.pop()
+            if column == 'add':
+                self.truncate(id)
+            elif column == 'neighbors':
+                self.neighbors[id, direction] = value
+            elif column == 'is_filled':
+                self.is_filled[id] = value
+                self.filled -= 1
+            else:
+                getattr(self, column)[id] = value
+    
+    
+    
+    # The changes recorded since the mark as (column, id, direction, new value) records, oldest first, that apply can
+    # make again. Added vertices are given by their lattice coords. A vertex added and then removed again by truncate
+    # (the corner of a polygon that failed to insert) is left out, only the vertex holding its id in the end is kept.
+    def changes(self, mark):
+        changes = []
+        added = set()
+        for column, id, direction, value in self.trail[mark:]:
+            if column == 'add':
+                if id >= self.size or id in added:
+                    continue
+                added.add(id)
+                value = tuple(self.lattice[id].tolist())
+            elif column == 'neighbors':
+                value = int(self.neighbors[id, direction])
+            else:
+                value = getattr(self, column)[id].item()
+            changes.append((column, id, direction, value))
+        return changes
+    
+    
+    
+    # Make the changes returned by changes again (recorded on the undo trail as usual, if it is kept).
+    def apply(self, changes):
+        for column, id, direction, value in changes:
+            if column == 'add':
+                self.add(value)
+            elif column == 'neighbors':
+                self.set_neighbor(id, direction, value)
+            elif column == 'ccw_max_index':
+                self.set_ccw_index(id, value)
+            elif column == 'is_filled':
+                self.set_filled(id)
+            else:
+                if self.trail is not None:
+                    self.trail.append((column, id, None, getattr(self, column)[id].item()))
+                getattr(self, column)[id] = value
+    
+    
+    
+    # Stop recording changes, dropping the undo trail.
+    def stop_trail(self):
+        self.trail = None
+        
+        
+        
+    # Batch queries over every vertex, returned as arrays of ids.
+    
+    # Vertices that are not yet completely filled. These are exactly the vertices on the border of the tessellation.
+    def unfilled(self):
+        return np.flatnonzero(~self.is_filled[:self.size])
+    
+    # Vertices with exactly the given [Triangles, Squares, Hexagons, Dodecagons] configuration.
+    def with_polys(self, polys):
+        return np.flatnonzero(self.state[:self.size] == configurations.encode(polys))
@@ -0,0 +1,162 @@
+# Interactive viewer of a tessellation: pan and zoom over its polygons.
+#
+# Only the polygons inside the window are drawn, found through the tessellation's spatial index (see spatial.py), so
+# the time to draw a frame follows what is on screen rather than the size of the tessellation.  The window is only
+# drawn again when the view changes, and the viewer sleeps on the event queue in between.
+#     > Drag with the mouse, or use the arrow keys, to pan
+#     > Mouse wheel (about the cursor), or +/-, to zoom
+#     > Home to return to the starting view
+#
+# Usage:
+#     python viewer.py checkpoint.bin
+
+import numpy as np
+import time
+import sys
+
+PAN_STEP = 0.1 # Fraction of the window panned by an arrow key
+ZOOM_STEP = 1.25 # Zoom factor of one wheel step or key press
+MIN_SCALE = 0.05 # Smallest and largest polygon side, in pixels
+MAX_SCALE = 400.
+MIN_OUTLINE_SCALE = 3. # Below this polygon side (pixels), polygons are drawn without their black border
+
+
+
+class Viewer:
+    def __init__(self, tessellation, win, center, scale, background=(255,255,255)):
+        import pygame
+        self.pygame = pygame
+
+        if not tessellation.polygon_index.enabled:
+            raise ValueError('The tessellation does not keep its polygons, create it with index=PolygonGrid()')
+        self.index = tessellation.polygon_index
+        self.colors = (tessellation.tri_color, tessellation.sq_color, tessellation.hex_color, tessellation.dodec_color)
+        self.win = win # Window the tessellation is drawn on
+        self.background = background
+
+        self.home = (np.array(center, dtype=float), float(scale))
+        self.center = np.array(center, dtype=float) # Location on window of the origin of the tessellation
+        self.scale = float(scale) # Length of each side of polygons in pixels
+        self.dragging = False
+        self.visible = 0 # Polygons drawn in the last frame
+        self.frame_time = 0. # Seconds taken by the last frame
+
+
+
+    # Window pixel of a point of the tessellation, and the other way around
+    def to_window(self, coords):
+        return self.center + self.scale*coords
+
+    def to_tessellation(self, pixel):
+        return (np.asarray(pixel, dtype=float) - self.center)/self.scale
+
+
+
+    # Draw the polygons inside the window
+    def draw(self):
+        started = time.perf_counter()
+        pygame = self.pygame
+        width, height = self.win.get_size()
+        xmin, ymin = self.to_tessellation((0, 0))
+        xmax, ymax = self.to_tessellation((width, height))
+
+        self.win.fill(self.background)
+        visible = self.index.query(xmin, ymin, xmax, ymax)
+        outline = self.scale >= MIN_OUTLINE_SCALE
+        for index in visible:
+            pixels = self.to_window(self.index.corners(index)).tolist()
+            pygame.draw.polygon(self.win, self.colors[self.index.shape(index)], pixels)
+            if outline:
+                pygame.draw.polygon(self.win, (0,0,0), pixels, 1)
+        pygame.display.flip()
+
+        self.visible = len(visible)
+        self.frame_time = time.perf_counter() - started
+        pygame.display.set_caption('Tessellation ------ {} of {} polygons shown, {:.1f} ms/frame'.format(
+            self.visible, len(self.index), 1000*self.frame_time))
+
+
+
+    # Zoom by factor, keeping the given window pixel on the same point of the tessellation
+    def zoom(self, factor, pixel):
+        scale = min(max(self.scale*factor, MIN_SCALE), MAX_SCALE)
+        pixel = np.asarray(pixel, dtype=float)
+        self.center = pixel - (pixel - self.center)*scale/self.scale
+        self.scale = scale
+
+    def pan(self, dx, dy):
+        self.center = self.center + (dx, dy)
+
+
+
+    # Update the view for a window event. Returns True if the view changed.
+    def handle(self, event):
+        pygame = self.pygame
+        width, height = self.win.get_size()
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self.pan(*event.rel)
+            return True
+        elif event.type == pygame.MOUSEWHEEL:
+            self.zoom(ZOOM_STEP**event.y, pygame.mouse.get_pos())
+            return True
+        elif event.type == pygame.KEYDOWN:
+            keys = {pygame.K_LEFT: (PAN_STEP*width, 0), pygame.K_RIGHT: (-PAN_STEP*width, 0),
+                    pygame.K_UP: (0, PAN_STEP*height), pygame.K_DOWN: (0, -PAN_STEP*height)}
+            if event.key in keys:
+                self.pan(*keys[event.key])
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom(ZOOM_STEP, (width/2, height/2))
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom(1/ZOOM_STEP, (width/2, height/2))
+            elif event.key == pygame.K_HOME:
+                self.center, self.scale = self.home[0].copy(), self.home[1]
+            else:
+                return False
+            return True
+        return False
+
+
+
+    # Show the tessellation until the window is closed
+    def run(self):
+        pygame = self.pygame
+        self.draw()
+        while True:
+            changed = False
+            for event in [pygame.event.wait()] + pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                changed |= self.handle(event)
+            if changed:
+                self.draw()
+
+
+
+def main():
+    import pygame
+    from tessellation import Tessellation
+    from spatial import PolygonGrid
+    if len(sys.argv) != 2:
+        print('Usage: python viewer.py checkpoint')
+        return
+
+    pygame.init()
+    xmax, ymax = 1000, 800
+    win = pygame.display.set_mode((xmax, ymax))
+    tess = Tessellation.load(sys.argv[1], index=PolygonGrid())
+
+    # Start with the whole tessellation in view
+    xmin, ymin, xmax_t, ymax_t = tess.polygon_index.extent() or (-1, -1, 1, 1)
+    scale = min(xmax/(xmax_t - xmin + 1), ymax/(ymax_t - ymin + 1))
+    center = np.array([xmax/2, ymax/2]) - scale*np.array([(xmin + xmax_t)/2, (ymin + ymax_t)/2])
+    Viewer(tess, win, center, scale).run()
+    pygame.quit()
+
+
+
+if __name__ == "__main__":
+    main()